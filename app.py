@@ -1,16 +1,66 @@
 # Author: Cyprien Borée boreec@tuta.io
 
+from core.Metrics import Metrics
 from core.PeopleDatabase import PeopleDatabase
+from core.JsonSerializer import get_serializer
+from core.Profiler import Profiler
+from core.ResponseCache import ResponseCache
 from flask import Flask
+import os
 
 app = Flask(__name__)
 """
 Flask application instance. 
 """
 
-db = PeopleDatabase()
+app.config["ADMIN_TOKEN"] = os.environ.get("PEOPLE_ADMIN_TOKEN")
 """
-Database instance used by the application.  
+Token required by the administration routes, given by the environment variable
+PEOPLE_ADMIN_TOKEN. Without it, the administration routes are disabled.
+"""
+
+metrics = Metrics(os.environ.get("PEOPLE_METRICS") == "1")
+"""
+Metrics of the requests, exposed on /metrics. They are only collected when the
+environment variable PEOPLE_METRICS is set to 1.
+"""
+
+db = PeopleDatabase(
+    os.environ.get("PEOPLE_DB_PATH", ":memory:"),
+    cache_size=int(os.environ.get("PEOPLE_CACHE_SIZE", 10000)),
+    shared=os.environ.get("PEOPLE_DB_SHARED") == "1",
+    instrumented=metrics.enabled,
+    group_commit=os.environ.get("PEOPLE_GROUP_COMMIT") == "1",
+    group_commit_delay=float(os.environ.get("PEOPLE_GROUP_COMMIT_DELAY", 0.0)),
+    group_commit_batch=int(os.environ.get("PEOPLE_GROUP_COMMIT_BATCH", 128)),
+)
+"""
+Database instance used by the application. It is stored in memory, unless the
+environment variable PEOPLE_DB_PATH gives the path of a database file. The
+environment variable PEOPLE_CACHE_SIZE sets the number of cached persons,
+PEOPLE_DB_SHARED=1 tells that other processes write in the database file, and
+PEOPLE_GROUP_COMMIT=1 commits the concurrent writes of people together, flushed to
+the disk before the responses are sent (the migrations of the schema at startup
+excepted). PEOPLE_GROUP_COMMIT_DELAY sets the number of seconds the writer waits
+for more writes after the first one of a batch (0 by default), and
+PEOPLE_GROUP_COMMIT_BATCH the maximum number of writes of a batch (128 by default).
+"""
+
+responses = ResponseCache(int(os.environ.get("PEOPLE_CACHE_SIZE", 10000)))
+"""
+Cache of the serialized responses of the application, invalidated on every write.
+"""
+db.listeners.append(responses.invalidate)
+
+serializer = get_serializer(os.environ.get("PEOPLE_JSON"))
+"""
+Serializer of the bodies of the responses: the json module, or orjson if the
+environment variable PEOPLE_JSON is set to orjson.
+"""
+
+profiler = Profiler()
+"""
+Profiler of the requests, turned on at runtime by the route POST /admin/profile.
 """
 
 from core.routes import *
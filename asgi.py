@@ -0,0 +1,14 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.async_routes import application
+
+"""
+ASGI entry point of the server, to use with an ASGI server such as uvicorn:
+
+    uvicorn asgi:application
+"""
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(application)
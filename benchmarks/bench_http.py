@@ -0,0 +1,131 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Load test a running server with many concurrent keep-alive connections, and
+report its throughput and latency percentiles.
+
+Usage, to compare the synchronous and the asynchronous servers:
+
+    PEOPLE_DB_PATH=people.db python3 app.py
+    python -m benchmarks.bench_http --url http://localhost:5000/people/bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de
+
+    PEOPLE_DB_PATH=people.db uvicorn asgi:application --port 8000
+    python -m benchmarks.bench_http --url http://localhost:8000/people/bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de
+"""
+
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import time
+
+
+def percentile(latencies: [float], rank: float) -> float:
+    """
+    Returns a percentile of sorted latencies.
+
+    :param latencies: The sorted latencies.
+    :type latencies: [float]
+    :param rank: The percentile, between 0 and 100.
+    :type rank: float
+    :return: The latency below which `rank` percent of the latencies are.
+    :rtype: float
+    """
+    if not latencies:
+        return float("nan")
+    return latencies[min(len(latencies) - 1, int(len(latencies) * rank / 100))]
+
+
+async def read_response(reader: asyncio.StreamReader) -> (int, bool):
+    """
+    Reads a HTTP response, which must have a Content-Length header.
+
+    :return: The status of the response, and whether the server keeps the
+        connection open.
+    :rtype: (int, bool)
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the server")
+    keep_alive = status_line.startswith(b"HTTP/1.1")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            keep_alive = value == "keep-alive"
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def client(url: str, deadline: float, latencies: [float], errors: list):
+    """
+    Sends requests one after the other on a keep-alive connection until the
+    deadline, reconnecting when the server closes the connection.
+    """
+    parts = urlsplit(url)
+    target = parts.path + ("?" + parts.query if parts.query else "")
+    request = "GET {} HTTP/1.1\r\nHost: {}\r\nConnection: keep-alive\r\n\r\n".format(
+        target, parts.netloc
+    ).encode("latin-1")
+
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname, parts.port or 80
+                )
+            start = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url: str, connections: int, duration: float) -> ([float], list):
+    """
+    Runs the load test.
+
+    :return: The sorted latencies, in seconds, and the errors.
+    """
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(client(url, deadline, latencies, errors) for i in range(connections))
+    )
+    return sorted(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    latencies, errors = asyncio.run(run(args.url, args.connections, args.duration))
+    print("requests:   {}".format(len(latencies)))
+    print("errors:     {}".format(len(errors)))
+    print("throughput: {:.0f} requests/s".format(len(latencies) / args.duration))
+    for rank in (50, 95, 99):
+        print("p{}:        {:.2f} ms".format(rank, percentile(latencies, rank) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
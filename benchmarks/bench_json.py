@@ -0,0 +1,91 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Measure the cost per row of building the body of `GET /people`: reading the rows
+and serializing them, with the former path (a `Person` per row, serialized with
+`json.dumps` through `Person.to_dict`) and with each serializer of
+`core.JsonSerializer`, which encode the rows as they are read.
+
+Usage:
+
+    python -m benchmarks.bench_json --sizes 10000 100000 1000000
+"""
+
+from benchmarks.fixtures import iter_fake_rows, seed_database
+from core.JsonSerializer import SERIALIZERS, get_serializer
+from core.PeopleDatabase import PeopleDatabase
+from core.Person import Person
+import argparse
+import json
+import time
+
+
+def measure(function, size: int, repeat: int) -> (float, float):
+    """
+    Call a function building a body, keeping the best time.
+
+    :return: The cost per row in nanoseconds, and the size of the body in bytes.
+    """
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        body = function()
+        best = min(best, time.perf_counter() - start)
+    return best / size * 1e9, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    serializers = []
+    for name in SERIALIZERS:
+        try:
+            serializers.append(get_serializer(name))
+        except ImportError:
+            print("{} is not installed, skipped".format(name))
+
+    print(
+        "{:>10} {:>22} {:>12} {:>14} {:>12}".format(
+            "rows", "path", "total (ns)", "encode (ns)", "body (MB)"
+        )
+    )
+    for size in args.sizes:
+        db = PeopleDatabase(cache_size=0)
+        seed_database(db, iter_fake_rows(size))
+        size = len(db.select_all_persons(as_tuples=True))
+
+        paths = [
+            (
+                "Person + json.dumps",
+                lambda: db.select_all_persons(),
+                lambda persons: (
+                    json.dumps(persons, default=Person.to_dict) + "\n"
+                ).encode("utf-8"),
+            )
+        ]
+        for serializer in serializers:
+            paths.append(
+                (
+                    "rows + " + serializer.name,
+                    lambda: db.select_all_persons(as_tuples=True),
+                    serializer.dumps_rows,
+                )
+            )
+
+        for name, select, encode in paths:
+            total, length = measure(lambda: encode(select()), size, args.repeat)
+            values = select()
+            encoding, length = measure(lambda: encode(values), size, args.repeat)
+            print(
+                "{:>10} {:>22} {:>12.0f} {:>14.0f} {:>12.1f}".format(
+                    size, name, total, encoding, length / 1e6
+                )
+            )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
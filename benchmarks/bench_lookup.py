@@ -0,0 +1,83 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Measure the latency of `select_person_by_id` and `select_person_by_email`
+against the size of the "persons" table, with and without the indexes.
+
+Usage:
+
+    python -m benchmarks.bench_lookup --sizes 1000 10000 100000 --lookups 200
+"""
+
+from benchmarks.fixtures import fake_rows, seed_database
+from core.PeopleDatabase import PeopleDatabase
+import argparse
+import random
+import time
+
+INDEXES = [
+    "persons_id_idx",
+    "persons_email_idx",
+    "persons_firstName_idx",
+    "persons_lastName_idx",
+]
+
+
+def measure(function, keys: [str]) -> float:
+    """
+    Call a lookup function on every key and return the mean latency in microseconds.
+    """
+    start = time.perf_counter()
+    for key in keys:
+        function(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def run(size: int, lookups: int, indexed: bool) -> (float, float):
+    """
+    Build a database of the given size and measure its lookup latencies.
+
+    The cache of the persons is disabled, otherwise the lookups by email would hit
+    the persons cached by the lookups by id.
+
+    :return: The mean latencies (in microseconds) by id and by email.
+    """
+    db = PeopleDatabase(cache_size=0)
+    if not indexed:
+        cursor = db.db_connection.cursor()
+        for index in INDEXES:
+            cursor.execute("DROP INDEX {};".format(index))
+    rows = fake_rows(size)
+    seed_database(db, rows)
+
+    sample = random.Random(1).sample(rows, min(lookups, size))
+    by_id = measure(db.select_person_by_id, [row[0] for row in sample])
+    by_email = measure(db.select_person_by_email, [row[3] for row in sample])
+    return by_id, by_email
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        "{:>10} {:>10} {:>14} {:>14}".format(
+            "rows", "indexes", "by id (us)", "by email (us)"
+        )
+    )
+    for size in args.sizes:
+        for indexed in (False, True):
+            by_id, by_email = run(size, args.lookups, indexed)
+            print(
+                "{:>10} {:>10} {:>14.1f} {:>14.1f}".format(
+                    size, "yes" if indexed else "no", by_id, by_email
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
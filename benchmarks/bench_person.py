@@ -0,0 +1,81 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Compare the memory and the time needed to build and serialize persons read from
+the database, between the slotted `Person` and the former `OrderedDict` subclass.
+
+Usage:
+
+    python -m benchmarks.bench_person --rows 100000
+"""
+
+from benchmarks.fixtures import fake_rows
+from collections import OrderedDict
+from core.Person import Person
+import argparse
+import json
+import time
+import tracemalloc
+
+
+class OrderedDictPerson(OrderedDict):
+    """
+    The former implementation of `Person`, kept for comparison.
+    """
+
+    def __init__(self, id, firstName, lastName, email, birthday):
+        super(OrderedDict, self).__init__()
+        self["id"] = id
+        self["firstName"] = firstName
+        self["lastName"] = lastName
+        self["email"] = email
+        self["birthday"] = birthday
+
+
+def measure(person_class, rows: [tuple], default=None) -> (float, float, float):
+    """
+    Build one person per row, then serialize them all.
+
+    :return: The memory used by the persons (in bytes per row), and the time needed
+        to build them and to serialize them (in microseconds per row).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    persons = [person_class(*row) for row in rows]
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    json.dumps(persons, default=default)
+    dump_time = time.perf_counter() - start
+
+    count = len(rows)
+    return memory / count, build_time / count * 1e6, dump_time / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = fake_rows(args.rows)
+    print(
+        "{:>16} {:>14} {:>14} {:>14}".format(
+            "class", "bytes/row", "build (us)", "dumps (us)"
+        )
+    )
+    for name, person_class, default in (
+        ("OrderedDict", OrderedDictPerson, None),
+        ("Person", Person, Person.to_dict),
+    ):
+        memory, build_time, dump_time = measure(person_class, rows, default)
+        print(
+            "{:>16} {:>14.0f} {:>14.2f} {:>14.2f}".format(
+                name, memory, build_time, dump_time
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Compare the latency of the search by name between the LIKE queries and the
+full-text index, against the size of the "persons" table.
+
+Usage:
+
+    python -m benchmarks.bench_search --sizes 10000 100000 --queries 100
+"""
+
+from benchmarks.fixtures import fake_rows, seed_database
+from core.PeopleDatabase import PeopleDatabase
+import argparse
+import random
+import time
+
+
+def measure(function, queries: [str]) -> float:
+    """
+    Call a search function on every query and return the mean latency in milliseconds.
+    """
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def like_infix(db: PeopleDatabase, name: str) -> list:
+    """
+    Search the persons whose firstName or lastName contains a string, with LIKE.
+    """
+    cursor = db.db_connection.cursor()
+    cursor.execute(
+        "SELECT * FROM persons WHERE firstName LIKE ? OR lastName LIKE ?;",
+        ("%" + name + "%", "%" + name + "%"),
+    )
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    print("{:>10} {:>24} {:>12}".format("rows", "query", "latency (ms)"))
+    for size in args.sizes:
+        db = PeopleDatabase()
+        rows = fake_rows(size)
+        seed_database(db, rows)
+        sample = random.Random(1).sample(rows, min(args.queries, size))
+        prefixes = [row[2][:3] for row in sample]
+        infixes = [row[2][1:4] for row in sample]
+        two_words = [row[1][:3] + " " + row[2][1:4] for row in sample]
+
+        for name, function, queries in (
+            ("LIKE prefix", db.select_persons_by_name_starting_with, prefixes),
+            ("full-text prefix", db.search_persons, prefixes),
+            ("LIKE infix", lambda query: like_infix(db, query), infixes),
+            ("full-text infix", db.search_persons, infixes),
+            ("full-text two words", db.search_persons, two_words),
+            (
+                "full-text ranked top 10",
+                lambda query: db.search_persons(query, 10, True),
+                infixes,
+            ),
+        ):
+            print(
+                "{:>10} {:>24} {:>12.3f}".format(size, name, measure(function, queries))
+            )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Measure the overhead of each query on the lookup by id, and what the statement cache
+of the connections saves.
+
+The lookups run on an on-disk database seeded with `--size` fake persons, with the
+cache of the persons disabled, so every call reaches SQLite. The variants compare:
+
+- `PeopleDatabase.select_person_by_id`, and the bare query it runs.
+- a cursor created for each query, or one cursor reused by every query.
+- the statement taken from the statement cache, or prepared for each query.
+- a multi-line SQL string, or a single-line one.
+- the lookups of 1 to 500 ids, with one statement per number of ids, which overflow
+  the statement cache, or with the lists padded to the next power of two by
+  `in_list`, whose statements stay cached.
+
+Usage:
+
+    python -m benchmarks.bench_statements --size 100000 --lookups 1000
+"""
+
+from benchmarks.fixtures import iter_fake_rows, seed_database
+from core.PeopleDatabase import QUERIES, QUERY_CHUNK_SIZE, PeopleDatabase, in_list
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import timeit
+
+MULTI_LINE = """
+            SELECT * FROM persons
+                WHERE id = ?;
+        """
+"""
+The query of the lookup by id, formatted over many lines.
+"""
+
+
+def measure(function, keys: list, repeat: int = 5) -> float:
+    """
+    Call a function on every key, and return the best mean latency in microseconds.
+    """
+    total = min(
+        timeit.repeat(lambda: [function(key) for key in keys], number=1, repeat=repeat)
+    )
+    return total / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "people.db")
+    db = PeopleDatabase(path, cache_size=0)
+    seed_database(db, iter_fake_rows(args.size, args.seed))
+    ids = [
+        row[0]
+        for row in db.db_connection.execute(
+            "SELECT id FROM persons ORDER BY random() LIMIT ?;", (args.lookups,)
+        )
+    ]
+    query = QUERIES["select_person_by_id"]
+
+    db_connection = db.db_connection
+    uncached = sqlite3.connect(path, cached_statements=0)
+    cursor = db_connection.cursor()
+    variants = [
+        ("select_person_by_id", db.select_person_by_id),
+        (
+            "new cursor, cached",
+            lambda id: db_connection.cursor().execute(query, (id,)).fetchone(),
+        ),
+        ("reused cursor, cached", lambda id: cursor.execute(query, (id,)).fetchone()),
+        (
+            "new cursor, multi-line",
+            lambda id: db_connection.cursor().execute(MULTI_LINE, (id,)).fetchone(),
+        ),
+        (
+            "new cursor, not cached",
+            lambda id: uncached.cursor().execute(query, (id,)).fetchone(),
+        ),
+    ]
+    print("{:>26} {:>10}".format("lookup by id", "us/query"))
+    for name, function in variants:
+        print("{:>26} {:>10.2f}".format(name, measure(function, ids)))
+
+    # Lists of ids of every length, in a random order, like the batches of lookups.
+    lengths = list(range(1, min(QUERY_CHUNK_SIZE, len(ids)) + 1))
+    random.Random(args.seed).shuffle(lengths)
+    batches = [ids[:length] for length in lengths]
+
+    def exact(chunk):
+        sql = "SELECT * FROM persons WHERE id IN ({});".format(
+            ", ".join("?" * len(chunk))
+        )
+        return db_connection.execute(sql, chunk).fetchall()
+
+    def padded(chunk):
+        placeholders, values = in_list(chunk)
+        sql = "SELECT * FROM persons WHERE id IN ({});".format(placeholders)
+        return db_connection.execute(sql, values).fetchall()
+
+    print("{:>26} {:>10}".format("lookup of 1-{} ids".format(len(batches)), "us/batch"))
+    for name, function in (("exact lists", exact), ("padded lists", padded)):
+        print("{:>26} {:>10.2f}".format(name, measure(function, batches, repeat=3)))
+
+    uncached.close()
+    db.close()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Compare the time needed to validate persons between `Person.verify_data` and
+`PersonValidator`, for valid and invalid persons.
+
+Usage:
+
+    python -m benchmarks.bench_validation --rows 100000
+"""
+
+from benchmarks.fixtures import fake_rows
+from core.Person import Person
+from core.PersonValidator import PersonValidator
+import argparse
+import time
+
+
+def measure(function, persons: [Person]) -> float:
+    """
+    Validate the persons and return the mean time in microseconds per person.
+    """
+    start = time.perf_counter()
+    function(persons)
+    return (time.perf_counter() - start) / len(persons) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    valid = [Person(*row) for row in fake_rows(args.rows)]
+    invalid = [
+        Person(row[0][:8], "W@lt", "", row[3], "1998-02-29")
+        for row in fake_rows(args.rows)
+    ]
+    validator = PersonValidator()
+
+    print("{:>10} {:>28} {:>12}".format("persons", "method", "time (us)"))
+    for name, persons in (("valid", valid), ("invalid", invalid)):
+        for method, function in (
+            ("Person.verify_data", lambda persons: [p.verify_data() for p in persons]),
+            (
+                "PersonValidator.validate",
+                lambda persons: [validator.validate(p) for p in persons],
+            ),
+            ("PersonValidator.validate_many", validator.validate_many),
+        ):
+            print(
+                "{:>10} {:>28} {:>12.2f}".format(
+                    name, method, measure(function, persons)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Replay a mixed workload against the application, and report the throughput and the
+latency percentiles of each endpoint, in a table and in a JSON file.
+
+The database is seeded with `--size` fake persons, then each thread sends requests
+through its own Flask test client, so the whole request handling is measured without
+the network. The weights of the endpoints in the workload are given by `--mix`.
+The results of two commits are compared with `--compare`.
+
+Usage:
+
+    python -m benchmarks.bench_workload --size 100000 --requests 20000 --output after.json
+    python -m benchmarks.bench_workload --size 100000 --requests 20000 --compare before.json
+
+Seeding millions of persons takes minutes, so the database can be kept in a file and
+reused by the next runs with `--db`:
+
+    python -m benchmarks.bench_workload --size 10000000 --db /tmp/people-10m.db
+"""
+
+from benchmarks.bench_http import percentile
+from benchmarks.fixtures import fake_row, iter_fake_rows, seed_database
+from core.Person import FIELDS
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+MIX = {
+    "get": 50,
+    "name": 10,
+    "search": 10,
+    "list": 10,
+    "post": 10,
+    "put": 5,
+    "delete": 5,
+}
+"""
+Default weights of the endpoints in the workload:
+
+- get: GET /people/:id of an existing person.
+- name: GET /people?name=:prefix with the first 3 letters of a first name.
+- search: GET /people/search?q=:words with 3 letters of a last name, 100 results at most.
+- list: GET /people?limit=100&after=:id, a page of the list.
+- post: POST /people of a new person.
+- put: PUT /people/:id of an existing person, with a new first name.
+- delete: DELETE /people/:id of a person created by the workload, or a POST if there
+  is none yet, so the size of the table stays stable.
+"""
+
+SAMPLE_SIZE = 1000
+"""
+Number of existing persons targeted by the requests.
+"""
+
+
+def parse_mix(value: str) -> dict:
+    """
+    Parse weights given as "get=50,post=10,...", the missing endpoints having no weight.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in MIX:
+            raise argparse.ArgumentTypeError("unknown endpoint: " + name)
+        mix[name] = int(weight)
+    return mix
+
+
+def prepare_database(path: str, size: int, seed: int):
+    """
+    Point the application to the database file, seeding it if it only holds the
+    default persons, and import the application.
+
+    :return: The Flask application and its database.
+    """
+    os.environ["PEOPLE_DB_PATH"] = path
+    from app import app, db
+
+    cursor = db.db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM persons;")
+    if cursor.fetchone()[0] <= 4 and size > 0:
+        start = time.perf_counter()
+        seed_database(db, iter_fake_rows(size, seed))
+        db.notify_write(None)
+        print("seeded {} persons in {:.1f} s".format(size, time.perf_counter() - start))
+    return app, db
+
+
+def sample_persons(db, count: int, seed: int) -> [tuple]:
+    """
+    Pick existing persons at random, without scanning the whole table.
+
+    :return: The rows (id, firstName, lastName, email, birthday) of the persons.
+    :rtype: [tuple]
+    """
+    cursor = db.db_connection.cursor()
+    cursor.execute("SELECT MAX(rowid) FROM persons;")
+    last = cursor.fetchone()[0]
+    rowids = random.Random(seed).sample(range(1, last + 1), min(count, last))
+    rows = []
+    for i in range(0, len(rowids), 500):
+        chunk = rowids[i : i + 500]
+        cursor.execute(
+            "SELECT id, firstName, lastName, email, birthday FROM persons WHERE rowid IN ({});".format(
+                ",".join("?" * len(chunk))
+            ),
+            chunk,
+        )
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+class Worker(threading.Thread):
+    """
+    A thread sending requests drawn from the workload, and recording the latency
+    and the status of each of them by endpoint.
+    """
+
+    def __init__(self, app, mix: dict, requests: int, persons: [tuple], sequence, seed):
+        super().__init__()
+        self.client = app.test_client()
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.requests = requests
+        self.persons = persons
+        self.sequence = sequence
+        self.rng = random.Random(seed)
+        self.created = []
+        self.latencies = {endpoint: [] for endpoint in MIX}
+        self.errors = {endpoint: 0 for endpoint in MIX}
+
+    def run(self):
+        for i in range(self.requests):
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            if endpoint == "delete" and not self.created:
+                endpoint = "post"
+            start = time.perf_counter()
+            status = getattr(self, "send_" + endpoint)()
+            self.latencies[endpoint].append(time.perf_counter() - start)
+            if status >= 400:
+                self.errors[endpoint] += 1
+
+    def send_get(self) -> int:
+        person = self.rng.choice(self.persons)
+        return self.client.get("/people/" + person[0]).status_code
+
+    def send_name(self) -> int:
+        person = self.rng.choice(self.persons)
+        return self.client.get(
+            "/people", query_string={"name": person[1][:3]}
+        ).status_code
+
+    def send_search(self) -> int:
+        person = self.rng.choice(self.persons)
+        query = {"q": person[2][-3:], "limit": 100}
+        return self.client.get("/people/search", query_string=query).status_code
+
+    def send_list(self) -> int:
+        person = self.rng.choice(self.persons)
+        query = {"limit": 100, "after": person[0]}
+        return self.client.get("/people", query_string=query).status_code
+
+    def send_post(self) -> int:
+        person = dict(zip(FIELDS, fake_row(next(self.sequence), self.rng)))
+        # The id and the email of the seeded rows only depend on the seed, so the
+        # ones of the new person are random, to stay unique between runs.
+        person["id"] = str(uuid.uuid4())
+        person["email"] = "workload{}@example.com".format(person["id"][:8])
+        response = self.client.post("/people", json=person)
+        if response.status_code < 300:
+            self.created.append(person["id"])
+        return response.status_code
+
+    def send_put(self) -> int:
+        person = self.rng.choice(self.persons)
+        name = self.rng.choice(("Alice", "Bob", "Carol", "Dave"))
+        return self.client.put(
+            "/people/" + person[0], json={"firstName": name}
+        ).status_code
+
+    def send_delete(self) -> int:
+        return self.client.delete("/people/" + self.created.pop()).status_code
+
+
+def summarize(latencies: [float], errors: int, duration: float) -> dict:
+    """
+    Compute the statistics of an endpoint.
+
+    :return: The number of requests and errors, the throughput in requests per second,
+        and the mean and the percentiles of the latency in milliseconds.
+    :rtype: dict
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / duration,
+        "mean": sum(latencies) / len(latencies) * 1e3 if latencies else float("nan"),
+        "p50": percentile(latencies, 50) * 1e3,
+        "p95": percentile(latencies, 95) * 1e3,
+        "p99": percentile(latencies, 99) * 1e3,
+    }
+
+
+def git_commit() -> str:
+    """
+    Returns the current commit of the repository, or None outside of a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(app, db, args) -> dict:
+    """
+    Run the workload, after a warm-up of a tenth of the requests.
+
+    :return: The parameters of the run and the statistics of each endpoint.
+    :rtype: dict
+    """
+    persons = sample_persons(db, SAMPLE_SIZE, args.seed)
+    sequence = itertools.count()
+
+    def replay(requests: int) -> ([Worker], float):
+        per_thread = requests // args.threads
+        workers = [
+            Worker(app, args.mix, per_thread, persons, sequence, args.seed + i)
+            for i in range(args.threads)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return workers, time.perf_counter() - start
+
+    replay(args.requests // 10)
+    workers, duration = replay(args.requests)
+
+    results = {}
+    for endpoint in MIX:
+        latencies = [l for worker in workers for l in worker.latencies[endpoint]]
+        if latencies:
+            errors = sum(worker.errors[endpoint] for worker in workers)
+            results[endpoint] = summarize(latencies, errors, duration)
+    latencies = [
+        l for worker in workers for ls in worker.latencies.values() for l in ls
+    ]
+    errors = sum(sum(worker.errors.values()) for worker in workers)
+    results["total"] = summarize(latencies, errors, duration)
+
+    return {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "size": args.size,
+        "requests": args.requests,
+        "threads": args.threads,
+        "mix": args.mix,
+        "seed": args.seed,
+        "duration": duration,
+        "results": results,
+    }
+
+
+def print_results(report: dict, baseline: dict = None):
+    """
+    Print the statistics of each endpoint, and their change against a baseline.
+    """
+    header = "{:>8} {:>9} {:>7} {:>11} {:>9} {:>9} {:>9}".format(
+        "endpoint",
+        "requests",
+        "errors",
+        "requests/s",
+        "p50 (ms)",
+        "p95 (ms)",
+        "p99 (ms)",
+    )
+    if baseline is not None:
+        for key in ("size", "threads", "mix"):
+            if baseline.get(key) != report[key]:
+                print(
+                    "warning: the baseline has another {}: {}".format(
+                        key, baseline.get(key)
+                    )
+                )
+        header += " {:>12} {:>9}".format("requests/s Δ", "p99 Δ")
+    print(header)
+    for endpoint, stats in report["results"].items():
+        line = "{:>8} {:>9} {:>7} {:>11.0f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+            endpoint,
+            stats["requests"],
+            stats["errors"],
+            stats["throughput"],
+            stats["p50"],
+            stats["p95"],
+            stats["p99"],
+        )
+        before = None if baseline is None else baseline["results"].get(endpoint)
+        if before is not None:
+            line += " {:>+11.1f}% {:>+8.1f}%".format(
+                (stats["throughput"] / before["throughput"] - 1) * 100,
+                (stats["p99"] / before["p99"] - 1) * 100,
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--mix", type=parse_mix, default=MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database file to seed or to reuse")
+    parser.add_argument("--output", help="file to write the results to, as JSON")
+    parser.add_argument("--compare", help="results of a previous run, as JSON")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.db or os.path.join(directory, "people.db")
+        app, db = prepare_database(path, args.size, args.seed)
+        report = run(app, db, args)
+        db.close()
+
+    print_results(report, baseline)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
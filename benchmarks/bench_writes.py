@@ -0,0 +1,133 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Measure the throughput of the write routes, and the number of SQL queries each
+write runs: POST /people of new persons, POST /people of persons whose email is
+taken, PUT /people/:id of one field, and DELETE /people/:id.
+
+The writes are sent by `--threads` threads, each through its own Flask test client,
+on an on-disk database seeded with `--size` fake persons, so each write is committed
+to the WAL like in production. The queries are counted by the metrics of the
+application, see `core.Metrics`, whose overhead is included in the throughput.
+
+With `--group-commit`, the concurrent writes are committed together by the writer
+thread of the database, flushed to the disk once per batch (synchronous FULL). To
+compare it with one durable commit per write, set `--synchronous FULL`.
+
+Usage:
+
+    python -m benchmarks.bench_writes --size 100000 --writes 2000
+    python -m benchmarks.bench_writes --writes 2000 --threads 16 --synchronous FULL
+    python -m benchmarks.bench_writes --writes 2000 --threads 16 --group-commit
+"""
+
+from benchmarks.bench_workload import prepare_database
+from benchmarks.fixtures import fake_row
+from concurrent.futures import ThreadPoolExecutor
+from core.ConnectionPool import PRAGMAS
+from core.Person import FIELDS
+import argparse
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+"""
+Number of SQL queries of a request, in its Server-Timing header.
+"""
+
+
+def measure(app, requests: list, threads: int) -> (float, float, int):
+    """
+    Send requests from many threads, counting the SQL queries they run.
+
+    :param requests: The method, the path and the JSON body of each request.
+    :param threads: The number of threads sending the requests.
+    :return: The number of requests per second, the number of queries per request,
+        and the number of errors.
+    """
+    local = threading.local()
+
+    def send(request):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        method, path, body = request
+        response = local.client.open(path, method=method, json=body)
+        queries = int(QUERIES.search(response.headers["Server-Timing"])[1])
+        return queries, response.status_code >= 300
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - start
+    queries = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    return len(requests) / elapsed, queries / len(requests), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--group-commit", action="store_true")
+    parser.add_argument(
+        "--synchronous",
+        choices=("NORMAL", "FULL"),
+        default=PRAGMAS["synchronous"],
+        help="synchronous pragma of the connections of the application",
+    )
+    args = parser.parse_args()
+
+    os.environ["PEOPLE_METRICS"] = "1"
+    if args.group_commit:
+        os.environ["PEOPLE_GROUP_COMMIT"] = "1"
+    PRAGMAS["synchronous"] = args.synchronous
+    directory = tempfile.TemporaryDirectory()
+    app, db = prepare_database(
+        os.path.join(directory.name, "people.db"), args.size, args.seed
+    )
+    rng = random.Random(args.seed)
+
+    persons = []
+    for i in range(args.writes):
+        person = dict(zip(FIELDS, fake_row(i, rng)))
+        person["id"] = str(uuid.uuid4())
+        person["email"] = "writes{}@example.com".format(person["id"][:8])
+        persons.append(person)
+    taken = [
+        dict(person, id=str(uuid.uuid4()), email=persons[0]["email"])
+        for person in persons
+    ]
+
+    workloads = [
+        ("POST", [("POST", "/people", person) for person in persons]),
+        ("POST (email taken)", [("POST", "/people", person) for person in taken]),
+        (
+            "PUT",
+            [
+                ("PUT", "/people/" + person["id"], {"firstName": "Updated"})
+                for person in persons
+            ],
+        ),
+        ("DELETE", [("DELETE", "/people/" + person["id"], None) for person in persons]),
+    ]
+
+    print("{:>20} {:>12} {:>12} {:>8}".format("route", "writes/s", "queries", "errors"))
+    for name, requests in workloads:
+        rate, queries, errors = measure(app, requests, args.threads)
+        # The conflicting writes are expected to fail.
+        if name.endswith("(email taken)"):
+            errors = len(requests) - errors
+        print("{:>20} {:>12.0f} {:>12.1f} {:>8}".format(name, rate, queries, errors))
+    db.close()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
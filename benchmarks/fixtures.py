@@ -0,0 +1,76 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from datetime import date, timedelta
+import random
+import string
+import uuid
+
+
+def fake_row(i: int, rng: random.Random) -> tuple:
+    """
+    Generate a valid person row (id, firstName, lastName, email, birthday).
+
+    :param i: A sequence number, used to keep the email addresses unique.
+    :type i: int
+    :param rng: The random generator to use.
+    :type rng: random.Random
+    :return: A tuple that passes the validation of `Person`.
+    :rtype: tuple
+    """
+    first_name = "".join(rng.choices(string.ascii_letters, k=rng.randint(3, 10)))
+    last_name = "".join(rng.choices(string.ascii_letters, k=rng.randint(3, 12)))
+    birthday = date(1930, 1, 1) + timedelta(days=rng.randint(0, 90 * 365))
+    return (
+        str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        first_name.capitalize(),
+        last_name.capitalize(),
+        "user{}@example.com".format(i),
+        birthday.isoformat(),
+    )
+
+
+def iter_fake_rows(count: int, seed: int = 0):
+    """
+    Generate valid and unique person rows one by one, so large tables can be seeded
+    without holding every row in memory.
+
+    :param count: The number of rows to generate.
+    :type count: int
+    :param seed: The seed of the random generator, for reproducible runs.
+    :type seed: int
+    :return: A generator of person rows.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        yield fake_row(i, rng)
+
+
+def fake_rows(count: int, seed: int = 0) -> [tuple]:
+    """
+    Generate a list of valid and unique person rows.
+
+    :param count: The number of rows to generate.
+    :type count: int
+    :param seed: The seed of the random generator, for reproducible runs.
+    :type seed: int
+    :return: A list of person rows.
+    :rtype: [tuple]
+    """
+    return list(iter_fake_rows(count, seed))
+
+
+def seed_database(db, rows: [tuple]):
+    """
+    Insert the given rows into the "persons" table of a `PeopleDatabase`.
+
+    :param db: The database to fill.
+    :type db: PeopleDatabase
+    :param rows: The rows to insert, a list or a generator.
+    :type rows: [tuple]
+    """
+    cursor = db.db_connection.cursor()
+    cursor.executemany(
+        "INSERT INTO persons (id, firstName, lastName, email, birthday) VALUES (?, ?, ?, ?, ?);",
+        rows,
+    )
+    db.db_connection.commit()
@@ -0,0 +1,70 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from concurrent.futures import ThreadPoolExecutor
+from core.Metrics import RequestStats, measured_by, task_stats
+from core.PeopleDatabase import PeopleDatabase
+import asyncio
+import functools
+
+
+class AsyncPeopleDatabase:
+    """
+    An asynchronous interface to a `PeopleDatabase`. Each method of the database
+    is available as a coroutine, which runs the method on a bounded pool of
+    threads, so the event loop never waits for SQLite. The queries are measured
+    for the request of the calling task, see `core.Metrics.task_stats`.
+
+    ivar db: the wrapped database.
+    ivar executor: the pool of threads running the queries.
+    """
+
+    def __init__(self, db: PeopleDatabase, max_workers: int = 8):
+        """
+        Initialize a new AsyncPeopleDatabase object.
+
+        :param db: The database to wrap.
+        :type db: PeopleDatabase
+        :param max_workers: The number of threads running the queries. Each of them
+            uses its own connection to an on-disk database.
+        :type max_workers: int
+        """
+        self.db = db
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="people-db"
+        )
+
+    def __getattr__(self, name: str):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def run_in_executor(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor,
+                run_measured,
+                task_stats.get(),
+                functools.partial(method, *args, **kwargs),
+            )
+
+        return run_in_executor
+
+    def close(self):
+        """
+        Stop the pool of threads, once the running queries are finished.
+        """
+        self.executor.shutdown(wait=True)
+
+
+def run_measured(stats: RequestStats, function):
+    """
+    Calls a function, adding its queries to the measures of a request.
+
+    :param stats: The measures of the request, or None.
+    :type stats: RequestStats
+    :param function: The function to call, without arguments.
+    :return: The result of the function.
+    """
+    with measured_by(stats):
+        return function()
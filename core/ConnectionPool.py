@@ -0,0 +1,179 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+import sqlite3
+import sys
+import threading
+
+MEMORY_PATH = ":memory:"
+"""
+Path of the in-memory database, which lives and dies with its single connection.
+"""
+
+FUNCTION_OPTIONS = {"deterministic": True} if sys.version_info >= (3, 8) else {}
+"""
+Options of the SQL functions registered on the connections. Python 3.7 cannot flag
+them as deterministic, which only prevents SQLite from using them in indexes.
+"""
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+}
+"""
+Pragmas applied to every connection to an on-disk database:
+
+- journal_mode: WAL lets readers run in parallel with the (single) writer.
+- synchronous: NORMAL is durable in WAL mode, except for the last transactions
+  on a power loss, and avoids one fsync per commit.
+- mmap_size: read the first 256 MiB of the database through memory-mapped I/O.
+- cache_size: 64 MiB of page cache per connection (negative values are in KiB).
+- temp_store: keep temporary tables and indexes in memory.
+"""
+
+
+class _Lease:
+    """
+    A connection checked out by a thread. It is stored in a thread-local
+    storage, so it is released when the thread finishes and the storage is
+    cleared, which gives the connection back to the pool.
+    """
+
+    def __init__(self, pool, connection: sqlite3.Connection):
+        self.pool = pool
+        self.connection = connection
+
+    def __del__(self):
+        self.pool.release(self.connection)
+
+
+class ConnectionPool:
+    """
+    A pool of connections to a SQLite database, giving each thread its own connection.
+
+    For an on-disk database, every thread reads through its own connection, so reads
+    run in parallel, while writes are serialized by `write_lock` (and by SQLite itself
+    across processes). An in-memory database only exists for the connection that
+    created it, so a single connection is shared by every thread in that case.
+
+    ivar path: the path of the database file, or ":memory:".
+    ivar functions: the SQL functions registered on each connection.
+    ivar write_lock: the lock to hold while writing into the database.
+    """
+
+    def __init__(
+        self,
+        path: str = MEMORY_PATH,
+        timeout: float = 5.0,
+        pragmas: dict = None,
+        max_idle: int = 16,
+        factory: type = sqlite3.Connection,
+        functions: dict = None,
+        cached_statements: int = 128,
+    ):
+        """
+        Initialize a new ConnectionPool object.
+
+        :param path: The path of the database file, or ":memory:".
+        :type path: str
+        :param timeout: How many seconds a connection waits for a lock held by another one.
+        :type timeout: float
+        :param pragmas: The pragmas applied to each connection, `PRAGMAS` by default.
+        :type pragmas: dict
+        :param max_idle: The maximum number of idle connections kept open.
+        :type max_idle: int
+        :param factory: The class of the connections, a subclass of `sqlite3.Connection`.
+        :type factory: type
+        :param functions: The deterministic SQL functions registered on each connection,
+            as pairs (number of arguments, Python function) by name.
+        :type functions: dict
+        :param cached_statements: The number of prepared statements cached by each
+            connection, reused when the same SQL string is executed again.
+        :type cached_statements: int
+        """
+        self.path = path
+        self.timeout = timeout
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.max_idle = max_idle
+        self.factory = factory
+        self.functions = {} if functions is None else functions
+        self.cached_statements = cached_statements
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._closed = False
+        self._shared = self.connect() if path == MEMORY_PATH else None
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Open a new connection to the database, outside of the pool.
+
+        :return: A configured database connection.
+        :rtype: sqlite3.Connection
+        :raises sqlite3.Error: If the connection cannot be established.
+        """
+        db_connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=self.factory,
+            cached_statements=self.cached_statements,
+        )
+        if self.path != MEMORY_PATH:
+            for name, value in self.pragmas.items():
+                db_connection.execute("PRAGMA {} = {};".format(name, value))
+        for name, (narg, function) in self.functions.items():
+            db_connection.create_function(name, narg, function, **FUNCTION_OPTIONS)
+        return db_connection
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the calling thread, taking one from the pool on first use.
+
+        :return: A database connection, only used by the calling thread.
+        :rtype: sqlite3.Connection
+        """
+        if self._shared is not None:
+            return self._shared
+
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            with self._idle_lock:
+                db_connection = self._idle.pop() if self._idle else None
+            if db_connection is None:
+                db_connection = self.connect()
+            lease = _Lease(self, db_connection)
+            self._local.lease = lease
+        return lease.connection
+
+    def release(self, db_connection: sqlite3.Connection):
+        """
+        Give a connection back to the pool, or close it if the pool is full or closed.
+
+        :param db_connection: The connection to release.
+        :type db_connection: sqlite3.Connection
+        """
+        if db_connection.in_transaction:
+            db_connection.rollback()
+        with self._idle_lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(db_connection)
+                return
+        db_connection.close()
+
+    def close(self):
+        """
+        Close the idle connections and the connection of the calling thread. The
+        connections still used by other threads are closed when they are released.
+        """
+        with self._idle_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for db_connection in idle:
+            db_connection.close()
+        if self._shared is not None:
+            self._shared.close()
+        self._local.__dict__.pop("lease", None)
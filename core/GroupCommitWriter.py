@@ -0,0 +1,208 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from concurrent.futures import Future
+from core.ConnectionPool import ConnectionPool
+from core.Metrics import RequestStats, current_stats, measured_by
+import queue
+import threading
+import time
+
+
+class GroupCommitWriter:
+    """
+    A thread writing into an on-disk database on behalf of the other threads, which
+    commits their writes together (group commit).
+
+    The writes submitted by concurrent threads are queued. The writer takes the
+    writes queued within `max_delay` seconds of the first one, at most `max_batch`
+    of them, and runs them in a single transaction, each within its own savepoint
+    so a failing write is rolled back alone. The transaction is committed with
+    synchronous FULL, so it is flushed to the disk once for the whole batch, and
+    only then are the submitting threads given their results: a write which
+    returned is durable, even on a power loss.
+
+    ivar pool: the pool of connections to the database, whose write lock is held
+        while a batch is written.
+    ivar max_delay: the number of seconds the writer waits for more writes after
+        the first one of a batch.
+    ivar max_batch: the maximum number of writes committed together.
+    """
+
+    def __init__(
+        self, pool: ConnectionPool, max_delay: float = 0.0, max_batch: int = 128
+    ):
+        """
+        Initialize a new GroupCommitWriter object, and start its thread.
+
+        :param pool: The pool of connections to the on-disk database.
+        :type pool: ConnectionPool
+        :param max_delay: The number of seconds to wait for more writes after the
+            first one of a batch. With 0, the writes queued meanwhile are committed
+            together, without waiting.
+        :type max_delay: float
+        :param max_batch: The maximum number of writes committed together.
+        :type max_batch: int
+        """
+        self.pool = pool
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self.run, name="people-db-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, operation):
+        """
+        Runs a write in the next batch, and waits until the batch is committed.
+
+        :param operation: A function writing into the database with the cursor it is
+            given, without committing. Its queries are measured on behalf of the
+            calling thread, see `core.Metrics`.
+        :return: The value returned by the function.
+        :raises sqlite3.Error: If the function raised it, or if the batch could not
+            be committed.
+        :raises RuntimeError: If the writer is closed, or if its thread stopped
+            before the write was run, caused by the error which stopped it if any.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed or not self._thread.is_alive():
+                error = RuntimeError("The writer of the database is closed.")
+                raise error from self._error
+            self._queue.put((operation, current_stats(), future))
+        return future.result()
+
+    def close(self):
+        """
+        Stop the thread of the writer, once the writes already queued are committed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def run(self):
+        """
+        Writes the batches until the writer is closed, with its own connection.
+        When the thread stops, even because of an error, the writer is closed and
+        the writes still queued fail with the error, so no submitting thread waits
+        forever.
+        """
+        db_connection = None
+        error = RuntimeError("The writer of the database stopped.")
+        try:
+            db_connection = self.pool.connect()
+            db_connection.execute("PRAGMA synchronous = FULL;")
+            closing = False
+            while not closing:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(remaining > 0, max(remaining, 0))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                self.write_batch(db_connection, batch)
+        except Exception as e:
+            self._error = e
+            error = RuntimeError("The writer of the database stopped: {}".format(e))
+            error.__cause__ = e
+        finally:
+            with self._lock:
+                self._closed = True
+            self.fail_pending(error)
+            if db_connection is not None:
+                db_connection.close()
+
+    def fail_pending(self, error: Exception):
+        """
+        Fails the writes still queued, once the writer is closed.
+
+        :param error: The exception raised by the writes.
+        :type error: Exception
+        """
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(error)
+
+    def write_batch(self, db_connection, batch: [tuple]):
+        """
+        Runs the writes of a batch in a single transaction, commits it, then gives
+        each submitting thread its result. If the transaction cannot be committed,
+        every write of the batch fails with the error.
+
+        :param db_connection: The connection of the writer.
+        :type db_connection: sqlite3.Connection
+        :param batch: The function, the measures of the request and the future of
+            each write.
+        :type batch: [tuple]
+        """
+        results = []
+        try:
+            with self.pool.write_lock:
+                cursor = db_connection.cursor()
+                cursor.execute("BEGIN IMMEDIATE;")
+                try:
+                    for operation, stats, future in batch:
+                        results.append(self.write(cursor, operation, stats))
+                    db_connection.commit()
+                except BaseException:
+                    db_connection.rollback()
+                    raise
+        except Exception as e:
+            for operation, stats, future in batch:
+                future.set_exception(e)
+            return
+
+        for (operation, stats, future), (result, error) in zip(batch, results):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    @staticmethod
+    def write(cursor, operation, stats: RequestStats) -> tuple:
+        """
+        Runs a write within a savepoint, rolled back if the write fails.
+
+        :param cursor: The cursor of the writer, within the transaction of the batch.
+        :param operation: The function writing into the database.
+        :param stats: The measures of the submitting request, or None.
+        :type stats: RequestStats
+        :return: The value returned by the function and None, or None and the
+            exception it raised.
+        :rtype: tuple
+        """
+        cursor.execute("SAVEPOINT write;")
+        measures = RequestStats() if stats is not None else None
+        try:
+            with measured_by(measures):
+                result = operation(cursor)
+        except Exception as e:
+            cursor.execute("ROLLBACK TO write;")
+            cursor.execute("RELEASE write;")
+            return None, e
+        finally:
+            if stats is not None:
+                stats.queries += measures.queries
+                stats.durations["sql"] += measures.durations["sql"]
+        cursor.execute("RELEASE write;")
+        return result, None
@@ -0,0 +1,182 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.Person import FIELDS, Person
+from json.encoder import encode_basestring_ascii
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PERSON_TEMPLATE = (
+    '{"id": %s, "firstName": %s, "lastName": %s, "email": %s, "birthday": %s}'
+)
+"""
+JSON representation of a person, with the same separators as `json.dumps`.
+"""
+
+
+class JsonSerializer:
+    """
+    A serializer of the bodies of the responses, based on the `json` module of the
+    standard library.
+
+    Besides any value containing persons, it serializes the rows read from the
+    "persons" table (see the parameter `as_tuples` of the queries of
+    `PeopleDatabase`) straight into JSON objects, without building a `Person` nor
+    a dictionary for each of them.
+
+    ivar name: the name of the serializer, see `SERIALIZERS`.
+    """
+
+    name = "json"
+
+    def loads(self, data):
+        """
+        Deserializes a JSON document.
+
+        :param data: The document.
+        :type data: bytes or str
+        :return: The decoded value.
+        :raises ValueError: If the document is not valid JSON.
+        """
+        return json.loads(data)
+
+    def dumps(self, value) -> bytes:
+        """
+        Serializes a value, which may contain persons.
+
+        :param value: The value to serialize.
+        :return: The JSON representation of the value, followed by a new line.
+        :rtype: bytes
+        """
+        return (json.dumps(value, default=Person.to_dict) + "\n").encode("utf-8")
+
+    def dumps_rows(self, rows: [tuple], fields: [str] = FIELDS) -> bytes:
+        """
+        Serializes rows (id, firstName, lastName, email, birthday) into a list of
+        persons, as `dumps` would serialize the list of the same persons.
+
+        :param rows: The rows to serialize.
+        :type rows: [tuple]
+        :param fields: The names of the columns of the rows, if they only hold some
+            of the attributes of the persons.
+        :type fields: [str]
+        :return: The JSON representation of the list, followed by a new line.
+        :rtype: bytes
+        """
+        quote = encode_basestring_ascii
+        if tuple(fields) != FIELDS:
+            template = "{" + ", ".join('"%s": %%s' % field for field in fields) + "}"
+            body = ", ".join(
+                [template % tuple([quote(value) for value in row]) for row in rows]
+            )
+            return ("[" + body + "]\n").encode("ascii")
+
+        body = ", ".join(
+            [
+                PERSON_TEMPLATE % (quote(a), quote(b), quote(c), quote(d), quote(e))
+                for a, b, c, d, e in rows
+            ]
+        )
+        return ("[" + body + "]\n").encode("ascii")
+
+    def dumps_lines(self, rows: [tuple]) -> bytes:
+        """
+        Serializes rows (id, firstName, lastName, email, birthday) into persons in
+        the NDJSON format, one JSON object per line.
+
+        :param rows: The rows to serialize.
+        :type rows: [tuple]
+        :return: The JSON representation of each person, followed by a new line.
+        :rtype: bytes
+        """
+        quote = encode_basestring_ascii
+        return "".join(
+            [
+                PERSON_TEMPLATE % (quote(a), quote(b), quote(c), quote(d), quote(e))
+                + "\n"
+                for a, b, c, d, e in rows
+            ]
+        ).encode("ascii")
+
+
+class OrjsonSerializer(JsonSerializer):
+    """
+    A serializer based on the package `orjson`, which encodes straight into bytes.
+    Its output is compact, without spaces after the separators, and not restricted
+    to ASCII.
+    """
+
+    name = "orjson"
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, value) -> bytes:
+        return orjson.dumps(
+            value, default=Person.to_dict, option=orjson.OPT_APPEND_NEWLINE
+        )
+
+    def dumps_rows(self, rows: [tuple], fields: [str] = FIELDS) -> bytes:
+        if tuple(fields) != FIELDS:
+            return orjson.dumps(
+                [dict(zip(fields, row)) for row in rows],
+                option=orjson.OPT_APPEND_NEWLINE,
+            )
+        return orjson.dumps(
+            [
+                {"id": a, "firstName": b, "lastName": c, "email": d, "birthday": e}
+                for a, b, c, d, e in rows
+            ],
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+
+    def dumps_lines(self, rows: [tuple]) -> bytes:
+        dumps, option = orjson.dumps, orjson.OPT_APPEND_NEWLINE
+        return b"".join(
+            [
+                dumps(
+                    {"id": a, "firstName": b, "lastName": c, "email": d, "birthday": e},
+                    option=option,
+                )
+                for a, b, c, d, e in rows
+            ]
+        )
+
+
+SERIALIZERS = {"json": JsonSerializer, "orjson": OrjsonSerializer}
+"""
+The available serializers, by name.
+"""
+
+FASTEST = "orjson" if orjson is not None else "json"
+"""
+The name of the fastest serializer installed. The serializers encode the same values
+into different bytes (e.g. orjson has no spaces after the separators and does not
+escape the non-ASCII characters), so it is only picked where the bytes do not
+matter, e.g. to decode the imported persons.
+"""
+
+
+def get_serializer(name: str = None) -> JsonSerializer:
+    """
+    Returns a serializer.
+
+    :param name: The name of the serializer, see `SERIALIZERS`. By default, the
+        json module, so the bodies of the responses are the same bytes whichever
+        packages are installed. orjson is opt-in.
+    :type name: str
+    :return: A new serializer.
+    :rtype: JsonSerializer
+    :raises ValueError: If the serializer is unknown.
+    :raises ImportError: If the package of the serializer is not installed.
+    """
+    if name is None:
+        name = "json"
+    if name not in SERIALIZERS:
+        raise ValueError("Unknown JSON serializer: {}".format(name))
+    if name == "orjson" and orjson is None:
+        raise ImportError("The JSON serializer orjson requires: pip install orjson")
+    return SERIALIZERS[name]()
@@ -0,0 +1,367 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import contextvars
+import sqlite3
+import threading
+import time
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+"""
+Upper bounds, in seconds, of the buckets of the latency histograms.
+"""
+
+PHASES = ("sql", "validation", "serialization")
+"""
+Parts of a request timed separately: the SQL queries, the validation of the
+persons received, and the serialization of the responses.
+"""
+
+HELP = {
+    "people_requests_total": ("counter", "Number of requests handled."),
+    "people_request_duration_seconds": (
+        "histogram",
+        "Time spent handling the requests.",
+    ),
+    "people_sql_queries_total": ("counter", "Number of SQL queries executed."),
+    "people_sql_duration_seconds": (
+        "histogram",
+        "Time spent in the SQL queries, per request.",
+    ),
+    "people_validation_duration_seconds": (
+        "histogram",
+        "Time spent validating persons, per request.",
+    ),
+    "people_serialization_duration_seconds": (
+        "histogram",
+        "Time spent serializing the responses, per request.",
+    ),
+}
+"""
+Type and description of each metric, in the order of the Prometheus output.
+"""
+
+_local = threading.local()
+
+task_stats = contextvars.ContextVar("task_stats", default=None)
+"""
+The measures of the request handled by the current asyncio task. The requests of
+the ASGI application share the thread of the event loop, so their measures follow
+the tasks instead, and are handed to the threads running their queries with
+`measured_by`.
+"""
+
+
+class RequestStats:
+    """
+    The measures of the request handled by the current thread.
+
+    ivar start: the time the request started, from `time.perf_counter`.
+    ivar queries: the number of SQL queries executed.
+    ivar durations: the number of seconds spent in each phase, see `PHASES`.
+    """
+
+    __slots__ = ("start", "queries", "durations")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(PHASES, 0.0)
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    Adds the time spent in the block to a phase of the current request. Nothing is
+    measured outside of a request, or when the metrics are disabled.
+
+    :param phase: The name of the phase, see `PHASES`.
+    :type phase: str
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.durations[phase] += time.perf_counter() - start
+
+
+def current_stats() -> RequestStats:
+    """
+    Returns the measures of the request handled by the current thread.
+
+    :return: The measures, or None outside of a request or when the metrics are disabled.
+    :rtype: RequestStats
+    """
+    return getattr(_local, "stats", None)
+
+
+@contextmanager
+def measured_by(stats: RequestStats):
+    """
+    Adds the queries and the timed code of the block to the measures of a request
+    handled by another thread, e.g. for a write run by a dedicated thread on behalf
+    of the request, while the request waits for it.
+
+    :param stats: The measures of the request, see `current_stats`, or None.
+    :type stats: RequestStats
+    """
+    previous = getattr(_local, "stats", None)
+    _local.stats = stats
+    try:
+        yield
+    finally:
+        _local.stats = previous
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor adding the number and the duration of its queries to the current
+    request. The time spent fetching the rows is counted with the query.
+    """
+
+    def execute(self, *args):
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return super().execute(*args)
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            stats.durations["sql"] += time.perf_counter() - start
+            stats.queries += 1
+
+    def executemany(self, *args):
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return super().executemany(*args)
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            stats.durations["sql"] += time.perf_counter() - start
+            stats.queries += 1
+
+    def fetchone(self):
+        with timed("sql"):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with timed("sql"):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with timed("sql"):
+            return super().fetchall()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors are instances of `InstrumentedCursor`.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+
+class Metrics:
+    """
+    Thread-safe metrics of the requests handled by the application: latency
+    histograms by route, and the number of SQL queries and the time spent in each
+    phase of the requests, rendered in the text format of Prometheus.
+
+    The measures of a request are collected between `start_request` and
+    `end_request`, by the code timed with `timed` and by the cursors of the
+    connections created with `InstrumentedConnection`.
+
+    ivar enabled: whether the requests are measured.
+    ivar buckets: the upper bounds of the buckets of the histograms.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: tuple = BUCKETS):
+        """
+        Initialize a new Metrics object.
+
+        :param enabled: Whether the requests are measured.
+        :type enabled: bool
+        :param buckets: The upper bounds, in seconds, of the buckets of the histograms.
+        :type buckets: tuple
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def start_request(self):
+        """
+        Starts measuring the request handled by the calling thread.
+        """
+        if self.enabled:
+            _local.stats = RequestStats()
+
+    def new_request(self) -> RequestStats:
+        """
+        Returns new measures for a request handled by an asyncio task, see
+        `task_stats`.
+
+        :return: The measures, or None if the metrics are disabled.
+        :rtype: RequestStats
+        """
+        return RequestStats() if self.enabled else None
+
+    def end_request(self, route: str, method: str, status: int) -> RequestStats:
+        """
+        Stops measuring the request handled by the calling thread, and records its
+        measures.
+
+        :param route: The rule of the route, such as "/people/<id>".
+        :type route: str
+        :param method: The HTTP method of the request.
+        :type method: str
+        :param status: The status code of the response.
+        :type status: int
+        :return: The measures of the request, or None if it was not measured.
+        :rtype: RequestStats
+        """
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return None
+        _local.stats = None
+        return self.record(stats, route, method, status)
+
+    def record(
+        self, stats: RequestStats, route: str, method: str, status: int
+    ) -> RequestStats:
+        """
+        Records the measures of a finished request.
+
+        :param stats: The measures of the request, or None.
+        :type stats: RequestStats
+        :param route: The rule of the route, such as "/people/<id>".
+        :type route: str
+        :param method: The HTTP method of the request.
+        :type method: str
+        :param status: The status code of the response.
+        :type status: int
+        :return: The measures of the request, or None if it was not measured.
+        :rtype: RequestStats
+        """
+        if stats is None:
+            return None
+        elapsed = time.perf_counter() - stats.start
+
+        route_labels = (("route", route),)
+        with self._lock:
+            self._increment(
+                "people_requests_total",
+                route_labels + (("method", method), ("status", str(status))),
+                1,
+            )
+            self._observe(
+                "people_request_duration_seconds",
+                route_labels + (("method", method),),
+                elapsed,
+            )
+            self._increment("people_sql_queries_total", route_labels, stats.queries)
+            for phase, duration in stats.durations.items():
+                self._observe(
+                    "people_{}_duration_seconds".format(phase), route_labels, duration
+                )
+        stats.durations["total"] = elapsed
+        return stats
+
+    @staticmethod
+    def server_timing(stats: RequestStats) -> str:
+        """
+        Formats the measures of a request as the value of a Server-Timing header,
+        with the durations in milliseconds.
+
+        :param stats: The measures returned by `end_request`.
+        :type stats: RequestStats
+        :return: The value of the header.
+        :rtype: str
+        """
+        timings = []
+        for phase, duration in stats.durations.items():
+            timing = "{};dur={:.3f}".format(phase, duration * 1e3)
+            if phase == "sql":
+                timing += ';desc="{} queries"'.format(stats.queries)
+            timings.append(timing)
+        return ", ".join(timings)
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the text format of Prometheus.
+
+        :return: The metrics, one sample per line.
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, description) in HELP.items():
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} {}".format(name, kind))
+                if kind == "counter":
+                    for labels, value in self._counters.get(name, {}).items():
+                        lines.append(
+                            "{}{} {}".format(name, format_labels(labels), value)
+                        )
+                    continue
+                for labels, (counts, total) in self._histograms.get(name, {}).items():
+                    cumulated = 0
+                    for bound, count in zip(self.buckets + ("+Inf",), counts):
+                        cumulated += count
+                        lines.append(
+                            "{}_bucket{} {}".format(
+                                name,
+                                format_labels(labels + (("le", bound),)),
+                                cumulated,
+                            )
+                        )
+                    lines.append(
+                        "{}_sum{} {}".format(name, format_labels(labels), total)
+                    )
+                    lines.append(
+                        "{}_count{} {}".format(name, format_labels(labels), cumulated)
+                    )
+        return "\n".join(lines) + "\n"
+
+    def _increment(self, name: str, labels: tuple, value: int):
+        counter = self._counters.setdefault(name, {})
+        counter[labels] = counter.get(labels, 0) + value
+
+    def _observe(self, name: str, labels: tuple, value: float):
+        histogram = self._histograms.setdefault(name, {})
+        counts, total = histogram.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+        counts[bisect_left(self.buckets, value)] += 1
+        histogram[labels] = (counts, total + value)
+
+
+def format_labels(labels: tuple) -> str:
+    """
+    Formats the labels of a sample, escaping their values.
+
+    :param labels: The pairs (name, value) of the labels.
+    :type labels: tuple
+    :return: The labels between braces.
+    :rtype: str
+    """
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace('"', '\\"')
+                .replace("\n", "\\n"),
+            )
+            for name, value in labels
+        )
+        + "}"
+    )
@@ -1,25 +1,418 @@
 # Author: Cyprien Borée boreec@tuta.io
 
-from core.Person import Person
+from core.ConnectionPool import ConnectionPool, MEMORY_PATH
+from core.GroupCommitWriter import GroupCommitWriter
+from core.Metrics import InstrumentedConnection
+from core.Person import FIELDS, Person, normalize_birthday, row_etag
+from core.PersonCache import PersonCache
 import sqlite3
 from sqlite3 import Error
 from collections import OrderedDict
+from datetime import date, timedelta
+import threading
+import time
+
+QUERY_CHUNK_SIZE = 500
+"""
+Maximum number of values bound to a single "IN (...)" list. Padded to 512 values by
+`in_list`, one list per statement stays below the limit of 999 variables per
+statement of the versions of SQLite older than 3.32, so a statement must not bind
+two of them.
+"""
+
+FILTERS = {
+    "birthday_from": "birthday >= ?",
+    "birthday_to": "birthday <= ?",
+    "age_min": "birthday <= ?",
+    "age_max": "birthday > ?",
+    "email_domain": "substr(email, instr(email, '@') + 1) = ? COLLATE NOCASE",
+    "lastName": "lastName = ? COLLATE NOCASE",
+}
+"""
+Conditions of the filters of `select_persons`, by name. Each of them is backed by
+an index, see `build_indexes`. The ages are compared through the birthdays, see
+`birthday_bound`.
+"""
+
+MONTH_DAY = "substr(birthday, 6)"
+"""
+Expression of the month and the day of the birthdays (MM-DD), indexed to look up
+the upcoming birthdays.
+"""
+
+AGE = "CAST(substr(?, 1, 4) AS INTEGER) - CAST(substr(birthday, 1, 4) AS INTEGER) - (substr(birthday, 6) > substr(?, 6))"
+"""
+Expression of the age of the persons, in full years, on the date bound twice as
+a parameter (in the format YYYY-MM-DD).
+"""
+
+SORT_COLUMNS = {
+    "id": "id",
+    "firstName": "firstName COLLATE NOCASE",
+    "lastName": "lastName COLLATE NOCASE",
+    "email": "email",
+    "birthday": "birthday",
+}
+"""
+Expressions the persons are sorted by, by field. The names are sorted regardless
+of their case, in the order of their indexes.
+"""
+
+
+QUERIES = {
+    "select_version": "SELECT version FROM persons_version;",
+    "is_empty": "SELECT EXISTS (SELECT 1 FROM persons);",
+    "select_short_birthdays": "SELECT rowid, birthday FROM persons WHERE length(birthday) < 10;",
+    "update_birthday": "UPDATE persons SET birthday = ? WHERE rowid = ?;",
+    "insert_person": "INSERT INTO persons (id, firstName, lastName, email, birthday) VALUES (?, ?, ?, ?, ?);",
+    "insert_person_or_ignore": "INSERT OR IGNORE INTO persons (id, firstName, lastName, email, birthday) VALUES (?, ?, ?, ?, ?);",
+    "select_all_persons": "SELECT * FROM persons;",
+    "select_all_persons_by_rowid": "SELECT * FROM persons ORDER BY rowid;",
+    "select_person_by_id": "SELECT * FROM persons WHERE id = ?;",
+    "select_person_by_email": "SELECT * FROM persons WHERE email = ?;",
+    "select_persons_by_name": "SELECT * FROM persons WHERE firstName LIKE ? OR lastName LIKE ? ORDER BY rowid;",
+    "update_person": "UPDATE persons SET firstName = ?, lastName = ?, email = ?, birthday = ? WHERE id = ?;",
+    "delete_person": "DELETE FROM persons WHERE id = ?;",
+    "delete_person_returning": "DELETE FROM persons WHERE id = ? RETURNING *;",
+}
+"""
+The static statements run on the "persons" table, by name. Each of them is defined
+once, as a single string, so every call executes the very same SQL string and reuses
+the statement prepared by the first one, from the statement cache of its connection.
+"""
+
+IN_LIST_LENGTHS = (QUERY_CHUNK_SIZE - 1).bit_length() + 1
+"""
+Number of distinct lengths of the "IN (...)" lists of values, see `in_list`.
+"""
+
+STATEMENT_CACHE_SIZE = len(QUERIES) + 4 * IN_LIST_LENGTHS + 128
+"""
+Number of prepared statements cached by each connection (`cached_statements`, 128 by
+default in the sqlite3 module): the statements of `QUERIES`, every length of the lists
+of `select_persons_by_ids`, `select_ages` and the two of `select_taken_ids_and_emails`
+(see `in_list`), and 128 statements for the combinations of filters, sorts and projections
+of `select_persons` and the bulk writes, so they do not evict the other statements
+from the cache.
+"""
+
+
+def in_list(values: list) -> (str, list):
+    """
+    Returns the placeholders of an "IN (...)" list of values, and the values bound to
+    them. The list is padded up to the next power of two by repeating its last value,
+    which does not change the result of "IN", so the lookups of any number of values
+    share a few statements, kept in the statement cache (see `STATEMENT_CACHE_SIZE`),
+    instead of preparing a new statement for each number of values.
+
+    :param values: The values, at most `QUERY_CHUNK_SIZE`.
+    :type values: list
+    :return: The placeholders, separated by commas, and the padded values.
+    :rtype: (str, list)
+    """
+    if not values:
+        return "", []
+    length = 1 << (len(values) - 1).bit_length()
+    return ", ".join("?" * length), values + values[-1:] * (length - len(values))
+
+
+UPDATABLE_FIELDS = ("firstName", "lastName", "email", "birthday")
+"""
+Names of the attributes of a person which can be updated, all but the id.
+"""
+
+
+def conflicting_field(error: sqlite3.IntegrityError) -> str:
+    """
+    Returns the field whose value is already taken, when a write failed on one of the
+    unique indexes of the "persons" table.
+
+    :param error: The error raised by the write.
+    :type error: sqlite3.IntegrityError
+    :return: The name of the field ("id" or "email"), or None if the error is not a
+        conflict on a unique index.
+    :rtype: str
+    """
+    message = str(error)
+    if not message.startswith("UNIQUE constraint failed: persons."):
+        return None
+    field = message.rsplit(".", 1)[1]
+    return field if field in ("id", "email") else None
+
+
+def birthday_bound(age: int, today: date) -> str:
+    """
+    Returns the latest birthday of the persons who are at least `age` years old on a
+    given date. It may not be a valid date (on February 29), but it compares with the
+    birthdays like one, since they are strings in the format YYYY-MM-DD.
+
+    :param age: The age, in full years.
+    :type age: int
+    :param today: The date the age is computed on.
+    :type today: date
+    :return: The birthday, in the format YYYY-MM-DD.
+    :rtype: str
+    """
+    return "{:04d}-{:02d}-{:02d}".format(today.year - age, today.month, today.day)
+
+
+def filter_conditions(filters: dict, today: date) -> ([str], list):
+    """
+    Returns the conditions of filters on the persons, see `FILTERS`, with their
+    parameters.
+
+    :param filters: The values of the filters, by name.
+    :type filters: dict
+    :param today: The date the ages are computed on.
+    :type today: date
+    :return: The SQL conditions, and the values bound to them.
+    :rtype: ([str], list)
+    :raises KeyError: If a filter is unknown.
+    """
+    conditions, parameters = [], []
+    for key, value in filters.items():
+        conditions.append(FILTERS[key])
+        if key == "age_min":
+            value = birthday_bound(value, today)
+        elif key == "age_max":
+            value = birthday_bound(value + 1, today)
+        parameters.append(value)
+    return conditions, parameters
 
 
 class PeopleDatabase:
     """
     A class representing a database for storing people.
-    ivar db_connection: a connection object to the database.
+    ivar pool: the pool of connections to the database.
+    ivar db_connection: the connection to the database of the calling thread.
+    ivar cache: the cache of the lookups of persons by id and by email.
+    ivar listeners: the functions called with the ids of the persons written
+        in the database, to invalidate the caches.
+    ivar last_modified: the time of the last write in the database.
+    ivar shared: whether other processes write in the database.
+    ivar version: the last version of the persons whose writes are known to the
+        caches, see `build_version_table`, or -1 if it is unknown.
+    ivar writer: the thread committing the writes of the persons together, or None
+        if each write is committed by its own thread.
+    ivar returning_enabled: whether the SQLite library supports the RETURNING
+        clause (version 3.35 and later), otherwise the written persons are selected
+        by separate queries.
+    ivar fts_enabled: whether the full-text index of the names is available, see
+        `build_search_index`.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        path: str = MEMORY_PATH,
+        cache_size: int = 10000,
+        cache_ttl: float = 60.0,
+        shared: bool = False,
+        instrumented: bool = False,
+        group_commit: bool = False,
+        group_commit_delay: float = 0.0,
+        group_commit_batch: int = 128,
+        seed: bool = True,
+    ):
         """
         Initialize a new PeopleDatabase object.
+
+        The 4 default persons are only inserted if the table is empty, so an
+        on-disk database keeps its data between two runs, and is initialized
+        once when many processes share it.
+
+        :param path: The path of the database file. By default, the database is
+            in memory and only lives during the runtime of the program.
+        :type path: str
+        :param cache_size: The maximum number of persons in the cache, 0 disables it.
+        :type cache_size: int
+        :param cache_ttl: The number of seconds a person stays in the cache.
+        :type cache_ttl: float
+        :param shared: Whether other processes write in the on-disk database, in
+            which case `refresh` must be called to detect their writes.
+        :type shared: bool
+        :param instrumented: Whether the queries are measured by `core.Metrics`.
+        :type instrumented: bool
+        :param group_commit: Whether the writes of the persons by concurrent threads
+            are committed together by a `GroupCommitWriter`, each of them returning
+            once flushed to the disk. Ignored for an in-memory database.
+        :type group_commit: bool
+        :param group_commit_delay: The number of seconds the writer waits for more
+            writes after the first one of a batch, see `GroupCommitWriter`.
+        :type group_commit_delay: float
+        :param group_commit_batch: The maximum number of writes committed together.
+        :type group_commit_batch: int
+        :param seed: Whether the 4 default persons are inserted in an empty table.
+        :type seed: bool
         """
 
-        self.db_connection = self.create_db_connection()
+        self.pool = ConnectionPool(
+            path,
+            factory=InstrumentedConnection if instrumented else sqlite3.Connection,
+            functions={"row_etag": (len(FIELDS), row_etag)},
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        self.cache = PersonCache(cache_size, cache_ttl)
+        self.listeners = [self.cache.invalidate]
+        self.last_modified = time.time()
+        self.shared = shared and path != MEMORY_PATH
+        self.returning_enabled = sqlite3.sqlite_version_info >= (3, 35, 0)
+        self.fts_enabled = False
+        self.version = -1
+        self._version_lock = threading.Lock()
+        self.writer = (
+            GroupCommitWriter(self.pool, group_commit_delay, group_commit_batch)
+            if group_commit and path != MEMORY_PATH
+            else None
+        )
         self.build_table()
-        self.create_persons()
+        if self.shared:
+            self.build_version_table()
+        if seed and self.is_empty():
+            self.create_persons()
+        if self.shared:
+            self.version = self.select_version(self.db_connection.cursor())
+
+    @property
+    def db_connection(self) -> sqlite3.Connection:
+        """
+        The connection to the database owned by the calling thread.
+        """
+        return self.pool.connection()
+
+    def close(self):
+        """
+        Close the connections to the database, once the queued writes are committed.
+        """
+        if self.writer is not None:
+            self.writer.close()
+        self.pool.close()
+
+    def execute_write(self, operation):
+        """
+        Runs a write within a transaction, and commits it. The write is rolled back
+        if it fails.
+
+        With group commit, the write is run by the writer thread, in the transaction
+        of a batch, and this method returns once the batch is committed. Otherwise
+        it is run and committed by the calling thread, holding the write lock.
+
+        In a shared database, the version of the persons is read before and after
+        the write, within its transaction, see `sync_version`.
+
+        :param operation: A function writing into the database with the cursor it is
+            given, without committing.
+        :return: The value returned by the function.
+        :raises sqlite3.Error: If an error occurs while writing into the database.
+        """
+        synced = False
+
+        def versioned(cursor):
+            nonlocal synced
+            # The transaction must hold the write lock before the version is read,
+            # otherwise another process could write in between, unnoticed.
+            if not cursor.connection.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE;")
+            before = self.select_version(cursor)
+            result = operation(cursor)
+            self.sync_version(before, self.select_version(cursor))
+            synced = True
+            return result
+
+        write = versioned if self.shared else operation
+        try:
+            if self.writer is not None:
+                return self.writer.submit(write)
+            with self.pool.write_lock:
+                db_connection = self.db_connection
+                try:
+                    result = write(db_connection.cursor())
+                    db_connection.commit()
+                except Error:
+                    db_connection.rollback()
+                    raise
+            return result
+        except Error:
+            if synced:
+                # The version was synced with a write which was rolled back, so the
+                # next writes will reuse its version.
+                with self._version_lock:
+                    self.version = -1
+            raise
+
+    def notify_write(self, ids: [str]):
+        """
+        Calls the listeners after persons were inserted, updated or deleted.
+
+        :param ids: The ids of the persons written in the database, or None if
+            they are unknown.
+        :type ids: [str]
+        """
+        self.last_modified = time.time()
+        for listener in self.listeners:
+            listener(ids)
+
+    def refresh(self):
+        """
+        Detects the writes of other processes in a shared database, and calls the
+        listeners if there were any since the last call, to invalidate the caches.
+
+        The version of the persons is increased by every write, of this process or
+        of another one, see `build_version_table`. The writes of this process move
+        `version` forward, so a greater version in the database means that another
+        process wrote in it. Since what it wrote is unknown, the listeners are
+        called with None.
+        """
+        if not self.shared:
+            return
+        self.sync_version(None, self.select_version(self.db_connection.cursor()))
+
+    def select_version(self, cursor) -> int:
+        """
+        Selects the version of the persons, see `build_version_table`.
+
+        :param cursor: The cursor to run the query with.
+        :return: The number of persons inserted, updated or deleted since the
+            database was created.
+        :rtype: int
+        """
+        cursor.execute(QUERIES["select_version"])
+        return cursor.fetchone()[0]
+
+    def sync_version(self, before: int, after: int):
+        """
+        Moves `version` forward to the version of the persons after some writes,
+        and calls the listeners with None if the version before them was not known,
+        because another process wrote in between.
+
+        The writes of this process call it within their transaction, where the
+        version cannot be changed by another process, and in the order of their
+        commits, since they hold the write lock or are run by the writer thread.
+        A version older than `version` was read before some writes of this process,
+        and is ignored.
+
+        :param before: The version before the writes, or None if it is unknown.
+        :type before: int
+        :param after: The version after the writes.
+        :type after: int
+        """
+        with self._version_lock:
+            if after <= self.version:
+                return
+            changed = before is None or before != self.version
+            self.version = after
+        if changed:
+            self.notify_write(None)
+
+    def is_empty(self) -> bool:
+        """
+        Check whether the "persons" table is empty.
+
+        :return: True if there is no person in the database.
+        :rtype: bool
+        """
+        cursor = self.db_connection.cursor()
+        cursor.execute(QUERIES["is_empty"])
+        return cursor.fetchone()[0] == 0
 
     def build_table(self):
         """
@@ -30,6 +423,15 @@ class PeopleDatabase:
         - lastName (text): The last name of the person.
         - email (text): The email address of the person.
         - birthday (text): The birthday of the person with the format YYYY-MM-DD.
+
+        The birthdays of an existing table are normalized, see `normalize_birthdays`,
+        then the indexes of the table are (re)built, see `build_indexes` and
+        `build_search_index`. A table which cannot be migrated fails the startup,
+        rather than being served without its unique indexes.
+
+        :raises sqlite3.IntegrityError: If the existing table contains duplicated ids
+            or emails.
+        :raises sqlite3.Error: If the table cannot be migrated.
         """
 
         sql_statement = """
@@ -48,27 +450,324 @@ class PeopleDatabase:
         except Error as e:
             print(e)
 
+        self.normalize_birthdays()
+        try:
+            self.build_indexes()
+        except sqlite3.IntegrityError as e:
+            raise sqlite3.IntegrityError(
+                "The persons table has duplicated ids or emails, which must be removed "
+                "before the unique indexes can be built ({}).".format(e)
+            ) from e
+        self.build_search_index()
+
+    def build_indexes(self):
+        """
+        Create the indexes of the "persons" table if they do not exist yet:
+
+        - persons_id_idx: unique index on id, acting as the primary key.
+        - persons_email_idx: unique index on email.
+        - persons_firstName_idx, persons_lastName_idx: case-insensitive indexes
+          used by the prefix search (SQLite's LIKE is case-insensitive, so the
+          indexes must use the NOCASE collation to be eligible).
+        - persons_birthday_idx: index on birthday, used by the ranges of birthdays.
+        - persons_email_domain_idx: case-insensitive index on the domain of the
+          emails (the part after the "@").
+        - persons_birthday_md_idx: index on the month and the day of the birthdays
+          (see `MONTH_DAY`), used by the upcoming birthdays.
+
+        Since every statement is idempotent, calling this method on a table created
+        by a previous version of the application migrates it in place.
+
+        :raises sqlite3.IntegrityError: If the existing table contains duplicated ids or emails.
+        """
+        sql_statements = [
+            "CREATE UNIQUE INDEX IF NOT EXISTS persons_id_idx ON persons (id);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS persons_email_idx ON persons (email);",
+            "CREATE INDEX IF NOT EXISTS persons_firstName_idx ON persons (firstName COLLATE NOCASE);",
+            "CREATE INDEX IF NOT EXISTS persons_lastName_idx ON persons (lastName COLLATE NOCASE);",
+            "CREATE INDEX IF NOT EXISTS persons_birthday_idx ON persons (birthday);",
+            "CREATE INDEX IF NOT EXISTS persons_email_domain_idx ON persons (substr(email, instr(email, '@') + 1) COLLATE NOCASE);",
+            "CREATE INDEX IF NOT EXISTS persons_birthday_md_idx ON persons ({});".format(
+                MONTH_DAY
+            ),
+        ]
+
+        with self.pool.write_lock:
+            cursor = self.db_connection.cursor()
+            for sql_statement in sql_statements:
+                cursor.execute(sql_statement)
+            self.db_connection.commit()
+
+    def build_search_index(self):
+        """
+        Create the full-text index "persons_fts" on the names of the persons, if it
+        does not exist yet. It is a FTS5 table using the trigram tokenizer, so it
+        matches any part of a name of at least 3 characters, and it is kept in sync
+        with the "persons" table by triggers. When the index is created for an
+        existing table, it is filled with the persons already in the table.
+
+        If the SQLite library was compiled without FTS5, the attribute `fts_enabled`
+        is set to False and `search_persons` falls back to plain LIKE queries.
+        """
+        sql_statements = [
+            """CREATE VIRTUAL TABLE IF NOT EXISTS persons_fts USING fts5(
+                firstName, lastName, content='persons', content_rowid='rowid', tokenize='trigram'
+            );""",
+            "INSERT INTO persons_fts(persons_fts) VALUES ('rebuild');",
+        ]
+        trigger_statements = [
+            """CREATE TRIGGER IF NOT EXISTS persons_fts_insert AFTER INSERT ON persons BEGIN
+                INSERT INTO persons_fts (rowid, firstName, lastName)
+                    VALUES (new.rowid, new.firstName, new.lastName);
+            END;""",
+            """CREATE TRIGGER IF NOT EXISTS persons_fts_delete AFTER DELETE ON persons BEGIN
+                INSERT INTO persons_fts (persons_fts, rowid, firstName, lastName)
+                    VALUES ('delete', old.rowid, old.firstName, old.lastName);
+            END;""",
+            """CREATE TRIGGER IF NOT EXISTS persons_fts_update AFTER UPDATE OF firstName, lastName ON persons BEGIN
+                INSERT INTO persons_fts (persons_fts, rowid, firstName, lastName)
+                    VALUES ('delete', old.rowid, old.firstName, old.lastName);
+                INSERT INTO persons_fts (rowid, firstName, lastName)
+                    VALUES (new.rowid, new.firstName, new.lastName);
+            END;""",
+        ]
+
+        with self.pool.write_lock:
+            cursor = self.db_connection.cursor()
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'persons_fts';"
+            )
+            try:
+                if cursor.fetchone() == None:
+                    for sql_statement in sql_statements:
+                        cursor.execute(sql_statement)
+                for sql_statement in trigger_statements:
+                    cursor.execute(sql_statement)
+                self.db_connection.commit()
+                self.fts_enabled = True
+            except sqlite3.OperationalError:
+                self.db_connection.rollback()
+                self.fts_enabled = False
+
+    def build_version_table(self, create: bool = True):
+        """
+        Create the table "persons_version" if it does not exist yet. Its single row
+        holds the version of the persons, a counter increased by triggers for every
+        person inserted, updated or deleted, by any connection. Unlike the data
+        version of SQLite, which only tells a connection that others wrote, it
+        tells apart the writes of this process from the writes of the others
+        sharing the database, see `refresh`.
+
+        If the triggers of an existing table were dropped, see
+        `drop_deferred_indexes`, the persons may have been written without
+        increasing the version, so it is increased once when they are restored.
+
+        :param create: Whether the table is created if it does not exist yet,
+            otherwise only the triggers of an existing table are restored.
+        :type create: bool
+        """
+        triggers = {
+            "persons_version_" + operation.lower(): operation
+            for operation in ("INSERT", "UPDATE", "DELETE")
+        }
+
+        with self.pool.write_lock:
+            cursor = self.db_connection.cursor()
+            cursor.execute(
+                "SELECT type, name FROM sqlite_master WHERE name = 'persons_version' OR name IN ({});".format(
+                    ", ".join("?" * len(triggers))
+                ),
+                list(triggers),
+            )
+            existing = cursor.fetchall()
+            if ("table", "persons_version") not in existing:
+                if not create:
+                    return
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS persons_version (version INTEGER NOT NULL);"
+                )
+                cursor.execute(
+                    "INSERT INTO persons_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM persons_version);"
+                )
+            elif len(existing) <= len(triggers):
+                cursor.execute("UPDATE persons_version SET version = version + 1;")
+            for name, operation in triggers.items():
+                cursor.execute(
+                    """CREATE TRIGGER IF NOT EXISTS {} AFTER {} ON persons BEGIN
+                        UPDATE persons_version SET version = version + 1;
+                    END;""".format(name, operation)
+                )
+            self.db_connection.commit()
+
+    def normalize_birthdays(self):
+        """
+        Rewrite the birthdays stored without a zero-padded month or day (e.g.
+        "1997-1-1") in the format YYYY-MM-DD, see `Person.normalize_birthday`. The
+        persons are written with normalized birthdays, so this only migrates the
+        tables filled by a previous version of the application.
+        """
+        with self.pool.write_lock:
+            cursor = self.db_connection.cursor()
+            cursor.execute(QUERIES["select_short_birthdays"])
+            rows = cursor.fetchall()
+            if rows:
+                cursor.executemany(
+                    QUERIES["update_birthday"],
+                    [(normalize_birthday(birthday), rowid) for rowid, birthday in rows],
+                )
+            self.db_connection.commit()
+
+    def drop_deferred_indexes(self):
+        """
+        Drop the indexes which are not needed to insert persons: the indexes on the
+        names, the birthdays and the domains of the emails, the full-text index
+        with its triggers, and the triggers of the version of the persons. Loading
+        many persons is faster when these indexes are built once afterwards, by
+        `build_indexes`, `build_search_index` and `build_version_table`, rather than
+        updated for each person.
+
+        The unique indexes on the ids and the emails are kept, since they are used
+        to find the duplicates.
+        """
+        sql_statements = [
+            "DROP INDEX IF EXISTS persons_firstName_idx;",
+            "DROP INDEX IF EXISTS persons_lastName_idx;",
+            "DROP INDEX IF EXISTS persons_birthday_idx;",
+            "DROP INDEX IF EXISTS persons_email_domain_idx;",
+            "DROP INDEX IF EXISTS persons_birthday_md_idx;",
+            "DROP TRIGGER IF EXISTS persons_fts_insert;",
+            "DROP TRIGGER IF EXISTS persons_fts_delete;",
+            "DROP TRIGGER IF EXISTS persons_fts_update;",
+            "DROP TABLE IF EXISTS persons_fts;",
+            "DROP TRIGGER IF EXISTS persons_version_insert;",
+            "DROP TRIGGER IF EXISTS persons_version_update;",
+            "DROP TRIGGER IF EXISTS persons_version_delete;",
+        ]
+
+        with self.pool.write_lock:
+            cursor = self.db_connection.cursor()
+            for sql_statement in sql_statements:
+                cursor.execute(sql_statement)
+            self.db_connection.commit()
+
     def create_person(self, person: Person):
         """
-        Inserts a new person into the database.
+        Inserts a new person into the database. Its birthday is normalized in the
+        format YYYY-MM-DD beforehand.
+
+        The uniqueness of the id and of the email is checked by the unique indexes
+        within the insertion itself, so no other query is needed and no concurrent
+        write can take them in between. See `conflicting_field` to find out which
+        one is taken.
 
         :param person: The person object to insert.
         :type person: Person
+        :raises sqlite3.IntegrityError: If the id or the email is already taken.
         :raises sqlite3.Error: If an error occurs while inserting the person into the database.
         """
-        sql_statement = """
-            INSERT INTO persons (id, firstName, lastName, email, birthday) 
-                VALUES (?, ?, ?, ?, ?);
+        person.birthday = normalize_birthday(person["birthday"])
+        self.execute_write(
+            lambda cursor: cursor.execute(QUERIES["insert_person"], person.to_tuple())
+        )
+        self.notify_write([person["id"]])
+
+    def insert_persons(self, persons: [Person]) -> [str]:
         """
+        Inserts many persons into the database within a single transaction.
+        Persons whose id or email is already taken, in the database or by a previous
+        person of the list, are skipped. The duplicates are looked up with set-based
+        queries before the insertion, within its transaction (see `execute_write`).
+        The birthdays are normalized in the format YYYY-MM-DD beforehand.
 
-        cursor = self.db_connection.cursor()
-        cursor.execute(sql_statement, person.to_tuple())
-        self.db_connection.commit()
+        :param persons: The person objects to insert.
+        :type persons: [Person]
+        :return: For each person, None if it was inserted, otherwise the name of the
+            field ("id" or "email") that is already taken.
+        :rtype: [str]
+        :raises sqlite3.Error: If an error occurs while inserting the persons, in which
+            case none of them is inserted.
+        """
+        for person in persons:
+            person.birthday = normalize_birthday(person["birthday"])
+
+        def insert(cursor) -> [str]:
+            taken_ids, taken_emails = self.select_taken_ids_and_emails(
+                [person["id"] for person in persons],
+                [person["email"] for person in persons],
+                cursor,
+            )
+            conflicts = []
+            for person in persons:
+                if person["id"] in taken_ids:
+                    conflicts.append("id")
+                elif person["email"] in taken_emails:
+                    conflicts.append("email")
+                else:
+                    conflicts.append(None)
+                    taken_ids.add(person["id"])
+                    taken_emails.add(person["email"])
+            cursor.executemany(
+                QUERIES["insert_person"],
+                (
+                    person.to_tuple()
+                    for person, conflict in zip(persons, conflicts)
+                    if conflict is None
+                ),
+            )
+            return conflicts
+
+        conflicts = self.execute_write(insert)
+        self.notify_write(
+            [
+                person["id"]
+                for person, conflict in zip(persons, conflicts)
+                if conflict is None
+            ]
+        )
+        return conflicts
+
+    def select_taken_ids_and_emails(
+        self, ids: [str], emails: [str], cursor=None
+    ) -> (set, set):
+        """
+        Selects which of the given ids and emails are already used in the database,
+        with one query per chunk of ids and per chunk of emails instead of two
+        queries per person. Each query binds a single chunk, so it stays below the
+        limit of variables per statement.
+
+        :param ids: The ids to look up.
+        :type ids: [str]
+        :param emails: The emails to look up.
+        :type emails: [str]
+        :param cursor: The cursor to run the queries with, e.g. within a write, or
+            None for a cursor of the connection of the calling thread.
+        :return: The sets of ids and of emails taken by the persons found in the database.
+        :rtype: (set, set)
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        taken_ids, taken_emails = set(), set()
+        if cursor is None:
+            cursor = self.db_connection.cursor()
+        for column, values, taken in (
+            ("id", ids, taken_ids),
+            ("email", emails, taken_emails),
+        ):
+            for start in range(0, len(values), QUERY_CHUNK_SIZE):
+                placeholders, chunk = in_list(values[start : start + QUERY_CHUNK_SIZE])
+                cursor.execute(
+                    "SELECT {0} FROM persons WHERE {0} IN ({1});".format(
+                        column, placeholders
+                    ),
+                    chunk,
+                )
+                taken.update(row[0] for row in cursor.fetchall())
+        return taken_ids, taken_emails
 
     def create_persons(self):
         """
         Inserts 4 new persons in the database to perform basic operations
-        on them during runtime.
+        on them during runtime. They are inserted in a single transaction, and
+        skipped if they already exist, in case many processes run it at once.
 
         :raises sqlite3.Error: if an error occurs while inserting the person into the database.
         """
@@ -100,30 +799,126 @@ class PeopleDatabase:
             "ashleyyu@example.com",
             "2003-12-24",
         )
-        self.create_person(p1)
-        self.create_person(p2)
-        self.create_person(p3)
-        self.create_person(p4)
+        self.execute_write(
+            lambda cursor: cursor.executemany(
+                QUERIES["insert_person_or_ignore"],
+                [p.to_tuple() for p in (p1, p2, p3, p4)],
+            )
+        )
+        self.notify_write([p1["id"], p2["id"], p3["id"], p4["id"]])
 
-    def select_all_persons(self) -> [Person]:
+    def select_all_persons(self, as_tuples: bool = False) -> [Person]:
         """
         Selects all persons from the database.
 
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
         :return: A list of all persons in the database.
         :rtype: [Person]
         :raises sqlite3.Error: If an error occurs while querying the database.
         """
         cursor = self.db_connection.cursor()
-        cursor.execute("SELECT * FROM persons;")
+        cursor.execute(QUERIES["select_all_persons"])
         rows = cursor.fetchall()
+        if as_tuples:
+            return rows
 
         persons = []
         for row in rows:
-            p = Person(row[0], row[1], row[2], row[3], row[4])
+            p = Person(*row)
             persons.append(p)
 
         return persons
 
+    def select_persons_page(
+        self, limit: int, after: str = None, name: str = None, as_tuples: bool = False
+    ) -> [Person]:
+        """
+        Selects a page of persons from the database, sorted by id. The pagination
+        relies on the id of the last person of the previous page (keyset pagination),
+        so each page is read through the index on the ids whatever its position.
+
+        :param limit: The maximum number of persons in the page.
+        :type limit: int
+        :param after: The id of the last person of the previous page, or None for the first page.
+        :type after: str
+        :param name: If given, only select persons whose firstName or lastName starts with it.
+        :type name: str
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
+        :return: A list of at most `limit` persons.
+        :rtype: [Person]
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        sql_statement = "SELECT * FROM persons WHERE id > ?"
+        parameters = [after if after is not None else ""]
+        if name is not None:
+            sql_statement += " AND (firstName LIKE ? OR lastName LIKE ?)"
+            parameters += [name + "%", name + "%"]
+        sql_statement += " ORDER BY id LIMIT ?;"
+        parameters.append(limit)
+
+        cursor = self.db_connection.cursor()
+        cursor.execute(sql_statement, parameters)
+        rows = cursor.fetchall()
+        return rows if as_tuples else [Person(*row) for row in rows]
+
+    def iter_all_persons(self, batch_size: int = 500, as_tuples: bool = False):
+        """
+        Iterates over all persons of the database by batches, so that only one batch
+        is held in memory at a time.
+
+        :param batch_size: The number of persons fetched at once.
+        :type batch_size: int
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
+        :return: A generator of lists of at most `batch_size` persons.
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        cursor = self.db_connection.cursor()
+        cursor.execute(QUERIES["select_all_persons"])
+        rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield rows if as_tuples else [Person(*row) for row in rows]
+            rows = cursor.fetchmany(batch_size)
+
+    def export_persons(self, batch_size: int = 1000):
+        """
+        Iterates over the rows of all persons by batches, read from a consistent
+        snapshot of the database, so only one batch is held in memory at a time and
+        the persons written meanwhile by other connections are not seen.
+
+        For an on-disk database, the rows are read within a read transaction of a
+        connection opened for the export, which does not block the writers in WAL
+        mode. An in-memory database has a single connection, so the export is only
+        consistent if nothing is written before it ends.
+
+        :param batch_size: The number of rows fetched at once.
+        :type batch_size: int
+        :return: A generator of lists of at most `batch_size` rows
+            (id, firstName, lastName, email, birthday).
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        if self.pool.path == MEMORY_PATH:
+            yield from self.iter_all_persons(batch_size, as_tuples=True)
+            return
+
+        db_connection = self.pool.connect()
+        try:
+            cursor = db_connection.cursor()
+            cursor.execute("BEGIN;")
+            cursor.execute(QUERIES["select_all_persons_by_rowid"])
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            db_connection.rollback()
+            db_connection.close()
+
     def select_person_by_id(self, id: str) -> Person:
         """
         Selects a person from the database by their id.
@@ -133,11 +928,53 @@ class PeopleDatabase:
         :return: The person with the specified email address, or None if not found.
         :raises sqlite3.Error: If an error occurs while querying the database.
         """
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT * FROM persons WHERE id = ?", (id,))
-        row = cursor.fetchone()
+        row = self.cache.get_by_id(id)
+        if row == None:
+            token = self.cache.token()
+            cursor = self.db_connection.cursor()
+            cursor.execute(QUERIES["select_person_by_id"], (id,))
+            row = cursor.fetchone()
+            if row != None:
+                self.cache.put(row, token)
+
+        return None if row == None else Person(*row)
+
+    def select_persons_by_ids(self, ids: [str], as_tuples: bool = False) -> list:
+        """
+        Selects many persons from the database by their ids. The persons are looked
+        up in the cache first, then the other ones are read with one query per chunk
+        of ids, through the index on the ids, and cached.
 
-        return None if row == None else Person(row[0], row[1], row[2], row[3], row[4])
+        :param ids: The ids to search for.
+        :type ids: [str]
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
+        :return: For each id, in the same order, the person with this id, or None
+            if not found.
+        :rtype: list
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        rows = self.cache.get_many(ids)
+        missing = [id for id in dict.fromkeys(ids) if id not in rows]
+        if missing:
+            token = self.cache.token()
+            cursor = self.db_connection.cursor()
+            found = []
+            for i in range(0, len(missing), QUERY_CHUNK_SIZE):
+                placeholders, chunk = in_list(missing[i : i + QUERY_CHUNK_SIZE])
+                cursor.execute(
+                    "SELECT * FROM persons WHERE id IN ({});".format(placeholders),
+                    chunk,
+                )
+                found += cursor.fetchall()
+            self.cache.put_many(found, token)
+            rows.update((row[0], row) for row in found)
+
+        rows = [rows.get(id) for id in ids]
+        if as_tuples:
+            return rows
+        return [None if row == None else Person(*row) for row in rows]
 
     def select_person_by_email(self, email: str) -> Person:
         """
@@ -148,13 +985,20 @@ class PeopleDatabase:
         :return: The person with the specified email address, or None if not found.
         :raises sqlite3.Error: If an error occurs while querying the database.
         """
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT * FROM persons WHERE email = ?", (email,))
-        row = cursor.fetchone()
+        row = self.cache.get_by_email(email)
+        if row == None:
+            token = self.cache.token()
+            cursor = self.db_connection.cursor()
+            cursor.execute(QUERIES["select_person_by_email"], (email,))
+            row = cursor.fetchone()
+            if row != None:
+                self.cache.put(row, token)
 
-        return None if row == None else Person(row[0], row[1], row[2], row[3], row[4])
+        return None if row == None else Person(*row)
 
-    def select_persons_by_name_starting_with(self, name: str) -> [Person]:
+    def select_persons_by_name_starting_with(
+        self, name: str, as_tuples: bool = False
+    ) -> [Person]:
         """
         Selects persons from the database whose firstName or lastName starts with a given string.
         If the given string has no match, an empty list is returned.
@@ -162,55 +1006,587 @@ class PeopleDatabase:
 
         :param name: The string to match against the beginning of the first name.
         :type name: str
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
         :return: A list of persons whose firstName or lastName starts with the given string.
         :rtype: [Person]
         :raises sqlite3.Error: If an error occurs while querying the database.
         """
         cursor = self.db_connection.cursor()
-        cursor.execute(
-            "SELECT * FROM persons WHERE firstName LIKE ? OR lastName LIKE ?;",
-            (
-                name + "%",
-                name + "%",
-            ),
-        )
+        cursor.execute(QUERIES["select_persons_by_name"], (name + "%", name + "%"))
         rows = cursor.fetchall()
+        if as_tuples:
+            return rows
         persons = []
         for row in rows:
-            p = Person(row[0], row[1], row[2], row[3], row[4])
+            p = Person(*row)
             persons.append(p)
 
         return persons
 
+    def select_persons(
+        self,
+        filters: dict = None,
+        name: str = None,
+        sort: [str] = None,
+        fields: [str] = FIELDS,
+        limit: int = None,
+        after: str = None,
+        today: date = None,
+    ) -> [tuple]:
+        """
+        Selects the rows of the persons matching filters, with only some of their
+        columns. The filters are bound as parameters of the query, and each of them
+        is looked up through its index.
+
+        :param filters: The values of the filters, by name (see `FILTERS`):
+            birthday_from and birthday_to (inclusive bounds of the birthdays, in the
+            format YYYY-MM-DD), age_min and age_max (inclusive bounds of the ages, in
+            full years), email_domain and lastName (case-insensitive).
+        :type filters: dict
+        :param name: If given, only select persons whose firstName or lastName starts with it.
+        :type name: str
+        :param sort: The fields to sort the persons by, each prefixed by "-" for the
+            descending order (see `SORT_COLUMNS`). By default, the persons are in
+            insertion order, or sorted by id if `after` is given.
+        :type sort: [str]
+        :param fields: The columns of the rows, all of them by default.
+        :type fields: [str]
+        :param limit: The maximum number of persons, or None for all of them.
+        :type limit: int
+        :param after: If given, only select persons whose id comes after it, sorted
+            by id (keyset pagination, see `select_persons_page`).
+        :type after: str
+        :param today: The date the ages are computed on, today by default.
+        :type today: date
+        :return: The rows of the persons, with the columns `fields`.
+        :rtype: [tuple]
+        :raises KeyError: If a filter, a sort field or a field is unknown.
+        :raises ValueError: If both `sort` and `after` are given.
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        if sort and after is not None:
+            raise ValueError("The pages are sorted by id.")
+
+        if today is None:
+            today = date.today()
+
+        conditions, parameters = filter_conditions(filters or {}, today)
+        if name is not None:
+            conditions.append("(firstName LIKE ? OR lastName LIKE ?)")
+            parameters += [name + "%", name + "%"]
+        if after is not None:
+            conditions.append("id > ?")
+            parameters.append(after)
+
+        order = []
+        for field in sort or []:
+            if field.startswith("-"):
+                order.append(SORT_COLUMNS[field[1:]] + " DESC")
+            else:
+                order.append(SORT_COLUMNS[field])
+        order.append("id" if after is not None else "rowid")
+
+        for field in fields:
+            if field not in FIELDS:
+                raise KeyError(field)
+        sql_statement = "SELECT {} FROM persons".format(", ".join(fields))
+        if conditions:
+            sql_statement += " WHERE " + " AND ".join(conditions)
+        sql_statement += " ORDER BY " + ", ".join(order)
+        if limit is not None:
+            sql_statement += " LIMIT ?"
+            parameters.append(limit)
+
+        cursor = self.db_connection.cursor()
+        cursor.execute(sql_statement + ";", parameters)
+        return cursor.fetchall()
+
+    def select_upcoming_birthdays(
+        self, days: int, today: date = None, fields: [str] = FIELDS
+    ) -> [tuple]:
+        """
+        Selects the rows of the persons whose birthday is within a number of days,
+        sorted by upcoming birthday, through the index on the month and the day of
+        the birthdays. In the years which are not leap years, the birthdays of
+        February 29 are celebrated on February 28.
+
+        :param days: The number of days after today, 0 for the birthdays of today.
+        :type days: int
+        :param today: The first day, today by default.
+        :type today: date
+        :param fields: The columns of the rows, all of them by default.
+        :type fields: [str]
+        :return: The rows of the persons, with the columns `fields`.
+        :rtype: [tuple]
+        :raises KeyError: If a field is unknown.
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        if today is None:
+            today = date.today()
+        last = today + timedelta(days=days)
+        first_day, last_day = today.strftime("%m-%d"), last.strftime("%m-%d")
+        if last_day == "02-28" and (last + timedelta(days=1)).month == 3:
+            last_day = "02-29"
+
+        for field in fields:
+            if field not in FIELDS:
+                raise KeyError(field)
+        sql_statement = "SELECT {} FROM persons WHERE ".format(", ".join(fields))
+        if days >= 365:
+            # The window covers every day of the year.
+            sql_statement += "1"
+            parameters = []
+        elif first_day <= last_day:
+            sql_statement += "{0} >= ? AND {0} <= ?".format(MONTH_DAY)
+            parameters = [first_day, last_day]
+        else:
+            # The window wraps around the end of the year.
+            sql_statement += "({0} >= ? OR {0} <= ?)".format(MONTH_DAY)
+            parameters = [first_day, last_day]
+        sql_statement += " ORDER BY {0} < ?, {0}, rowid;".format(MONTH_DAY)
+        parameters.append(first_day)
+
+        cursor = self.db_connection.cursor()
+        cursor.execute(sql_statement, parameters)
+        return cursor.fetchall()
+
+    def select_ages(self, ids: [str], today: date = None) -> dict:
+        """
+        Computes the ages of many persons in SQL, with one query per chunk of ids.
+
+        :param ids: The ids of the persons.
+        :type ids: [str]
+        :param today: The date the ages are computed on, today by default.
+        :type today: date
+        :return: The age of each person found, in full years, by id.
+        :rtype: dict
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        today = (today or date.today()).isoformat()
+        ages = {}
+        cursor = self.db_connection.cursor()
+        for i in range(0, len(ids), QUERY_CHUNK_SIZE):
+            placeholders, chunk = in_list(ids[i : i + QUERY_CHUNK_SIZE])
+            cursor.execute(
+                "SELECT id, {} FROM persons WHERE id IN ({});".format(
+                    AGE, placeholders
+                ),
+                [today, today] + chunk,
+            )
+            ages.update(cursor.fetchall())
+        return ages
+
+    def search_persons(
+        self,
+        query: str,
+        limit: int = None,
+        ranked: bool = False,
+        as_tuples: bool = False,
+    ) -> [Person]:
+        """
+        Searches persons by name. The query is split into words, and a person matches
+        if each word is found in its firstName or lastName: anywhere in the name for
+        words of at least 3 characters, which are looked up in the full-text index,
+        or at the beginning of the name for shorter words.
+
+        :param query: The words to search for.
+        :type query: str
+        :param limit: The maximum number of persons to return, or None for all of them.
+        :type limit: int
+        :param ranked: Sort the persons by relevance instead of by insertion order.
+        :type ranked: bool
+        :param as_tuples: Return the rows (id, firstName, lastName, email, birthday)
+            as they are read, instead of `Person` objects, e.g. to serialize them.
+        :type as_tuples: bool
+        :return: A list of the persons matching every word of the query.
+        :rtype: [Person]
+        :raises sqlite3.Error: If an error occurs while querying the database.
+        """
+        words = query.split()
+        long_words = [word for word in words if len(word) >= 3 and self.fts_enabled]
+        conditions, parameters = [], []
+        for word in words:
+            if word in long_words:
+                continue
+            pattern = word + "%" if len(word) < 3 else "%" + word + "%"
+            conditions.append("(p.firstName LIKE ? OR p.lastName LIKE ?)")
+            parameters += [pattern, pattern]
+
+        if long_words:
+            # Each word is a quoted FTS5 string, in which quotes are doubled.
+            match = " AND ".join(
+                '"{}"'.format(word.replace('"', '""')) for word in long_words
+            )
+            sql_statement = "SELECT p.* FROM persons_fts JOIN persons AS p ON p.rowid = persons_fts.rowid"
+            conditions.insert(0, "persons_fts MATCH ?")
+            parameters.insert(0, match)
+            order = "rank" if ranked else "p.rowid"
+        else:
+            sql_statement = "SELECT p.* FROM persons AS p"
+            order = "p.rowid"
+
+        if conditions:
+            sql_statement += " WHERE " + " AND ".join(conditions)
+        sql_statement += " ORDER BY " + order
+        if limit != None:
+            sql_statement += " LIMIT ?"
+            parameters.append(limit)
+
+        cursor = self.db_connection.cursor()
+        cursor.execute(sql_statement + ";", parameters)
+        rows = cursor.fetchall()
+        return rows if as_tuples else [Person(*row) for row in rows]
+
     def update_person(self, person: Person):
         """
         Updates a person in the database. An Error is raised if
-        the update fails.
+        the update fails. Its birthday is normalized in the format
+        YYYY-MM-DD beforehand.
 
         :param person: The person to update.
         :type person: Person
         :raises sqlite.Error
         """
-        sql_statement = """
-                UPDATE persons
-                SET firstname = ?,
-                    lastname = ?,
-                    email = ?,
-                    birthday = ?
-                WHERE id = ?;
-            """
-        cursor = self.db_connection.cursor()
-        cursor.execute(
-            sql_statement,
-            (
-                person["firstName"],
-                person["lastName"],
-                person["email"],
-                person["birthday"],
-                person["id"],
-            ),
+        person.birthday = normalize_birthday(person["birthday"])
+        parameters = (
+            person["firstName"],
+            person["lastName"],
+            person["email"],
+            person["birthday"],
+            person["id"],
+        )
+        self.execute_write(
+            lambda cursor: cursor.execute(QUERIES["update_person"], parameters)
+        )
+        self.notify_write([person["id"]])
+
+    def update_person_fields(
+        self, id: str, values: dict, etags: [str] = None
+    ) -> Person:
+        """
+        Updates some attributes of a person with a single statement, which returns the
+        updated person, instead of reading it before and after. Only the columns of
+        the attributes given (and not None) are written, so the indexes of the other
+        columns and the full-text index of the names are left untouched when they do
+        not change. The birthday is normalized in the format YYYY-MM-DD beforehand.
+
+        Without `returning_enabled`, the person is selected again after the update,
+        within the same transaction.
+
+        The update can be made conditional on the version of the person, see
+        `Person.etag`, which is computed by the statement itself with the SQL
+        function "row_etag", so no other write can happen in between.
+
+        :param id: The id of the person to update.
+        :type id: str
+        :param values: The new values of the attributes, by name (see `UPDATABLE_FIELDS`).
+        :type values: dict
+        :param etags: If given, the person is only updated if its current version is
+            one of them.
+        :type etags: [str]
+        :return: The updated person, or None if there is no person with this id, or
+            if its version is not one of `etags`.
+        :rtype: Person
+        :raises sqlite3.IntegrityError: If the new email is already taken, see
+            `conflicting_field`.
+        :raises sqlite3.Error: If an error occurs while updating the person.
+        """
+        fields = [field for field in UPDATABLE_FIELDS if values.get(field) != None]
+        parameters = [values[field] for field in fields]
+        if "birthday" in fields:
+            parameters[fields.index("birthday")] = normalize_birthday(
+                values["birthday"]
+            )
+
+        condition = "id = ?"
+        parameters.append(id)
+        if etags != None:
+            condition += " AND row_etag({}) IN ({})".format(
+                ", ".join(FIELDS), ", ".join("?" * len(etags))
+            )
+            parameters += etags
+
+        if not fields:
+            row = self.db_connection.execute(
+                "SELECT * FROM persons WHERE {};".format(condition), parameters
+            ).fetchone()
+            return None if row == None else Person(*row)
+
+        sql_statement = "UPDATE persons SET {} WHERE {}".format(
+            ", ".join("{} = ?".format(field) for field in fields), condition
+        )
+
+        def update(cursor) -> tuple:
+            if self.returning_enabled:
+                return cursor.execute(
+                    sql_statement + " RETURNING *;", parameters
+                ).fetchone()
+            cursor.execute(sql_statement + ";", parameters)
+            if cursor.rowcount == 0:
+                return None
+            return cursor.execute(QUERIES["select_person_by_id"], (id,)).fetchone()
+
+        row = self.execute_write(update)
+        if row == None:
+            return None
+        self.notify_write([id])
+        return Person(*row)
+
+    def delete_person_by_id(self, id: str) -> Person:
+        """
+        Deletes a person from the database with a single statement, which returns the
+        deleted person. Without `returning_enabled`, the person is selected then
+        deleted within the same transaction.
+
+        :param id: The id of the person to delete.
+        :type id: str
+        :return: The deleted person, or None if there is no person with this id.
+        :rtype: Person
+        :raises sqlite3.Error: If an error occurs while deleting the person.
+        """
+
+        def delete(cursor) -> tuple:
+            if self.returning_enabled:
+                return cursor.execute(
+                    QUERIES["delete_person_returning"], (id,)
+                ).fetchone()
+            row = cursor.execute(QUERIES["select_person_by_id"], (id,)).fetchone()
+            if row != None:
+                cursor.execute(QUERIES["delete_person"], (id,))
+            return row
+
+        row = self.execute_write(delete)
+        if row == None:
+            return None
+        self.notify_write([id])
+        return Person(*row)
+
+    def delete_persons(
+        self,
+        ids: [str] = None,
+        filters: dict = None,
+        fields: [str] = None,
+        today: date = None,
+    ) -> (int, [tuple]):
+        """
+        Deletes the persons with some ids and matching filters, with set-based
+        statements within a single transaction, see `write_persons`.
+
+        :param ids: The ids of the persons, or None for any id.
+        :type ids: [str]
+        :param filters: The values of the filters, by name (see `select_persons`).
+        :type filters: dict
+        :param fields: The columns of the deleted rows to return, or None to only
+            count them.
+        :type fields: [str]
+        :param today: The date the ages are computed on, today by default.
+        :type today: date
+        :return: The number of deleted persons, and their rows with the columns
+            `fields` (or None).
+        :rtype: (int, [tuple])
+        :raises KeyError: If a filter or a field is unknown.
+        :raises sqlite3.Error: If an error occurs while deleting the persons, in which
+            case none of them is deleted.
+        """
+        return self.write_persons(
+            "DELETE FROM persons", [], ids, filters, fields, today
+        )
+
+    def update_persons(
+        self,
+        values: dict,
+        ids: [str] = None,
+        filters: dict = None,
+        fields: [str] = None,
+        today: date = None,
+    ) -> (int, [tuple]):
+        """
+        Updates some attributes of the persons with some ids and matching filters,
+        with set-based statements within a single transaction, see `write_persons`.
+        Only the columns of the attributes given (and not None) are written, and
+        the birthday is normalized in the format YYYY-MM-DD beforehand.
+
+        :param values: The new values of the attributes, by name (see `UPDATABLE_FIELDS`).
+        :type values: dict
+        :param ids: The ids of the persons, or None for any id.
+        :type ids: [str]
+        :param filters: The values of the filters, by name (see `select_persons`).
+        :type filters: dict
+        :param fields: The columns of the updated rows to return, or None to only
+            count them.
+        :type fields: [str]
+        :param today: The date the ages are computed on, today by default.
+        :type today: date
+        :return: The number of updated persons, and their rows with the columns
+            `fields` (or None).
+        :rtype: (int, [tuple])
+        :raises KeyError: If a filter or a field is unknown.
+        :raises ValueError: If no attribute is given.
+        :raises sqlite3.IntegrityError: If an email would be taken twice, see
+            `conflicting_field`, in which case none of the persons is updated.
+        :raises sqlite3.Error: If an error occurs while updating the persons.
+        """
+        columns = [field for field in UPDATABLE_FIELDS if values.get(field) != None]
+        if not columns:
+            raise ValueError("No attribute to update.")
+        parameters = [values[field] for field in columns]
+        if "birthday" in columns:
+            parameters[columns.index("birthday")] = normalize_birthday(
+                values["birthday"]
+            )
+        sql_statement = "UPDATE persons SET " + ", ".join(
+            "{} = ?".format(field) for field in columns
         )
-        self.db_connection.commit()
+        return self.write_persons(
+            sql_statement, parameters, ids, filters, fields, today
+        )
+
+    def write_persons(
+        self,
+        sql_statement: str,
+        parameters: list,
+        ids: [str],
+        filters: dict,
+        fields: [str],
+        today: date,
+    ) -> (int, [tuple]):
+        """
+        Runs an UPDATE or a DELETE statement on the persons with some ids and
+        matching filters, within a single transaction. Without ids, the persons are
+        selected by one statement, through the indexes of the filters; otherwise
+        they are selected by one statement per chunk of ids. The statements return
+        the ids of the persons written (see `write_selected_persons` without
+        `returning_enabled`), whose cached lookups and responses are then
+        invalidated at once.
+
+        Without ids nor filters, every person is written.
+
+        :param sql_statement: The statement, without its WHERE clause, e.g.
+            "DELETE FROM persons".
+        :type sql_statement: str
+        :param parameters: The values bound to the statement.
+        :type parameters: list
+        :param ids: The ids of the persons, or None for any id.
+        :type ids: [str]
+        :param filters: The values of the filters, by name, or None.
+        :type filters: dict
+        :param fields: The columns of the written rows to return, or None.
+        :type fields: [str]
+        :param today: The date the ages are computed on, today by default.
+        :type today: date
+        :return: The number of persons written, and their rows with the columns
+            `fields` (or None).
+        :rtype: (int, [tuple])
+        :raises KeyError: If a filter or a field is unknown.
+        :raises sqlite3.Error: If an error occurs while writing the persons, in which
+            case none of them is written.
+        """
+        if today is None:
+            today = date.today()
+        for field in fields or ():
+            if field not in FIELDS:
+                raise KeyError(field)
+
+        conditions, filter_parameters = filter_conditions(filters or {}, today)
+        columns = ("id",) + tuple(fields or ())
+        if ids is None:
+            chunks = [None]
+        else:
+            ids = list(dict.fromkeys(ids))
+            chunks = [
+                ids[i : i + QUERY_CHUNK_SIZE]
+                for i in range(0, len(ids), QUERY_CHUNK_SIZE)
+            ]
+
+        clauses = []
+        for chunk in chunks:
+            chunk_conditions = list(conditions)
+            chunk_parameters = filter_parameters
+            if chunk is not None:
+                placeholders, values = in_list(chunk)
+                chunk_conditions.append("id IN ({})".format(placeholders))
+                chunk_parameters = chunk_parameters + values
+            where = ""
+            if chunk_conditions:
+                where = " WHERE " + " AND ".join(chunk_conditions)
+            clauses.append((where, chunk_parameters))
+
+        def write(cursor) -> [tuple]:
+            rows = []
+            for where, where_parameters in clauses:
+                if self.returning_enabled:
+                    rows += cursor.execute(
+                        "{}{} RETURNING {};".format(
+                            sql_statement, where, ", ".join(columns)
+                        ),
+                        parameters + where_parameters,
+                    ).fetchall()
+                else:
+                    rows += self.write_selected_persons(
+                        cursor,
+                        sql_statement,
+                        parameters,
+                        where,
+                        where_parameters,
+                        columns,
+                    )
+            return rows
+
+        rows = self.execute_write(write) if clauses else []
+        if rows:
+            self.notify_write([row[0] for row in rows])
+        return len(rows), None if fields is None else [row[1:] for row in rows]
+
+    def write_selected_persons(
+        self,
+        cursor,
+        sql_statement: str,
+        parameters: list,
+        where: str,
+        where_parameters: list,
+        columns: tuple,
+    ) -> [tuple]:
+        """
+        Runs an UPDATE or a DELETE statement of `write_persons` without a RETURNING
+        clause, for the versions of SQLite older than 3.35: the persons written are
+        selected before the statement, by the same WHERE clause within the same
+        transaction, and the updated ones are selected again afterwards by rowid.
+
+        :param cursor: The cursor of the write.
+        :param sql_statement: The statement, without its WHERE clause.
+        :type sql_statement: str
+        :param parameters: The values bound to the statement.
+        :type parameters: list
+        :param where: The WHERE clause, or an empty string.
+        :type where: str
+        :param where_parameters: The values bound to the WHERE clause.
+        :type where_parameters: list
+        :param columns: The columns of the written rows to return.
+        :type columns: tuple
+        :return: The written rows, with the columns `columns`.
+        :rtype: [tuple]
+        """
+        selected = cursor.execute(
+            "SELECT rowid, {} FROM persons{};".format(", ".join(columns), where),
+            where_parameters,
+        ).fetchall()
+        cursor.execute(sql_statement + where + ";", parameters + where_parameters)
+        if not sql_statement.startswith("UPDATE") or columns == ("id",):
+            return [row[1:] for row in selected]
+
+        rows = []
+        rowids = [row[0] for row in selected]
+        for start in range(0, len(rowids), QUERY_CHUNK_SIZE):
+            placeholders, values = in_list(rowids[start : start + QUERY_CHUNK_SIZE])
+            rows += cursor.execute(
+                "SELECT {} FROM persons WHERE rowid IN ({});".format(
+                    ", ".join(columns), placeholders
+                ),
+                values,
+            ).fetchall()
+        return rows
 
     def delete_person(self, person: Person) -> Person:
         """
@@ -221,23 +1597,7 @@ class PeopleDatabase:
         :type person: Person
         :raises sqlite3.Error: If an error occurs while deleting the person.
         """
-        cursor = self.db_connection.cursor()
-        cursor.execute("DELETE FROM persons WHERE id = ?;", (person["id"],))
-        self.db_connection.commit()
-
-    def create_db_connection(self):
-        """
-        Create a database connection to a in-memory database.
-        The database will only be active during the runtime of the program.
-        All data are created at runtime and deleted after execution.
-
-        :return: A database connection object.
-        :rtype: sqlite3.Connection
-        :raises Error: If the connection cannot be established.
-        """
-        db_connection = None
-        try:
-            db_connection = sqlite3.connect(":memory:", check_same_thread=False)
-        except Error as e:
-            print(e)
-        return db_connection
+        self.execute_write(
+            lambda cursor: cursor.execute(QUERIES["delete_person"], (person["id"],))
+        )
+        self.notify_write([person["id"]])
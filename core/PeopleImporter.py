@@ -0,0 +1,189 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from contextlib import contextmanager
+from core.ConnectionPool import PRAGMAS
+from core.JsonSerializer import FASTEST, JsonSerializer, get_serializer
+from core.PeopleDatabase import PeopleDatabase
+from core.Person import DUPLICATE_MESSAGES, FIELDS, Person
+from core.PersonValidator import PersonValidator
+import csv
+import json
+
+
+def read_ndjson(lines, serializer: JsonSerializer = None):
+    """
+    Reads persons in the NDJSON format, one JSON object per line. The blank lines
+    are skipped.
+
+    :param lines: The lines, e.g. a file opened in binary mode.
+    :param serializer: The serializer decoding the lines, the fastest one by default.
+    :type serializer: JsonSerializer
+    :return: A generator of the line numbers and the decoded persons, or None for
+        the lines which are not valid JSON.
+    """
+    loads = (serializer or get_serializer(FASTEST)).loads
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_csv(lines):
+    """
+    Reads persons in the CSV format, whose first line gives the names of the columns.
+
+    :param lines: The lines, e.g. a file opened in text mode with newline="".
+    :return: A generator of the line numbers and the persons, as dictionaries.
+    """
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+class PeopleImporter:
+    """
+    A loader of many persons into a `PeopleDatabase`, for offline imports.
+
+    The persons are read by batches: each batch is validated with the rules of
+    `PersonValidator`, then its valid persons are inserted in a single transaction
+    by `PeopleDatabase.insert_persons`, which skips the ids and the emails already
+    taken. While loading, the database is tuned for speed with `fast_load`.
+
+    ivar db: the database to load the persons into.
+    ivar batch_size: the number of persons per transaction.
+    ivar errors: a text file receiving the rejected persons in NDJSON, or None.
+    ivar progress: a function called with the counters after each batch, or None.
+    ivar counters: the number of persons read, created, invalid and duplicate.
+    """
+
+    def __init__(
+        self,
+        db: PeopleDatabase,
+        batch_size: int = 100000,
+        errors=None,
+        progress=None,
+    ):
+        """
+        Initialize a new PeopleImporter object.
+
+        :param db: The database to load the persons into.
+        :type db: PeopleDatabase
+        :param batch_size: The number of persons per transaction.
+        :type batch_size: int
+        :param errors: A text file receiving the rejected persons in NDJSON.
+        :param progress: A function called with the counters after each batch.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.errors = errors
+        self.progress = progress
+        self.validator = PersonValidator()
+        self.counters = {"read": 0, "created": 0, "invalid": 0, "duplicate": 0}
+
+    @contextmanager
+    def fast_load(self, defer_indexes: bool = True):
+        """
+        Tunes the database for a bulk load within the block, then restores it:
+
+        - synchronous is OFF: the transactions are not flushed to the disk, so a
+          power loss may corrupt the database during the import.
+        - the indexes not needed by the insertions are dropped, and built again at
+          the end, see `PeopleDatabase.drop_deferred_indexes`. The processes
+          sharing the database then detect the imported persons at the end.
+
+        :param defer_indexes: Whether the indexes are built at the end.
+        :type defer_indexes: bool
+        """
+        cursor = self.db.db_connection.cursor()
+        cursor.execute("PRAGMA synchronous = OFF;")
+        if defer_indexes:
+            self.db.drop_deferred_indexes()
+        try:
+            yield
+        finally:
+            if defer_indexes:
+                self.db.build_indexes()
+                self.db.build_search_index()
+                self.db.build_version_table(create=False)
+            cursor.execute("PRAGMA synchronous = {};".format(PRAGMAS["synchronous"]))
+
+    def run(self, records, defer_indexes: bool = True) -> dict:
+        """
+        Imports persons.
+
+        :param records: The line numbers and the persons, see `read_ndjson` and
+            `read_csv`.
+        :param defer_indexes: Whether the indexes are built at the end.
+        :type defer_indexes: bool
+        :return: The number of persons read, created, invalid and duplicate.
+        :rtype: dict
+        """
+        with self.fast_load(defer_indexes):
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) == self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        return self.counters
+
+    def import_batch(self, batch: [tuple]):
+        """
+        Validates and inserts a batch of persons within a single transaction.
+
+        :param batch: The line numbers and the persons.
+        :type batch: [tuple]
+        :raises sqlite3.Error: If the insertion failed.
+        """
+        objects = [(line, record) for line, record in batch if isinstance(record, dict)]
+        errors = self.validator.validate_many([record for line, record in objects])
+
+        rejected = [
+            (line, None, "invalid", {"person": "Not a JSON object."})
+            for line, record in batch
+            if not isinstance(record, dict)
+        ]
+        valid = []
+        for (line, record), record_errors in zip(objects, errors):
+            if record_errors:
+                rejected.append((line, record.get("id"), "invalid", record_errors))
+            else:
+                valid.append((line, Person(*(record[field] for field in FIELDS))))
+        self.counters["invalid"] += len(rejected)
+
+        conflicts = self.db.insert_persons([person for line, person in valid])
+        for (line, person), conflict in zip(valid, conflicts):
+            if conflict is None:
+                self.counters["created"] += 1
+            else:
+                self.counters["duplicate"] += 1
+                rejected.append(
+                    (
+                        line,
+                        person["id"],
+                        "duplicate",
+                        {conflict: DUPLICATE_MESSAGES[conflict]},
+                    )
+                )
+
+        self.counters["read"] += len(batch)
+        if self.errors is not None:
+            for line, id, status, record_errors in sorted(rejected):
+                self.errors.write(
+                    json.dumps(
+                        {
+                            "line": line,
+                            "id": id,
+                            "status": status,
+                            "errors": record_errors,
+                        }
+                    )
+                    + "\n"
+                )
+        if self.progress is not None:
+            self.progress(self.counters)
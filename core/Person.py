@@ -1,7 +1,7 @@
 # Author: Cyprien Borée boreec@tuta.io
 
-from collections import OrderedDict
 from datetime import datetime, date
+import hashlib
 import json
 import re
 
@@ -14,17 +14,69 @@ email_regex = re.compile(
 )
 
 
-class Person(OrderedDict):
+FIELDS = ("id", "firstName", "lastName", "email", "birthday")
+"""
+Names of the attributes of a person, in the order of the columns of the database.
+"""
+
+DUPLICATE_MESSAGES = {
+    "id": "Person with similar id already exist in database.",
+    "email": "Person with similar email already exist in database.",
+}
+"""
+Error messages for a person whose id or email is already taken, by field, shared by
+the API and the importer.
+"""
+
+
+def row_etag(*values) -> str:
+    """
+    Returns a hash of the attributes of a person, see `Person.etag`.
+
+    :param values: The attributes (id, firstName, lastName, email, birthday) of the person.
+    :return: A hexadecimal string of 20 characters.
+    :rtype: str
+    """
+    data = "\x1f".join(str(value) for value in values)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:20]
+
+
+def normalize_birthday(birthday: str) -> str:
+    """
+    Returns a birthday in the format YYYY-MM-DD, with a zero-padded month and day
+    (e.g. "1997-01-01" for "1997-1-1"), so that the birthdays sort as strings in
+    chronological order. A value which is not a date is returned unchanged.
+
+    :param birthday: The birthday, in the format YYYY-M-D.
+    :type birthday: str
+    :return: The birthday in the format YYYY-MM-DD.
+    :rtype: str
+    """
+    if not isinstance(birthday, str) or len(birthday) == 10:
+        return birthday
+    parts = birthday.split("-")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return birthday
+    return "{}-{:0>2}-{:0>2}".format(*parts)
+
+
+class Person:
     """
-    The `Person` class is a subclass of `OrderedDict` and represents an individual person
-    wih the following attributes:
+    The `Person` class represents an individual person with the following attributes:
     - `id` a string representing the unique identifier of the person.
     - `firstName` a string representing the first name of the person.
     - `lastName` a string representing the last name of the person.
     - `email` a string representing the email address of the person.
     - `birthday`: a string representing the birth of the person in the format YYYY-MM-DD.
+
+    The attributes are stored in slots rather than in a dictionary, to keep the persons
+    read from the database cheap to build and small in memory. They are accessed like
+    the items of a dictionary, e.g. `person["email"]`, and `to_dict` gives a JSON
+    serializable representation of the person.
     """
 
+    __slots__ = FIELDS
+
     def __init__(
         self, id: str, firstName: str, lastName: str, email: str, birthday: str
     ):
@@ -42,12 +94,64 @@ class Person(OrderedDict):
         :param birthday: A string representing the person's birthday in the format 'YYYY-MM-DD'.
         :type birthday: str
         """
-        super(OrderedDict, self).__init__()
-        self["id"] = id
-        self["firstName"] = firstName
-        self["lastName"] = lastName
-        self["email"] = email
-        self["birthday"] = birthday
+        self.id = id
+        self.firstName = firstName
+        self.lastName = lastName
+        self.email = email
+        self.birthday = birthday
+
+    def __getitem__(self, key: str):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Person):
+            return self.to_tuple() == other.to_tuple()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return "Person({!r}, {!r}, {!r}, {!r}, {!r})".format(*self.to_tuple())
+
+    def keys(self) -> tuple:
+        """
+        Returns the names of the attributes of the person.
+
+        :return: The tuple FIELDS.
+        :rtype: tuple
+        """
+        return FIELDS
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary representation of the person object, which can be
+        serialized with `json.dumps`.
+
+        :return: A dictionary with the keys id, firstName, lastName, email and birthday.
+        :rtype: dict
+        """
+        return {
+            "id": self.id,
+            "firstName": self.firstName,
+            "lastName": self.lastName,
+            "email": self.email,
+            "birthday": self.birthday,
+        }
 
     def to_tuple(self) -> tuple:
         """
@@ -56,12 +160,34 @@ class Person(OrderedDict):
         :return: A tuple of the form (id, firstName, lastName, email, birthday).
         :rtype: tuple
         """
+        return (self.id, self.firstName, self.lastName, self.email, self.birthday)
+
+    def etag(self) -> str:
+        """
+        Returns the version of the person, a hash of its attributes which changes
+        whenever one of them changes. It is used as the ETag of the person.
+
+        :return: A hexadecimal string of 20 characters.
+        :rtype: str
+        """
+        return row_etag(*self.to_tuple())
+
+    def age(self, today: date = None) -> int:
+        """
+        Returns the age of the person.
+
+        :param today: The date on which the age is computed, today by default.
+        :type today: date
+        :return: The number of full years since the birthday of the person.
+        :rtype: int
+        """
+        if today is None:
+            today = date.today()
+        born_year, born_month, born_day = (
+            int(part) for part in self.birthday.split("-")
+        )
         return (
-            self["id"],
-            self["firstName"],
-            self["lastName"],
-            self["email"],
-            self["birthday"],
+            today.year - born_year - ((today.month, today.day) < (born_month, born_day))
         )
 
     def verify_id(self):
@@ -0,0 +1,189 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class PersonCache:
+    """
+    A bounded and thread-safe cache of the rows of the "persons" table, looked up
+    by id or by email. The least recently used rows are evicted first, and rows
+    expire after a time to live.
+
+    Only existing persons are cached. The emails point to ids, so invalidating
+    the id of a person also invalidates the lookups by its email.
+
+    ivar max_size: the maximum number of cached rows, 0 disables the cache.
+    ivar ttl: the number of seconds a row stays in the cache.
+    ivar hits: the number of lookups answered by the cache.
+    ivar misses: the number of lookups not answered by the cache.
+    ivar evictions: the number of rows removed to make room or because they expired.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        """
+        Initialize a new PersonCache object.
+
+        :param max_size: The maximum number of cached rows, 0 disables the cache.
+        :type max_size: int
+        :param ttl: The number of seconds a row stays in the cache.
+        :type ttl: float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rows = OrderedDict()
+        self._emails = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def token(self) -> int:
+        """
+        Returns a token to take before reading a row from the database, and to give
+        back to `put`. The row is only cached if nothing was invalidated meanwhile,
+        so a row read before a concurrent write can not be cached after it.
+
+        :return: The number of invalidations so far.
+        :rtype: int
+        """
+        return self._generation
+
+    def get_by_id(self, id: str) -> tuple:
+        """
+        Looks up a person by id.
+
+        :param id: The id of the person.
+        :type id: str
+        :return: The row of the person, or None if it is not cached.
+        :rtype: tuple
+        """
+        with self._lock:
+            return self._get(id)
+
+    def get_many(self, ids: [str]) -> dict:
+        """
+        Looks up many persons by id, holding the lock once.
+
+        :param ids: The ids of the persons.
+        :type ids: [str]
+        :return: The rows of the cached persons, by id.
+        :rtype: dict
+        """
+        rows = {}
+        with self._lock:
+            for id in ids:
+                row = self._get(id)
+                if row is not None:
+                    rows[id] = row
+        return rows
+
+    def get_by_email(self, email: str) -> tuple:
+        """
+        Looks up a person by email.
+
+        :param email: The email of the person.
+        :type email: str
+        :return: The row of the person, or None if it is not cached.
+        :rtype: tuple
+        """
+        with self._lock:
+            id = self._emails.get(email)
+            if id is None:
+                self.misses += 1
+                return None
+            return self._get(id)
+
+    def put(self, row: tuple, token: int):
+        """
+        Caches the row of a person, evicting the least recently used row if needed.
+
+        :param row: The row (id, firstName, lastName, email, birthday) of the person.
+        :type row: tuple
+        :param token: The value of `token()` taken before reading the row.
+        :type token: int
+        """
+        self.put_many([row], token)
+
+    def put_many(self, rows: [tuple], token: int):
+        """
+        Caches the rows of many persons, see `put`.
+
+        :param rows: The rows (id, firstName, lastName, email, birthday) of the persons.
+        :type rows: [tuple]
+        :param token: The value of `token()` taken before reading the rows.
+        :type token: int
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if token != self._generation:
+                return
+            expires = time.monotonic() + self.ttl
+            for row in rows:
+                self._remove(row[0])
+                self._rows[row[0]] = (row, expires)
+                self._emails[row[3]] = row[0]
+            while len(self._rows) > self.max_size:
+                self._remove(next(iter(self._rows)))
+                self.evictions += 1
+
+    def invalidate(self, ids: [str]):
+        """
+        Removes persons from the cache, after they were written in the database.
+
+        :param ids: The ids of the persons, or None to remove every person.
+        :type ids: [str]
+        """
+        if ids is None:
+            self.clear()
+            return
+        with self._lock:
+            self._generation += 1
+            for id in ids:
+                self._remove(id)
+
+    def clear(self):
+        """
+        Removes every person from the cache.
+        """
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+            self._emails.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        :return: The number of hits, misses, evictions and cached rows.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._rows),
+            }
+
+    def _get(self, id: str) -> tuple:
+        entry = self._rows.get(id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[1] < time.monotonic():
+            self._remove(id)
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._rows.move_to_end(id)
+        self.hits += 1
+        return entry[0]
+
+    def _remove(self, id: str):
+        entry = self._rows.pop(id, None)
+        if entry is not None and self._emails.get(entry[0][3]) == id:
+            del self._emails[entry[0][3]]
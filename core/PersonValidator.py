@@ -0,0 +1,180 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from calendar import isleap
+from core.Person import FIELDS, Person, email_regex, name_regex, uuid_regex
+from datetime import date
+import re
+
+birthday_regex = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+
+days_in_month = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class PersonValidator:
+    """
+    A validator of the attributes of persons, applying the same rules as
+    `Person.verify_data` in a single pass: the checks do not raise exceptions,
+    the regular expressions are compiled once, and the current date is read
+    once per call, even when validating many persons.
+
+    The errors are returned as a dictionary mapping the name of each invalid
+    attribute to its error message, so a valid person gives an empty dictionary.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new PersonValidator object.
+        """
+        self.checks = {
+            "id": self.check_id,
+            "firstName": self.check_firstName,
+            "lastName": self.check_lastName,
+            "email": self.check_email,
+            "birthday": self.check_birthday,
+        }
+
+    def validate(self, record, fields: [str] = FIELDS, today: date = None) -> dict:
+        """
+        Validate the attributes of a person.
+
+        :param record: The person, either a `Person` or a dictionary.
+        :param fields: The names of the attributes to validate, all of them by default.
+        :type fields: [str]
+        :param today: The current date, read from the clock by default.
+        :type today: date
+        :return: The error message of each invalid attribute.
+        :rtype: dict
+        """
+        if today is None:
+            today = date.today()
+        get = record.__getitem__ if isinstance(record, Person) else record.get
+        errors = {}
+        for field in fields:
+            message = self.checks[field](get(field), today)
+            if message is not None:
+                errors[field] = message
+        return errors
+
+    def validate_many(self, records: list, fields: [str] = FIELDS) -> [dict]:
+        """
+        Validate the attributes of many persons.
+
+        :param records: The persons, either `Person` objects or dictionaries.
+        :type records: list
+        :param fields: The names of the attributes to validate, all of them by default.
+        :type fields: [str]
+        :return: The errors of each person, see `validate`.
+        :rtype: [dict]
+        """
+        today = date.today()
+        return [self.validate(record, fields, today) for record in records]
+
+    @staticmethod
+    def format_errors(errors: dict) -> str:
+        """
+        Format errors like `Person.verify_data` does, one message per line.
+
+        :param errors: The errors returned by `validate`.
+        :type errors: dict
+        :return: The concatenated error messages.
+        :rtype: str
+        """
+        return "".join(message + "\n" for message in errors.values())
+
+    def check_id(self, value, today: date) -> str:
+        """
+        Check an id, see `Person.verify_id`.
+
+        :return: The error message, or None if the id is valid.
+        :rtype: str
+        """
+        if value is None:
+            return "Id is missing."
+        if not isinstance(value, str):
+            return "Invalid id: not a string."
+        if len(value) == 0:
+            return "Invalid id: empty."
+        if uuid_regex.fullmatch(value) is None:
+            return "Invalid id: not compliant with uuid v4 format."
+        return None
+
+    def check_firstName(self, value, today: date) -> str:
+        """
+        Check a first name, see `Person.verify_firstName`.
+
+        :return: The error message, or None if the first name is valid.
+        :rtype: str
+        """
+        return self.check_name("firstName", value)
+
+    def check_lastName(self, value, today: date) -> str:
+        """
+        Check a last name, see `Person.verify_lastName`.
+
+        :return: The error message, or None if the last name is valid.
+        :rtype: str
+        """
+        return self.check_name("lastName", value)
+
+    def check_name(self, field: str, value) -> str:
+        """
+        Check a first or last name.
+
+        :return: The error message, or None if the name is valid.
+        :rtype: str
+        """
+        if value is None:
+            return field + " is missing."
+        if not isinstance(value, str):
+            return "Invalid " + field + ": not a string."
+        if len(value) == 0:
+            return field + " is empty."
+        if name_regex.fullmatch(value) is None:
+            return "Invalid " + field + ": Bad format."
+        return None
+
+    def check_email(self, value, today: date) -> str:
+        """
+        Check an email address, see `Person.verify_email`.
+
+        :return: The error message, or None if the email address is valid.
+        :rtype: str
+        """
+        if value is None:
+            return "Email address is missing."
+        if not isinstance(value, str):
+            return "Invalid email address: not a string."
+        if len(value) == 0:
+            return "Invalid email address: empty."
+        if email_regex.fullmatch(value) is None:
+            return "Invalid email address: not compliant with email address format."
+        return None
+
+    def check_birthday(self, value, today: date) -> str:
+        """
+        Check a birthday, see `Person.verify_birthday`. The date is parsed with a
+        regular expression and checked against the number of days of its month,
+        instead of catching the error of `datetime.strptime`.
+
+        :return: The error message, or None if the birthday is valid.
+        :rtype: str
+        """
+        if value is None:
+            return "Birthday is missing."
+        match = birthday_regex.fullmatch(value) if isinstance(value, str) else None
+        if match is None:
+            return "Invalid birthday: Bad format. Try YYYY-MM-DD."
+        year, month, day = int(match[1]), int(match[2]), int(match[3])
+        if year < 1 or not 1 <= month <= 12 or day < 1:
+            return "Invalid birthday: Bad format. Try YYYY-MM-DD."
+        if day > days_in_month[month - 1] + (month == 2 and isleap(year)):
+            return "Invalid birthday: Bad format. Try YYYY-MM-DD."
+
+        approximate_age = today.year - year
+        if approximate_age > 150:
+            return "Invalid birthday: {} years old is humanly too old.".format(
+                approximate_age
+            )
+        if (today.year, today.month, today.day) < (year, month, day):
+            return "Invalid birthday: You can not be born in the future."
+        return None
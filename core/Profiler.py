@@ -0,0 +1,171 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+
+
+class Profiler:
+    """
+    A profiler of the requests of the application, turned on at runtime for a
+    number of seconds or of requests, which aggregates the statistics of the
+    profiled requests.
+
+    Each profiled request runs under its own `cProfile.Profile`, so requests handled
+    by concurrent threads are profiled separately, then merged. To bound the
+    overhead, only one request out of `every` is profiled. While the profiler is
+    off, `begin` only reads the `active` attribute.
+
+    ivar active: whether the requests are being profiled.
+    ivar deadline: the time (from `time.monotonic`) the profiling stops, or None.
+    ivar max_requests: the number of profiled requests after which the profiling
+        stops, or None.
+    ivar every: the profiling rate, one request out of `every`.
+    ivar requests: the number of requests seen since the profiling started.
+    ivar profiled: the number of requests profiled since the profiling started.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new Profiler object.
+        """
+        self.active = False
+        self.deadline = None
+        self.max_requests = None
+        self.every = 1
+        self.requests = 0
+        self.profiled = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def start(self, seconds: float = None, requests: int = None, every: int = 1):
+        """
+        Start profiling the next requests, discarding the previous statistics.
+
+        :param seconds: The number of seconds to profile for, unlimited by default.
+        :type seconds: float
+        :param requests: The number of requests to profile, unlimited by default.
+        :type requests: int
+        :param every: Profile one request out of `every`.
+        :type every: int
+        """
+        with self._lock:
+            self.deadline = None if seconds is None else time.monotonic() + seconds
+            self.max_requests = requests
+            self.every = every
+            self.requests = 0
+            self.profiled = 0
+            self._stats = None
+            self.active = True
+
+    def stop(self):
+        """
+        Stop profiling. The statistics are kept until the next start.
+        """
+        self.active = False
+
+    def begin(self) -> cProfile.Profile:
+        """
+        Start profiling the request handled by the calling thread, if the profiler is
+        on and the request is picked by the profiling rate.
+
+        :return: The profile of the request, to give to `end`, or None.
+        :rtype: cProfile.Profile
+        """
+        if not self.active:
+            return None
+        with self._lock:
+            self._expire()
+            if not self.active:
+                return None
+            self.requests += 1
+            if (self.requests - 1) % self.every != 0:
+                return None
+            self.profiled += 1
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already running in this thread.
+            return None
+        return profile
+
+    def end(self, profile: cProfile.Profile):
+        """
+        Stop profiling a request, and add its statistics to the aggregated ones.
+
+        :param profile: The profile returned by `begin`, or None.
+        :type profile: cProfile.Profile
+        """
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                self._stats.add(profile)
+
+    def status(self) -> dict:
+        """
+        Returns the state of the profiler.
+
+        :return: Whether the profiler is on, the number of seconds left, the maximum
+            number of requests to profile, the profiling rate, and the number of
+            requests seen and profiled.
+        :rtype: dict
+        """
+        with self._lock:
+            self._expire()
+            remaining = None
+            if self.active and self.deadline is not None:
+                remaining = max(0.0, self.deadline - time.monotonic())
+            return {
+                "active": self.active,
+                "seconds": remaining,
+                "requests": self.max_requests,
+                "every": self.every,
+                "seen": self.requests,
+                "profiled": self.profiled,
+            }
+
+    def report(self, sort: str = "cumulative", limit: int = 50) -> str:
+        """
+        Format the aggregated statistics, like `pstats.Stats.print_stats`.
+
+        :param sort: The key to sort the functions by, see `pstats.Stats.sort_stats`.
+        :type sort: str
+        :param limit: The maximum number of functions printed.
+        :type limit: int
+        :return: The statistics, or None if no request was profiled.
+        :rtype: str
+        :raises KeyError: If the sort key is unknown.
+        """
+        with self._lock:
+            if self._stats is None:
+                return None
+            self._stats.stream = io.StringIO()
+            self._stats.sort_stats(sort).print_stats(limit)
+            return self._stats.stream.getvalue()
+
+    def dump(self) -> bytes:
+        """
+        Serialize the aggregated statistics in the format of `pstats.Stats.dump_stats`,
+        which can be loaded with `pstats.Stats(path)` or tools such as snakeviz.
+
+        :return: The statistics, or None if no request was profiled.
+        :rtype: bytes
+        """
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+    def _expire(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.active = False
+        if self.max_requests is not None and self.profiled >= self.max_requests:
+            self.active = False
@@ -0,0 +1,119 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+
+class ResponseCache:
+    """
+    A bounded and thread-safe cache of serialized responses, each one stored with
+    its ETag. A response is either the representation of a single person, cached
+    under its id, or a list of persons, cached under the URL of the request.
+
+    When persons are written in the database, `invalidate` removes their own
+    responses and every list, since any list may contain them.
+
+    ivar max_size: the maximum number of cached responses, 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        """
+        Initialize a new ResponseCache object.
+
+        :param max_size: The maximum number of cached responses, 0 disables the cache.
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lists = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        """
+        Returns the ETag of a response, a hash of its body.
+
+        :param body: The serialized response.
+        :type body: bytes
+        :return: A hexadecimal string of 20 characters.
+        :rtype: str
+        """
+        return hashlib.sha1(body).hexdigest()[:20]
+
+    def token(self) -> int:
+        """
+        Returns a token to take before reading from the database, and to give back
+        to `put`. See `PersonCache.token`.
+
+        :return: The number of invalidations so far.
+        :rtype: int
+        """
+        return self._generation
+
+    def get(self, key: str) -> (bytes, str):
+        """
+        Looks up a response.
+
+        :param key: The id of a person, or the URL of a list.
+        :type key: str
+        :return: The body and the ETag of the response, or None if it is not cached.
+        :rtype: (bytes, str)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, etag: str, token: int, is_list: bool = False):
+        """
+        Caches a response, evicting the least recently used one if needed.
+
+        :param key: The id of a person, or the URL of a list.
+        :type key: str
+        :param body: The serialized response.
+        :type body: bytes
+        :param etag: The ETag of the response, or None to compute it from the body.
+        :type etag: str
+        :param token: The value of `token()` taken before reading the database.
+        :type token: int
+        :param is_list: Whether the response is a list of persons.
+        :type is_list: bool
+        :return: The body and the ETag of the response.
+        :rtype: (bytes, str)
+        """
+        if etag is None:
+            etag = self.make_etag(body)
+        entry = (body, etag)
+        if self.max_size <= 0:
+            return entry
+        with self._lock:
+            if token != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if is_list:
+                self._lists.add(key)
+            while len(self._entries) > self.max_size:
+                self._lists.discard(self._entries.popitem(last=False)[0])
+        return entry
+
+    def invalidate(self, ids: [str]):
+        """
+        Removes the responses of persons, and every list, after persons were written
+        in the database.
+
+        :param ids: The ids of the persons, or None to remove every response.
+        :type ids: [str]
+        """
+        with self._lock:
+            self._generation += 1
+            if ids is None:
+                self._entries.clear()
+            for id in ids or []:
+                self._entries.pop(id, None)
+            for key in self._lists:
+                self._entries.pop(key, None)
+            self._lists.clear()
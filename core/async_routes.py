@@ -0,0 +1,251 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from app import app, db, metrics, responses
+from core.AsyncPeopleDatabase import AsyncPeopleDatabase
+from core.Metrics import measured_by, task_stats
+from core.routes import (
+    PAGE_LIMIT_MAX,
+    QUERY_PARAMETERS,
+    encode_json,
+    encode_rows,
+    parse_limit,
+)
+from email.utils import formatdate
+from urllib.parse import parse_qs, unquote
+from werkzeug.exceptions import NotFound
+import os
+import re
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError(
+        "The ASGI mode requires the package asgiref: pip install asgiref uvicorn"
+    ) from e
+
+async_db = AsyncPeopleDatabase(db, int(os.environ.get("PEOPLE_ASGI_WORKERS", 8)))
+"""
+Asynchronous interface to the database of the application. The environment
+variable PEOPLE_ASGI_WORKERS sets the number of threads running the queries.
+"""
+
+flask_application = WsgiToAsgi(app)
+"""
+ASGI adapter of the Flask application, serving the routes without an asynchronous
+version. Their requests are handled in threads by asgiref.
+"""
+
+
+async def get_people(scope: dict, args: dict):
+    """
+    Asynchronous version of `core.routes.get_people`, for the list of all people
+    and the search by name. Pages, streams, filters, sorts and projections are left
+    to the Flask application.
+    """
+
+    if "limit" in args or "after" in args or "stream" in args:
+        return None
+    if any(key in args for key in QUERY_PARAMETERS):
+        return None
+
+    key = full_path(scope)
+    entry = responses.get(key)
+    if entry == None:
+        token = responses.token()
+        name = args.get("name")
+        if name == None:
+            rows = await async_db.select_all_persons(as_tuples=True)
+        else:
+            rows = await async_db.select_persons_by_name_starting_with(
+                name, as_tuples=True
+            )
+        entry = responses.put(key, encode(encode_rows, rows), None, token, is_list=True)
+    return conditional_response(scope, entry)
+
+
+async def search_people(scope: dict, args: dict):
+    """
+    Asynchronous version of `core.routes.search_people`.
+    """
+
+    query = args.get("q")
+    if query == None:
+        return text_response(400, "The parameter q is missing.\n")
+
+    limit = None
+    if args.get("limit") != None:
+        limit = parse_limit(args.get("limit"))
+        if limit == None:
+            return text_response(
+                400, "Invalid limit: must be between 1 and {}.\n".format(PAGE_LIMIT_MAX)
+            )
+
+    key = full_path(scope)
+    entry = responses.get(key)
+    if entry == None:
+        token = responses.token()
+        rows = await async_db.search_persons(
+            query, limit, "rank" in args, as_tuples=True
+        )
+        entry = responses.put(key, encode(encode_rows, rows), None, token, is_list=True)
+    return conditional_response(scope, entry)
+
+
+async def get_person_by_id(scope: dict, args: dict, id: str):
+    """
+    Asynchronous version of `core.routes.get_person_by_id`.
+    """
+
+    entry = responses.get(id)
+    if entry == None:
+        token = responses.token()
+        answer = await async_db.select_person_by_id(id)
+        if answer == None:
+            return not_found_response()
+        entry = responses.put(id, encode(encode_json, answer), answer.etag(), token)
+    return conditional_response(scope, entry)
+
+
+async def get_person_age(scope: dict, args: dict, id: str):
+    """
+    Asynchronous version of `core.routes.get_person_age`.
+    """
+
+    person = await async_db.select_person_by_id(id)
+    if person == None:
+        return not_found_response()
+    body = encode(encode_json, person.age())
+    return 200, [(b"content-type", b"application/json")], body
+
+
+ROUTES = [
+    ("GET", "/people", re.compile(r"/people"), get_people),
+    ("GET", "/people/search", re.compile(r"/people/search"), search_people),
+    ("GET", None, re.compile(r"/people/(?:export|birthdays|ages)"), None),
+    ("GET", "/people/<id>", re.compile(r"/people/(?P<id>[^/]+)"), get_person_by_id),
+    (
+        "GET",
+        "/people/<id>/age",
+        re.compile(r"/people/(?P<id>[^/]+)/age"),
+        get_person_age,
+    ),
+]
+"""
+The routes with an asynchronous version: method, rule of the Flask route (the
+label of their metrics), path and function. The routes without function are left
+to the Flask application.
+"""
+
+
+async def application(scope: dict, receive, send):
+    """
+    ASGI application of the API. The routes of `ROUTES` are served by coroutines,
+    the other ones by the Flask application.
+
+    The requests of the coroutines are measured like the ones of Flask, see
+    `core.Metrics.task_stats`, but they are not profiled: a `cProfile.Profile`
+    measures a thread, while the event loop interleaves many requests on its
+    thread.
+    """
+
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                async_db.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    response = None
+    if scope["type"] == "http":
+        for method, rule, path, route in ROUTES:
+            match = path.fullmatch(scope["path"])
+            if match != None and scope["method"] == method:
+                if route == None:
+                    break
+                stats = metrics.new_request()
+                task_stats.set(stats)
+                if db.shared:
+                    await async_db.refresh()
+                args = {
+                    key: values[0]
+                    for key, values in parse_qs(
+                        scope["query_string"].decode("latin-1"), keep_blank_values=True
+                    ).items()
+                }
+                response = await route(scope, args, **match.groupdict())
+                break
+
+    if response == None:
+        await flask_application(scope, receive, send)
+        return
+
+    status, headers, body = response
+    stats = metrics.record(task_stats.get(), rule, method, status)
+    if stats != None:
+        headers.append(
+            (b"server-timing", metrics.server_timing(stats).encode("latin-1"))
+        )
+    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def full_path(scope: dict) -> str:
+    """
+    Returns the path and the query string of a request, like `flask.Request.full_path`,
+    so both applications share the cached lists.
+    """
+
+    return unquote(scope["path"]) + "?" + scope["query_string"].decode("latin-1")
+
+
+def encode(function, value) -> bytes:
+    """
+    Serializes a value with `core.routes.encode_json` or `core.routes.encode_rows`,
+    timed as the serialization of the request of the current task.
+    """
+
+    with measured_by(task_stats.get()):
+        return function(value)
+
+
+def conditional_response(scope: dict, entry: (bytes, str)) -> tuple:
+    """
+    Asynchronous version of `core.routes.conditional_response`, which only
+    supports the If-None-Match header.
+
+    :return: The status, the headers and the body of the response.
+    :rtype: tuple
+    """
+
+    body, etag = entry
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"etag", '"{}"'.format(etag).encode("latin-1")),
+        (b"last-modified", formatdate(db.last_modified, usegmt=True).encode("latin-1")),
+    ]
+    for name, value in scope["headers"]:
+        if name == b"if-none-match":
+            tags = [tag.strip() for tag in value.decode("latin-1").split(",")]
+            if "*" in tags or '"{}"'.format(etag) in tags:
+                return 304, headers, b""
+    return 200, headers, body
+
+
+def text_response(status: int, message: str) -> tuple:
+    """
+    Returns a text response, like `flask.Response(message, status)`.
+    """
+
+    return status, [(b"content-type", b"text/html; charset=utf-8")], message.encode()
+
+
+def not_found_response() -> tuple:
+    """
+    Returns the 404 response of Flask.
+    """
+
+    return text_response(404, NotFound().get_body())
@@ -1,11 +1,257 @@
 # Author: Cyprien Borée boreec@tuta.io
 
-from datetime import date
-from flask import Response, abort, jsonify, request
-from app import app, db
-from core.Person import Person
+from flask import Response, abort, g, jsonify, request, stream_with_context, url_for
+from app import app, db, metrics, profiler, responses, serializer
+from core.Metrics import timed
+from core.PeopleDatabase import (
+    FILTERS,
+    SORT_COLUMNS,
+    UPDATABLE_FIELDS,
+    conflicting_field,
+)
+from core.Person import DUPLICATE_MESSAGES, FIELDS, Person
+from core.PersonValidator import PersonValidator
 
+from datetime import date, datetime
+import csv
+import hmac
+import io
 import json
+import sqlite3
+import zlib
+
+PAGE_LIMIT_MAX = 1000
+"""
+Maximum number of persons returned in a single page by `GET /people`.
+"""
+
+validator = PersonValidator()
+"""
+Validator of the persons received by the routes.
+"""
+
+BULK_CHUNK_SIZE = 10000
+"""
+Number of people inserted per transaction by `POST /people/bulk`.
+"""
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+"""
+Formats of `GET /people/export`, with their mimetypes.
+"""
+
+QUERY_PARAMETERS = tuple(FILTERS) + ("sort", "fields")
+"""
+Parameters of `GET /people` filtering, sorting and projecting the people, see
+`parse_query`.
+"""
+
+AGE_MAX = 150
+"""
+Maximum age of a person, see `core.PersonValidator.PersonValidator.check_birthday`.
+"""
+
+BIRTHDAYS_DAYS_MAX = 366
+"""
+Maximum number of days looked ahead by `GET /people/birthdays`.
+"""
+
+PROFILE_SECONDS = 30
+"""
+Default number of seconds the requests are profiled for by `POST /admin/profile`.
+"""
+
+
+@app.before_request
+def start_metrics():
+    """
+    Starts measuring the request, if the metrics are enabled.
+    """
+
+    metrics.start_request()
+
+
+@app.before_request
+def start_profile():
+    """
+    Starts profiling the request, if the profiler is on.
+    """
+
+    if profiler.active:
+        g.profile = profiler.begin()
+
+
+@app.teardown_request
+def end_profile(exception):
+    """
+    Stops profiling the request, if it was profiled.
+    """
+
+    profile = g.pop("profile", None)
+    if profile != None:
+        profiler.end(profile)
+
+
+@app.before_request
+def refresh_database():
+    """
+    Invalidates the caches before each request if other processes wrote in the
+    database, see `PeopleDatabase.refresh`.
+    """
+
+    db.refresh()
+
+
+@app.after_request
+def record_metrics(response: Response) -> Response:
+    """
+    Records the measures of the request, and sends them in the Server-Timing
+    header of the response, if the metrics are enabled.
+    """
+
+    rule = request.url_rule
+    stats = metrics.end_request(
+        rule.rule if rule != None else "unmatched",
+        request.method,
+        response.status_code,
+    )
+    if stats != None:
+        response.headers["Server-Timing"] = metrics.server_timing(stats)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Returns the metrics of the requests in the text format of Prometheus.
+
+    :return: The latency histograms by route, the number of SQL queries and the
+        time spent in the SQL queries, the validation and the serialization.
+    :rtype: flask.Response
+    :raises 404: If the metrics are disabled.
+    """
+
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def check_admin():
+    """
+    Checks the request is sent by an administrator, with the header
+    "Authorization: Bearer <token>" and the token of `app.config["ADMIN_TOKEN"]`.
+
+    :raises 404: If the administration routes are disabled.
+    :raises 403: If the token is missing or wrong.
+    """
+
+    token = app.config.get("ADMIN_TOKEN")
+    if not token:
+        abort(404)
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), ("Bearer " + token).encode()):
+        abort(403)
+
+
+@app.route("/admin/profile", methods=["POST"])
+def start_profiling():
+    """
+    Starts profiling the requests, for a number of seconds or of requests.
+
+    The JSON body may give the number of 'seconds' (PROFILE_SECONDS by default,
+    unless 'requests' is given), the number of 'requests' to profile, and the
+    profiling rate 'every': one request out of 'every' is profiled.
+
+    :return: A JSON representation of the state of the profiler.
+    :rtype: flask.Response
+    :raises 400: If an option is not a positive number.
+    :raises 403: If the request is not sent by an administrator.
+    """
+
+    check_admin()
+    options = request.get_json(silent=True)
+    if not isinstance(options, dict):
+        options = {}
+    seconds = options.get("seconds")
+    if seconds == None and options.get("requests") == None:
+        seconds = PROFILE_SECONDS
+
+    for name, value in (
+        ("seconds", seconds),
+        ("requests", options.get("requests")),
+        ("every", options.get("every", 1)),
+    ):
+        if value != None and (
+            isinstance(value, bool)
+            or not isinstance(value, int if name != "seconds" else (int, float))
+            or value <= 0
+        ):
+            return Response(
+                "Invalid {}: must be a positive number.\n".format(name), 400
+            )
+
+    profiler.start(seconds, options.get("requests"), options.get("every", 1))
+    return jsonify(profiler.status())
+
+
+@app.route("/admin/profile", methods=["GET"])
+def get_profile():
+    """
+    Returns the statistics of the profiled requests, aggregated by function.
+
+    :param format: 'text' (by default) for the report of `pstats`, or 'pstats'
+        for the statistics in the binary format of `pstats.Stats.dump_stats`.
+    :type format: str
+    :param sort: The key to sort the report by, 'cumulative' by default.
+    :type sort: str
+    :param limit: The maximum number of functions in the report, 50 by default.
+    :type limit: int
+    :return: The statistics.
+    :rtype: flask.Response
+    :raises 400: If a parameter is invalid.
+    :raises 403: If the request is not sent by an administrator.
+    :raises 404: If no request was profiled.
+    """
+
+    check_admin()
+    args = request.args
+    if args.get("format") == "pstats":
+        body = profiler.dump()
+        if body == None:
+            return Response("No request was profiled.\n", 404)
+        return Response(
+            body,
+            mimetype="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=profile.pstats"},
+        )
+
+    limit = parse_limit(args.get("limit", "50"))
+    if limit == None:
+        return Response(
+            "Invalid limit: must be between 1 and {}.\n".format(PAGE_LIMIT_MAX), 400
+        )
+    try:
+        report = profiler.report(args.get("sort", "cumulative"), limit)
+    except KeyError:
+        return Response("Invalid sort key.\n", 400)
+    if report == None:
+        return Response("No request was profiled.\n", 404)
+    return Response(report, mimetype="text/plain")
+
+
+@app.route("/admin/profile", methods=["DELETE"])
+def stop_profiling():
+    """
+    Stops profiling the requests. The statistics are kept until the next start.
+
+    :return: A JSON representation of the state of the profiler.
+    :rtype: flask.Response
+    :raises 403: If the request is not sent by an administrator.
+    """
+
+    check_admin()
+    profiler.stop()
+    return jsonify(profiler.status())
 
 
 @app.route("/people", methods=["GET"])
@@ -17,20 +263,472 @@ def get_people():
     firstName or lastName starting with the value of this parameter
     is returned.
 
+    The people can also be filtered by the parameters 'birthday_from' and
+    'birthday_to' (inclusive bounds, in the format YYYY-MM-DD), 'age_min' and
+    'age_max' (inclusive bounds, in years), 'email_domain' and 'lastName'
+    (case-insensitive), sorted with 'sort' (comma-separated fields,
+    each prefixed by "-" for the descending order), and only some of their fields
+    are returned with 'fields' (comma-separated), see `parse_query`.
+
+    If the parameter 'limit' or 'after' is provided, a single page of people
+    sorted by id is returned. The link to the next page is given in the 'Link'
+    header of the response, if there is one.
+
+    If the parameter 'stream' is provided, the list of all people is written
+    by chunks instead of being built in memory first.
+
+    Except when streamed, the response has an ETag, and the serialized lists are
+    cached until the next write in the database, see `conditional_response`.
+
     :param name: The name of the person(s) to retrieve.
     :type name: str
+    :param limit: The maximum number of people in a page (100 by default).
+    :type limit: int
+    :param after: The id of the last person of the previous page.
+    :type after: str
+    :param stream: Stream the list of all people.
+    :type stream: str
     :return: A JSON representation of the list of people.
     :rtype: str
+    :raises 400: If the limit is not an integer between 1 and PAGE_LIMIT_MAX, or
+        if a filter, the sort or the fields are invalid.
     """
 
     args = request.args
     name = args.get("name")
-    persons = []
-    if name == None:
-        persons = db.select_all_persons()
-    else:
-        persons = db.select_persons_by_name_starting_with(name)
-    return Response((json.dumps(persons), "\n"), mimetype="application/json")
+    try:
+        filters, sort, fields = parse_query(args)
+    except ValueError as e:
+        return Response(str(e) + "\n", 400)
+    query = filters or sort != None or fields != FIELDS
+
+    if args.get("limit") != None or args.get("after") != None:
+        limit = parse_limit(args.get("limit", "100"))
+        if limit == None:
+            return Response(
+                "Invalid limit: must be between 1 and {}.\n".format(PAGE_LIMIT_MAX), 400
+            )
+        if sort != None:
+            return Response("Invalid sort: the pages are sorted by id.\n", 400)
+        if query:
+            # The id of the last person is read to link to the next page.
+            rows = db.select_persons(
+                filters, name, None, ("id",) + fields, limit, args.get("after")
+            )
+            last_id = rows[-1][0] if rows else None
+            body = encode_rows([row[1:] for row in rows], fields)
+        else:
+            rows = db.select_persons_page(
+                limit, args.get("after"), name, as_tuples=True
+            )
+            last_id = rows[-1][0] if rows else None
+            body = encode_rows(rows)
+        response = conditional_response((body, responses.make_etag(body)))
+        if len(rows) == limit:
+            next_args = args.to_dict()
+            next_args.update(limit=limit, after=last_id)
+            next_page = url_for("get_people", **next_args)
+            response.headers["Link"] = '<{}>; rel="next"'.format(next_page)
+        return response
+
+    if args.get("stream") != None and name == None and not query:
+        return Response(
+            stream_with_context(stream_people()), mimetype="application/json"
+        )
+
+    # The ages change with the date, so do the lists filtered by age.
+    today = date.today()
+    key = request.full_path
+    dated = "age_min" in filters or "age_max" in filters
+    if dated:
+        key += "#" + today.isoformat()
+    entry = responses.get(key)
+    if entry == None:
+        token = responses.token()
+        rows = []
+        if query:
+            rows = db.select_persons(filters, name, sort, fields, today=today)
+        elif name == None:
+            rows = db.select_all_persons(as_tuples=True)
+        else:
+            rows = db.select_persons_by_name_starting_with(name, as_tuples=True)
+        entry = responses.put(key, encode_rows(rows, fields), None, token, is_list=True)
+    return conditional_response(entry, today if dated else None)
+
+
+def parse_query(args) -> (dict, list, tuple):
+    """
+    Parses the parameters of `GET /people` filtering, sorting and projecting the
+    people, see `QUERY_PARAMETERS`.
+
+    :param args: The parameters of the request.
+    :return: The values of the filters by name (see `core.PeopleDatabase.FILTERS`),
+        the fields to sort the people by (or None), and the fields to return.
+    :rtype: (dict, list, tuple)
+    :raises ValueError: If a parameter is invalid, with the error message.
+    """
+
+    filters = parse_filters(args)
+
+    sort = None
+    if args.get("sort") != None:
+        sort = args.get("sort").split(",")
+        for field in sort:
+            if (field[1:] if field.startswith("-") else field) not in SORT_COLUMNS:
+                raise ValueError(
+                    "Invalid sort: must be fields among {}.".format(", ".join(FIELDS))
+                )
+
+    return filters, sort, parse_fields(args.get("fields"))
+
+
+def parse_filters(args) -> dict:
+    """
+    Parses the parameters filtering the people, see `core.PeopleDatabase.FILTERS`.
+
+    :param args: The parameters of the request.
+    :return: The values of the filters given, by name.
+    :rtype: dict
+    :raises ValueError: If a filter is invalid, with the error message.
+    """
+
+    filters = {}
+    for key in FILTERS:
+        value = args.get(key)
+        if value == None:
+            continue
+        if key.startswith("birthday_"):
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError(
+                    "Invalid {}: Bad format. Try YYYY-MM-DD.".format(key)
+                ) from None
+        elif key.startswith("age_"):
+            if not value.isdigit() or int(value) > AGE_MAX:
+                raise ValueError(
+                    "Invalid {}: must be between 0 and {}.".format(key, AGE_MAX)
+                )
+            value = int(value)
+        elif len(value) == 0:
+            raise ValueError("Invalid {}: empty.".format(key))
+        filters[key] = value
+    return filters
+
+
+def parse_fields(value: str) -> tuple:
+    """
+    Parses the value of a 'fields' parameter.
+
+    :param value: The value of the parameter, the names of fields separated by
+        commas, or None for all the fields.
+    :type value: str
+    :return: The fields to return, without duplicates.
+    :rtype: tuple
+    :raises ValueError: If a field is unknown, with the error message.
+    """
+
+    if value == None:
+        return FIELDS
+    fields = tuple(dict.fromkeys(value.split(",")))
+    if not set(fields) <= set(FIELDS):
+        raise ValueError("Invalid fields: must be among {}.".format(", ".join(FIELDS)))
+    return fields
+
+
+def encode_json(value) -> bytes:
+    """
+    Serializes a value, which may contain persons, into the body of a response.
+
+    :param value: The value to serialize.
+    :return: The JSON representation of the value, followed by a new line.
+    :rtype: bytes
+    """
+
+    with timed("serialization"):
+        return serializer.dumps(value)
+
+
+def encode_rows(rows: [tuple], fields: [str] = FIELDS) -> bytes:
+    """
+    Serializes rows read from the database into the body of a response, see
+    `core.JsonSerializer.JsonSerializer.dumps_rows`.
+
+    :param rows: The rows (id, firstName, lastName, email, birthday) of persons.
+    :type rows: [tuple]
+    :param fields: The names of the columns of the rows, all the fields by default.
+    :type fields: [str]
+    :return: The JSON representation of the list of persons, followed by a new line.
+    :rtype: bytes
+    """
+
+    with timed("serialization"):
+        return serializer.dumps_rows(rows, fields)
+
+
+def conditional_response(entry: (bytes, str), today: date = None) -> Response:
+    """
+    Builds a JSON response with its ETag and Last-Modified headers. If the request
+    has a matching If-None-Match (or If-Modified-Since) header, the response is
+    turned into a 304 Not Modified response without body.
+
+    :param entry: The body and the ETag of the response.
+    :type entry: (bytes, str)
+    :param today: The date the response depends on, if any, such as the ages of
+        the persons: the response is then modified at midnight too.
+    :type today: date
+    :return: The response to the request.
+    :rtype: flask.Response
+    """
+
+    response = Response(entry[0], mimetype="application/json")
+    response.set_etag(entry[1])
+    response.last_modified = db.last_modified
+    if today != None:
+        midnight = datetime.combine(today, datetime.min.time()).timestamp()
+        response.last_modified = max(db.last_modified, midnight)
+    return response.make_conditional(request)
+
+
+def parse_limit(value: str) -> int:
+    """
+    Parses the value of a 'limit' parameter.
+
+    :param value: The value of the parameter.
+    :type value: str
+    :return: The limit, or None if it is not an integer between 1 and PAGE_LIMIT_MAX.
+    :rtype: int
+    """
+
+    limit = int(value) if value.isdigit() else 0
+    return limit if 1 <= limit <= PAGE_LIMIT_MAX else None
+
+
+def stream_people():
+    """
+    Generates the JSON representation of the list of all people, one chunk
+    per batch of people read from the database.
+
+    :return: A generator of strings.
+    """
+
+    yield b"["
+    separator = b""
+    for rows in db.iter_all_persons(as_tuples=True):
+        # Strip the brackets and the new line around the serialized batch.
+        yield separator + serializer.dumps_rows(rows)[1:-2]
+        separator = b", "
+    yield b"]\n"
+
+
+@app.route("/people/birthdays", methods=["GET"])
+def get_upcoming_birthdays():
+    """
+    Retrieves the people whose birthday is within the next days, sorted by upcoming
+    birthday, see `core.PeopleDatabase.PeopleDatabase.select_upcoming_birthdays`.
+
+    :param days: The number of days after today (7 by default), 0 for today only.
+    :type days: int
+    :param fields: The fields returned for each person, separated by commas.
+    :type fields: str
+    :return: A JSON representation of the list of people.
+    :rtype: str
+    :raises 400: If the number of days is not an integer between 0 and
+        BIRTHDAYS_DAYS_MAX, or if the fields are invalid.
+    """
+
+    days = request.args.get("days", "7")
+    if not days.isdigit() or int(days) > BIRTHDAYS_DAYS_MAX:
+        return Response(
+            "Invalid days: must be between 0 and {}.\n".format(BIRTHDAYS_DAYS_MAX),
+            400,
+        )
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return Response(str(e) + "\n", 400)
+
+    today = date.today()
+    key = request.full_path + "#" + today.isoformat()
+    entry = responses.get(key)
+    if entry == None:
+        token = responses.token()
+        rows = db.select_upcoming_birthdays(int(days), today, fields)
+        entry = responses.put(key, encode_rows(rows, fields), None, token, is_list=True)
+    return conditional_response(entry, today)
+
+
+@app.route("/people/ages", methods=["GET"])
+def get_people_ages():
+    """
+    Returns the ages of many people at once, computed by a single query.
+
+    :param ids: The IDs of the people, separated by commas (PAGE_LIMIT_MAX at most).
+    :type ids: str
+    :return: A JSON object mapping each ID to the age of the person, or to null if
+        the person is not found.
+    :rtype: str
+    :raises 400: If the IDs are missing or too many.
+    """
+
+    ids = request.args.get("ids")
+    if ids == None or len(ids) == 0:
+        return Response("The parameter ids is missing.\n", 400)
+    ids = list(dict.fromkeys(ids.split(",")))
+    if len(ids) > PAGE_LIMIT_MAX:
+        return Response("Invalid ids: at most {} people.\n".format(PAGE_LIMIT_MAX), 400)
+
+    ages = db.select_ages(ids)
+    return Response(
+        encode_json({id: ages.get(id) for id in ids}), mimetype="application/json"
+    )
+
+
+@app.route("/people/batch-get", methods=["POST"])
+def get_people_by_ids():
+    """
+    Retrieves many people by their IDs in a single request, instead of one
+    `GET /people/<id>` per person. The people are read from the cache of the
+    lookups by id, and the other ones with a single query, see
+    `core.PeopleDatabase.PeopleDatabase.select_persons_by_ids`.
+
+    The body is a JSON object with the array of the IDs, e.g. {"ids": [...]}.
+
+    :return: A JSON array with, for each ID in the order of the request, the
+        person with this ID, or null if the person is not found.
+    :rtype: flask.Response
+    :raises 400: If the IDs are not an array of strings, or are more than
+        PAGE_LIMIT_MAX.
+    """
+
+    data = request.get_json(silent=True)
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(id, str) for id in ids):
+        return Response('Expected a JSON object {"ids": [...]} of strings.\n', 400)
+    if len(ids) > PAGE_LIMIT_MAX:
+        return Response("Invalid ids: at most {} people.\n".format(PAGE_LIMIT_MAX), 400)
+
+    persons = db.select_persons_by_ids(ids)
+    return Response(encode_json(persons), mimetype="application/json")
+
+
+@app.route("/people/search", methods=["GET"])
+def search_people():
+    """
+    Searches people by name.
+
+    Each word of the parameter 'q' must be found in the firstName or lastName of
+    the people returned: anywhere in the name for words of at least 3 characters,
+    or at the beginning of the name for shorter words.
+
+    :param q: The words to search for.
+    :type q: str
+    :param limit: The maximum number of people returned.
+    :type limit: int
+    :param rank: Sort the people by relevance instead of by insertion order.
+    :type rank: str
+    :return: A JSON representation of the list of people.
+    :rtype: str
+    :raises 400: If the parameter 'q' is missing or the limit is invalid.
+    """
+
+    args = request.args
+    query = args.get("q")
+    if query == None:
+        return Response("The parameter q is missing.\n", 400)
+
+    limit = None
+    if args.get("limit") != None:
+        limit = parse_limit(args.get("limit"))
+        if limit == None:
+            return Response(
+                "Invalid limit: must be between 1 and {}.\n".format(PAGE_LIMIT_MAX), 400
+            )
+
+    entry = responses.get(request.full_path)
+    if entry == None:
+        token = responses.token()
+        rows = db.search_persons(query, limit, args.get("rank") != None, as_tuples=True)
+        entry = responses.put(
+            request.full_path, encode_rows(rows), None, token, is_list=True
+        )
+    return conditional_response(entry)
+
+
+@app.route("/people/export", methods=["GET"])
+def export_people():
+    """
+    Exports all people, streamed by batches read from a consistent snapshot of
+    the database, see `PeopleDatabase.export_persons`. The memory used does not
+    depend on the number of people.
+
+    The export is compressed with gzip if the request accepts it in its
+    Accept-Encoding header.
+
+    :param format: 'ndjson' (by default) for one JSON person per line, or 'csv'
+        for a header line followed by one line per person.
+    :type format: str
+    :return: The people, as an attachment.
+    :rtype: flask.Response
+    :raises 400: If the format is unknown.
+    """
+
+    format = request.args.get("format", "ndjson")
+    if format not in EXPORT_FORMATS:
+        return Response(
+            "Invalid format: must be one of {}.\n".format(", ".join(EXPORT_FORMATS)),
+            400,
+        )
+
+    def generate():
+        if format == "csv":
+            yield encode_csv([FIELDS])
+            for rows in db.export_persons():
+                yield encode_csv(rows)
+        else:
+            for rows in db.export_persons():
+                yield serializer.dumps_lines(rows)
+
+    chunks = generate()
+    headers = {
+        "Content-Disposition": "attachment; filename=people.{}".format(format),
+        "Vary": "Accept-Encoding",
+    }
+    if request.accept_encodings["gzip"] > 0:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype=EXPORT_FORMATS[format], headers=headers)
+
+
+def encode_csv(rows: [tuple]) -> bytes:
+    """
+    Serializes rows in the CSV format.
+
+    :param rows: The rows to serialize.
+    :type rows: [tuple]
+    :return: One CSV line per row.
+    :rtype: bytes
+    """
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """
+    Compresses a stream with gzip, chunk by chunk.
+
+    :param chunks: A generator of bytes.
+    :return: A generator of the compressed bytes.
+    """
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
 
 
 @app.route("/people/<id>", methods=["GET"])
@@ -38,6 +736,10 @@ def get_person_by_id(id):
     """
     Retrieves the person with the specified ID from the database.
 
+    The serialized person is cached with its ETag, so a request with a matching
+    If-None-Match header is answered with a 304 response without reading the
+    database nor serializing the person again.
+
     :param id: The ID of the person.
     :type id: str
     :return: A JSON representation of the person.
@@ -45,12 +747,14 @@ def get_person_by_id(id):
     :raises 404: If the person with the specified ID is not found in the database.
     """
 
-    answer = db.select_person_by_id(id)
-
-    if answer == None:
-        abort(404)
-    else:
-        return Response((json.dumps(answer), "\n"), mimetype="application/json")
+    entry = responses.get(id)
+    if entry == None:
+        token = responses.token()
+        answer = db.select_person_by_id(id)
+        if answer == None:
+            abort(404)
+        entry = responses.put(id, encode_json(answer), answer.etag(), token)
+    return conditional_response(entry)
 
 
 @app.route("/people/<id>/age", methods=["GET"])
@@ -70,25 +774,20 @@ def get_person_age(id):
     if person == None:
         abort(404)
     else:
-        born_year = int(person["birthday"].split("-")[0])
-        born_month = int(person["birthday"].split("-")[1])
-        born_day = int(person["birthday"].split("-")[2])
-        today = date.today()
-        age = (
-            today.year - born_year - ((today.month, today.day) < (born_month, born_day))
-        )
-        return jsonify(age)
+        return jsonify(person.age())
 
 
 @app.route("/people", methods=["POST"])
 def create_person():
     """
-    Creates a person inside the database.
+    Creates a person inside the database, with a single query: the id and the
+    email are checked by the unique indexes of the database on insertion.
 
     :return: a JSON response containing the person details.
     :rtype: flask.Response
 
-    :raises 400: If the request contains invalid data.
+    :raises 400: If the request contains invalid data, or if the id or the email
+        is already taken.
     :raises 500: If the query to insert the data failed.
     """
 
@@ -100,83 +799,417 @@ def create_person():
         request.json["birthday"],
     )
 
-    error_message = person.verify_data()
-
-    if len(error_message) > 0:
-        return Response(error_message, 400)
+    with timed("validation"):
+        errors = validator.validate(person)
 
-    if db.select_person_by_id(person["id"]) != None:
-        return Response("Person with similar id already exist in database.", 400)
-    if db.select_person_by_email(person["email"]) != None:
-        return Response("Person with similar email already exist in database.", 400)
+    if errors:
+        return Response(validator.format_errors(errors), 400)
 
     try:
         db.create_person(person)
         return Response(
-            (json.dumps(person), "\n"), status=200, mimetype="application/json"
+            encode_json(person),
+            status=200,
+            mimetype="application/json",
         )
+    except sqlite3.IntegrityError as e:
+        field = conflicting_field(e)
+        if field == None:
+            raise
+        return Response(DUPLICATE_MESSAGES[field], 400)
+    except Exception as e:
+        return Response(
+            "Failed inserting verified data into database: {}\n".format(e), status=500
+        )
+
+
+@app.route("/people/bulk", methods=["POST"])
+def create_people():
+    """
+    Creates many persons inside the database.
+
+    The body is either a JSON array of persons, or one JSON person per line
+    when the mimetype is `application/x-ndjson`. Every person is verified,
+    then the valid ones are inserted by chunks of BULK_CHUNK_SIZE persons,
+    one transaction per chunk.
+
+    :return: a JSON report with the number of created and failed persons, and
+        the result of each person in the order of the request.
+    :rtype: flask.Response
+
+    :raises 400: If the body is not a JSON array nor NDJSON.
+    :raises 500: If the query to insert the data failed.
+    """
+
+    if request.mimetype == "application/x-ndjson":
+        records = (parse_ndjson_line(line) for line in request.stream if line.strip())
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return Response("Expected a JSON array or NDJSON of persons.\n", 400)
+
+    results = []
+    chunk = []
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == BULK_CHUNK_SIZE:
+                results += create_people_chunk(chunk, len(results))
+                chunk = []
+        results += create_people_chunk(chunk, len(results))
     except Exception as e:
         return Response(
             "Failed inserting verified data into database: {}\n".format(e), status=500
         )
 
+    created = sum(1 for result in results if result["status"] == "created")
+    report = {"created": created, "failed": len(results) - created, "results": results}
+    return Response(encode_json(report), status=200, mimetype="application/json")
+
+
+def parse_ndjson_line(line: bytes):
+    """
+    Parses one line of a NDJSON body.
+
+    :param line: The line to parse.
+    :type line: bytes
+    :return: The decoded JSON value, or None if the line is not valid JSON.
+    """
+
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def create_people_chunk(records: list, offset: int) -> [dict]:
+    """
+    Verifies and inserts a chunk of persons within a single transaction.
+
+    :param records: The decoded JSON persons.
+    :type records: list
+    :param offset: The position of the first person of the chunk in the request.
+    :type offset: int
+    :return: The result of each person of the chunk.
+    :rtype: [dict]
+    :raises sqlite3.Error: If the insertion failed.
+    """
+
+    objects = [record for record in records if isinstance(record, dict)]
+    with timed("validation"):
+        errors = iter(validator.validate_many(objects))
+
+    results = []
+    persons = []
+    for index, record in enumerate(records, offset):
+        if not isinstance(record, dict):
+            results.append(
+                {
+                    "index": index,
+                    "status": "invalid",
+                    "errors": {"person": "Not a JSON object."},
+                }
+            )
+            continue
+        record_errors = next(errors)
+        if record_errors:
+            results.append(
+                {
+                    "index": index,
+                    "id": record.get("id"),
+                    "status": "invalid",
+                    "errors": record_errors,
+                }
+            )
+        else:
+            person = Person(
+                record["id"],
+                record["firstName"],
+                record["lastName"],
+                record["email"],
+                record["birthday"],
+            )
+            results.append({"index": index, "id": person["id"], "status": "created"})
+            persons.append(person)
+
+    conflicts = iter(db.insert_persons(persons))
+    for result in results:
+        if result["status"] == "created":
+            conflict = next(conflicts)
+            if conflict != None:
+                result["status"] = "duplicate"
+                result["errors"] = {conflict: DUPLICATE_MESSAGES[conflict]}
+    return results
+
+
+def parse_bulk_write(data, args) -> (list, dict, tuple):
+    """
+    Parses the people targeted by `DELETE /people` and `PATCH /people`: the IDs
+    given in the body, and the filters of `GET /people` given in the query string.
+    At least one of them is required, so all the people are never written by mistake.
+
+    :param data: The decoded JSON body, or None.
+    :param args: The parameters of the request.
+    :return: The IDs (or None), the values of the filters by name, and the fields of
+        the people to return (or None to only count them, without the parameter
+        'returning').
+    :rtype: (list, dict, tuple)
+    :raises ValueError: If the people are not given or are invalid, with the error
+        message.
+    """
+
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if ids != None:
+        if not isinstance(ids, list) or not all(isinstance(id, str) for id in ids):
+            raise ValueError("Invalid ids: expected an array of strings.")
+        if len(ids) > BULK_CHUNK_SIZE:
+            raise ValueError("Invalid ids: at most {} people.".format(BULK_CHUNK_SIZE))
+
+    filters = parse_filters(args)
+    if ids == None and not filters:
+        raise ValueError(
+            "Expected the ids of the people in the body, or filters among: {}.".format(
+                ", ".join(FILTERS)
+            )
+        )
+
+    fields = None
+    if "returning" in args:
+        fields = parse_fields(args.get("fields"))
+    return ids, filters, fields
+
+
+def bulk_write_report(action: str, count: int, fields: tuple, rows: [tuple]):
+    """
+    Builds the response of `DELETE /people` and `PATCH /people`.
+
+    :param action: The name of the count, "deleted" or "updated".
+    :type action: str
+    :param count: The number of people written.
+    :type count: int
+    :param fields: The fields of the rows, or None.
+    :type fields: tuple
+    :param rows: The rows of the people written, or None.
+    :type rows: [tuple]
+    :return: A JSON object with the count, and the people written if returned.
+    :rtype: flask.Response
+    """
+
+    report = {action: count}
+    if rows != None:
+        report["people"] = [dict(zip(fields, row)) for row in rows]
+    return Response(encode_json(report), status=200, mimetype="application/json")
+
+
+@app.route("/people", methods=["DELETE"])
+def delete_people():
+    """
+    Deletes many people in a single transaction, instead of one
+    `DELETE /people/<id>` per person: the people with the IDs given in the body,
+    e.g. {"ids": [...]}, and matching the filters of `GET /people` given in the
+    query string, e.g. `?email_domain=example.com`. With the parameter 'returning',
+    the deleted people are returned, with the fields of the parameter 'fields'.
+
+    :return: A JSON object with the number of deleted people, e.g. {"deleted": 2},
+        and the deleted people with 'returning'.
+    :rtype: flask.Response
+    :raises 400: If neither IDs nor filters are given, or if they are invalid.
+    """
+
+    try:
+        ids, filters, fields = parse_bulk_write(
+            request.get_json(silent=True), request.args
+        )
+    except ValueError as e:
+        return Response(str(e) + "\n", 400)
+
+    count, rows = db.delete_persons(ids, filters, fields)
+    return bulk_write_report("deleted", count, fields, rows)
+
+
+@app.route("/people", methods=["PATCH"])
+def patch_people():
+    """
+    Updates some fields of many people in a single transaction: the people with
+    the IDs given in the body and matching the filters of `GET /people` given in
+    the query string, as for `DELETE /people`. The fields to update are given in
+    the body, e.g. {"ids": [...], "set": {"lastName": "Doe"}}. Only these fields
+    are validated, and only their columns are written.
+
+    :return: A JSON object with the number of updated people, e.g. {"updated": 2},
+        and the updated people with 'returning'.
+    :rtype: flask.Response
+    :raises 400: If neither IDs nor filters are given, if the fields to update are
+        missing or invalid, or if an email would be registered twice.
+    """
+
+    data = request.get_json(silent=True)
+    try:
+        ids, filters, fields = parse_bulk_write(data, request.args)
+    except ValueError as e:
+        return Response(str(e) + "\n", 400)
+
+    values = data.get("set") if isinstance(data, dict) else None
+    if not isinstance(values, dict):
+        return Response(
+            'Expected the fields to update in the body, e.g. {"set": {...}}.\n', 400
+        )
+    if values.get("id") != None:
+        return Response(
+            "Impossible to update someone's id, as one is linked per user.\n", 400
+        )
+    updated_fields = [field for field in UPDATABLE_FIELDS if values.get(field) != None]
+    if not updated_fields:
+        return Response(
+            "Expected at least one field to update among: {}.\n".format(
+                ", ".join(UPDATABLE_FIELDS)
+            ),
+            400,
+        )
+    with timed("validation"):
+        errors = validator.validate(values, updated_fields)
+    if errors:
+        return Response(validator.format_errors(errors), 400)
+
+    try:
+        count, rows = db.update_persons(values, ids, filters, fields)
+    except sqlite3.IntegrityError as e:
+        if conflicting_field(e) != "email":
+            raise
+        return Response(
+            "Impossible to update those people with that email, someone already has this email registered in database.\n",
+            400,
+        )
+    return bulk_write_report("updated", count, fields, rows)
+
 
 @app.route("/people/<id>", methods=["PUT"])
 def update_person(id):
     """
     Updates the person with given id in the database.
 
+    Only the fields sent are validated and updated, by a single query which
+    returns the updated person. The email is checked by the unique index of the
+    database on update.
+
     :param id: The id of the person to be updated.
     :type id: str
     :return: A JSON response containing the updated person details.
     :rtype: flask.Response
 
     :raises 404: If the person with the given id does not exist in the database.
-    :raises 400: If the request contains invalid data.
+    :raises 400: If the request contains invalid data, or if the email is
+        already taken by someone else.
 
     """
 
-    person = db.select_person_by_id(id)
+    fields = [field for field in UPDATABLE_FIELDS if request.json.get(field) != None]
+    with timed("validation"):
+        errors = validator.validate(request.json, fields)
+
+    if request.json.get("id") != None or errors:
+        # An unknown person is reported first, as when it was read before the update.
+        if db.select_person_by_id(id) == None:
+            abort(404)
+    if request.json.get("id") != None:
+        return Response(
+            "Impossible to update someone's id, as one is linked per user.\n", 400
+        )
+    if errors:
+        return Response(validator.format_errors(errors), 400)
+
+    try:
+        person = db.update_person_fields(id, request.json)
+    except sqlite3.IntegrityError as e:
+        if conflicting_field(e) != "email":
+            raise
+        return Response(
+            "Impossible to update that person with that email, someone already has this email registered in database.\n",
+            400,
+        )
 
     if person == None:
         abort(404)
 
-    if request.json.get("id") != None:
+    return Response(
+        encode_json(person),
+        status=200,
+        mimetype="application/json",
+    )
+
+
+@app.route("/people/<id>", methods=["PATCH"])
+def patch_person(id):
+    """
+    Updates some fields of the person with given id in the database.
+
+    Only the fields sent are validated, and only their columns are written, by a
+    single query which returns the updated person. With an If-Match header, the
+    person is only updated if its current ETag is one of the given ones (or if it
+    exists, for "*"), which is checked by the same query (optimistic concurrency).
+    The response has the new ETag of the person.
+
+    :param id: The id of the person to be updated.
+    :type id: str
+    :return: A JSON response containing the updated person details.
+    :rtype: flask.Response
+
+    :raises 400: If the body is not a JSON object, if it contains no field to update
+        or invalid data, or if the email is already taken by someone else.
+    :raises 404: If the person with the given id does not exist in the database.
+    :raises 412: If the person was modified since the version given by If-Match.
+    """
+
+    values = request.get_json(silent=True)
+    if not isinstance(values, dict):
+        return Response("Expected a JSON object of the fields to update.\n", 400)
+    if values.get("id") != None:
         return Response(
             "Impossible to update someone's id, as one is linked per user.\n", 400
         )
-    if request.json.get("email") != None:
-        if db.select_person_by_email(request.json["email"]) != None:
-            return Response(
-                "Impossible to update that person with that email, someone already has this email registered in database.\n",
-                400,
-            )
-        else:
-            person["email"] = request.json["email"]
 
-    person["firstName"] = (
-        request.json["firstName"]
-        if request.json.get("firstName") != None
-        else person["firstName"]
-    )
-    person["lastName"] = (
-        request.json["lastName"]
-        if request.json.get("lastName") != None
-        else person["lastName"]
-    )
-    person["birthday"] = (
-        request.json["birthday"]
-        if request.json.get("birthday") != None
-        else person["birthday"]
-    )
+    fields = [field for field in UPDATABLE_FIELDS if values.get(field) != None]
+    if not fields:
+        return Response(
+            "Expected at least one field to update among: {}.\n".format(
+                ", ".join(UPDATABLE_FIELDS)
+            ),
+            400,
+        )
+    with timed("validation"):
+        errors = validator.validate(values, fields)
+    if errors:
+        return Response(validator.format_errors(errors), 400)
 
-    error_message = person.verify_data()
+    etags = None
+    if request.if_match and not request.if_match.star_tag:
+        # Weak ETags never match If-Match, which uses the strong comparison.
+        etags = sorted(request.if_match.as_set())
 
-    if len(error_message) > 0:
-        return Response(error_message, 400)
+    try:
+        person = db.update_person_fields(id, values, etags)
+    except sqlite3.IntegrityError as e:
+        if conflicting_field(e) != "email":
+            raise
+        return Response(
+            "Impossible to update that person with that email, someone already has this email registered in database.\n",
+            400,
+        )
 
-    db.update_person(person)
-    return Response((json.dumps(person), "\n"), status=200, mimetype="application/json")
+    if person == None:
+        if etags == None or db.select_person_by_id(id) == None:
+            abort(404)
+        return Response(
+            "The person was modified since the version given by If-Match.\n", 412
+        )
+
+    response = Response(
+        encode_json(person),
+        status=200,
+        mimetype="application/json",
+    )
+    response.set_etag(person.etag())
+    return response
 
 
 @app.route("/people/<id>", methods=["DELETE"])
@@ -191,11 +1224,13 @@ def delete_person(id):
     :raises 404: If the person with the specified ID is not found.
     """
 
-    person = db.select_person_by_id(id)
+    person = db.delete_person_by_id(id)
 
     if person == None:
         abort(404)
 
-    db.delete_person(person)
-
-    return Response((json.dumps(person), "\n"), status=200, mimetype="application/json")
+    return Response(
+        encode_json(person),
+        status=200,
+        mimetype="application/json",
+    )
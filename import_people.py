@@ -0,0 +1,116 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Import persons from a NDJSON or CSV file into an on-disk database, offline.
+
+The persons are validated with the rules of the API, and inserted by large batches,
+each within a single transaction, skipping the ids and the emails already taken.
+The secondary indexes are built once at the end of the import. The rejected persons
+can be written to an errors file, one JSON object per line, with their line number
+and error messages.
+
+Stop the server before importing: the database is not flushed to the disk during
+the import, so its file may be corrupted if the machine crashes meanwhile.
+
+Usage:
+
+    python3 import_people.py people.ndjson --db people.db --errors rejected.ndjson
+    python3 import_people.py people.csv --db people.db
+    gunzip -c people.ndjson.gz | python3 import_people.py - --format ndjson
+"""
+
+from core.ConnectionPool import MEMORY_PATH
+from core.PeopleDatabase import PeopleDatabase
+from core.PeopleImporter import PeopleImporter, read_csv, read_ndjson
+import argparse
+import io
+import os
+import sys
+import time
+
+FORMATS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+"""
+Formats of the input files, by extension.
+"""
+
+
+def open_input(path: str, format: str):
+    """
+    Open the input file, or the standard input for "-", and read its persons.
+
+    :param path: The path of the file.
+    :type path: str
+    :param format: The format of the file, "ndjson" or "csv".
+    :type format: str
+    :return: The file, and a generator of the line numbers and the persons.
+    """
+    binary = sys.stdin.buffer if path == "-" else open(path, "rb")
+    if format == "ndjson":
+        return binary, read_ndjson(binary)
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    return text, read_csv(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help='path of the file to import, "-" for stdin')
+    parser.add_argument("--db", default="people.db", help="path of the database file")
+    parser.add_argument("--format", choices=("ndjson", "csv"))
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--errors", help="path of the file of the rejected persons")
+    parser.add_argument(
+        "--keep-indexes",
+        action="store_true",
+        help="update the secondary indexes during the import instead of at the end",
+    )
+    parser.add_argument("--quiet", action="store_true", help="do not print progress")
+    args = parser.parse_args()
+
+    if args.db == MEMORY_PATH:
+        parser.error("the database must be on disk")
+    format = args.format or FORMATS.get(os.path.splitext(args.input)[1].lower())
+    if format is None:
+        parser.error("cannot infer the format of the input, use --format")
+    if args.batch_size < 1:
+        parser.error("the batch size must be positive")
+
+    start = time.perf_counter()
+
+    def progress(counters: dict):
+        if args.quiet:
+            return
+        elapsed = time.perf_counter() - start
+        print(
+            "{read} read, {created} created, {invalid} invalid, {duplicate} duplicate"
+            " ({rate:.0f} rows/s)".format(
+                rate=counters["read"] / elapsed if elapsed else 0.0, **counters
+            ),
+            file=sys.stderr,
+        )
+
+    db = PeopleDatabase(args.db, cache_size=0, seed=False)
+    errors = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    source, records = open_input(args.input, format)
+    try:
+        importer = PeopleImporter(db, args.batch_size, errors, progress)
+        counters = importer.run(records, defer_indexes=not args.keep_indexes)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if errors is not None:
+            errors.close()
+        db.close()
+
+    if not args.quiet:
+        print(
+            "Imported {} of {} persons in {:.1f}s".format(
+                counters["created"], counters["read"], time.perf_counter() - start
+            ),
+            file=sys.stderr,
+        )
+    if counters["invalid"] or counters["duplicate"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+"""
+Pre-fork entry point of the server: the parent process binds the listening socket
+and initializes the on-disk database once, then forks worker processes which all
+accept the connections of that socket, so the API uses every CPU core.
+
+The workers share the database file in WAL mode, and each of them detects the
+writes of the others before every request to keep its caches coherent, see
+`PeopleDatabase.refresh`.
+
+Usage:
+
+    python3 server.py --db people.db --workers 4 --port 5000
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+RESPAWN_DELAY = 1.0
+"""
+Number of seconds to wait before replacing a worker which exited unexpectedly, so a
+worker failing at startup does not make the parent fork in a busy loop.
+"""
+
+
+def bind_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """
+    Create the listening socket shared by the workers.
+
+    :param host: The address to listen on.
+    :type host: str
+    :param port: The port to listen on.
+    :type port: int
+    :param backlog: The maximum number of pending connections.
+    :type backlog: int
+    :return: The bound socket, inherited by the forked workers.
+    :rtype: socket.socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, host: str, port: int):
+    """
+    Serve the application on the shared socket, in a forked worker. The application
+    is imported after the fork, so each worker opens its own database connections.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from app import app
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def spawn_worker(sock: socket.socket, host: str, port: int) -> int:
+    """
+    Fork a worker process.
+
+    :return: The pid of the worker.
+    :rtype: int
+    """
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, host, port)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def stop_workers(workers: set):
+    """
+    Terminate the workers and wait for them.
+    """
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def stop(signum, frame):
+    """
+    Handler of SIGTERM in the parent process, which stops it like SIGINT does.
+    """
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--db", default="people.db", help="path of the database file")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit(
+            "server.py needs os.fork, which is not available on this platform. "
+            "Run app.py, or asgi.py with uvicorn, instead."
+        )
+    if args.db == ":memory:":
+        sys.exit("The workers can not share an in-memory database, use a file.")
+    if args.workers < 1:
+        sys.exit("There must be at least one worker.")
+
+    os.environ["PEOPLE_DB_PATH"] = args.db
+    os.environ["PEOPLE_DB_SHARED"] = "1"
+
+    # Create the tables, the indexes and the default persons once, before the fork,
+    # so the workers do not race to initialize the database.
+    from core.PeopleDatabase import PeopleDatabase
+
+    PeopleDatabase(args.db, shared=True).close()
+
+    sock = bind_socket(args.host, args.port)
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = {spawn_worker(sock, args.host, args.port) for i in range(args.workers)}
+    print(
+        "Serving on http://{}:{} with {} workers".format(
+            args.host, args.port, args.workers
+        ),
+        flush=True,
+    )
+
+    try:
+        while True:
+            pid, status = os.waitpid(-1, 0)
+            if pid in workers:
+                workers.discard(pid)
+                print("Worker {} exited, starting a new one".format(pid), flush=True)
+                time.sleep(RESPAWN_DELAY)
+                workers.add(spawn_worker(sock, args.host, args.port))
+    except (KeyboardInterrupt, ChildProcessError):
+        pass
+    finally:
+        stop_workers(workers)
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.ConnectionPool import ConnectionPool
+from core.PeopleDatabase import PeopleDatabase
+import os
+import tempfile
+import threading
+import unittest
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class ConnectionPool,
+    by testing its functions.
+    """
+
+    def setUp(self):
+        """
+        Create a temporary directory to store database files.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "people.db")
+
+    def tearDown(self):
+        """
+        Remove the temporary directory.
+        """
+        self.directory.cleanup()
+
+    def connection_of_another_thread(self, pool):
+        """
+        Return the connection the pool gives to a new thread.
+        """
+        result = []
+        thread = threading.Thread(target=lambda: result.append(pool.connection()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_memory_connection_is_shared(self):
+        """
+        Test every thread uses the same connection to an in-memory database.
+        """
+        pool = ConnectionPool()
+        self.assertIs(pool.connection(), self.connection_of_another_thread(pool))
+        pool.close()
+
+    def test_functions(self):
+        """
+        Test the SQL functions are registered on every connection.
+        """
+        pool = ConnectionPool(self.path, functions={"twice": (1, lambda x: 2 * x)})
+        for connection in (pool.connection(), self.connection_of_another_thread(pool)):
+            self.assertEqual(4, connection.execute("SELECT twice(2);").fetchone()[0])
+        pool.close()
+
+    def test_file_connection_per_thread(self):
+        """
+        Test each thread gets its own connection to an on-disk database, and that
+        the connection of a finished thread is reused.
+        """
+        pool = ConnectionPool(self.path)
+        connection = pool.connection()
+        self.assertIs(connection, pool.connection())
+        other = self.connection_of_another_thread(pool)
+        self.assertIsNot(connection, other)
+        self.assertIs(other, self.connection_of_another_thread(pool))
+        pool.close()
+
+    def test_file_connection_pragmas(self):
+        """
+        Test the connections to an on-disk database use the WAL journal mode.
+        """
+        pool = ConnectionPool(self.path)
+        cursor = pool.connection().cursor()
+        cursor.execute("PRAGMA journal_mode;")
+        self.assertEqual("wal", cursor.fetchone()[0])
+        cursor.execute("PRAGMA synchronous;")
+        self.assertEqual(1, cursor.fetchone()[0])
+        pool.close()
+
+    def test_file_database_survives_restart(self):
+        """
+        Test an on-disk database keeps its data and is only seeded once.
+        """
+        db = PeopleDatabase(self.path)
+        db.delete_person(db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"))
+        db.close()
+
+        db = PeopleDatabase(self.path)
+        self.assertEqual(3, len(db.select_all_persons()))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from core.ConnectionPool import ConnectionPool
+from core.GroupCommitWriter import GroupCommitWriter
+from core.PeopleDatabase import PeopleDatabase
+from core.Person import Person
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+
+class RecordingWriter(GroupCommitWriter):
+    """
+    A writer recording the number of writes of each batch it commits.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.batches = []
+        super().__init__(*args, **kwargs)
+
+    def write_batch(self, db_connection, batch):
+        self.batches.append(len(batch))
+        super().write_batch(db_connection, batch)
+
+
+class TestGroupCommitWriter(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class GroupCommitWriter,
+    by testing its functions.
+    """
+
+    def setUp(self):
+        """
+        Create an on-disk database with a table of numbers before each unit test.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.directory.name, "numbers.db"))
+        self.pool.connection().execute("CREATE TABLE numbers (n INTEGER UNIQUE);")
+
+    def tearDown(self):
+        self.pool.close()
+        self.directory.cleanup()
+
+    def count(self) -> int:
+        return (
+            self.pool.connection()
+            .execute("SELECT COUNT(*) FROM numbers;")
+            .fetchone()[0]
+        )
+
+    def insert(self, n: int):
+        def write(cursor):
+            cursor.execute("INSERT INTO numbers VALUES (?);", (n,))
+            return n
+
+        return write
+
+    def test_submit(self):
+        """
+        Test that a write returns its result once committed.
+        """
+        writer = GroupCommitWriter(self.pool)
+        self.assertEqual(1, writer.submit(self.insert(1)))
+        self.assertEqual(1, self.count())
+        writer.close()
+
+    def test_concurrent_writes_are_committed_together(self):
+        """
+        Test that the writes queued meanwhile are committed in a single transaction.
+        """
+        writer = RecordingWriter(self.pool, max_delay=0.2, max_batch=8)
+        barrier = threading.Barrier(8)
+
+        def insert(n):
+            barrier.wait()
+            return writer.submit(self.insert(n))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(range(8)), list(executor.map(insert, range(8))))
+        writer.close()
+
+        self.assertEqual(8, self.count())
+        self.assertEqual([8], writer.batches)
+
+    def test_failing_write_is_rolled_back_alone(self):
+        """
+        Test that a failing write raises its error, without rolling back the other
+        writes of its batch.
+        """
+        writer = RecordingWriter(self.pool, max_delay=0.2, max_batch=3)
+        barrier = threading.Barrier(3)
+
+        def insert(n):
+            barrier.wait()
+            try:
+                return writer.submit(self.insert(n))
+            except sqlite3.IntegrityError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = sorted(executor.map(insert, (1, 1, 2)), key=str)
+        writer.close()
+
+        self.assertEqual([1, 2, None], results)
+        self.assertEqual([3], writer.batches)
+        self.assertEqual(2, self.count())
+
+    def test_close(self):
+        """
+        Test that a closed writer refuses the writes.
+        """
+        writer = GroupCommitWriter(self.pool)
+        writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.submit(self.insert(1))
+
+    def test_stopped_writer_fails_the_writes(self):
+        """
+        Test that the writes fail instead of waiting forever when the thread of the
+        writer stopped, here because it could not connect to the database.
+        """
+        pool = ConnectionPool(os.path.join(self.directory.name, "missing", "x.db"))
+        writer = GroupCommitWriter(pool)
+        writer._thread.join()
+        with self.assertRaises(RuntimeError) as context:
+            writer.submit(self.insert(1))
+        self.assertIsInstance(context.exception.__cause__, sqlite3.OperationalError)
+        writer.close()
+        pool.close()
+
+    def test_writes_queued_after_close_fail(self):
+        """
+        Test that the writes queued after the writer was closed fail.
+        """
+        writer = GroupCommitWriter(self.pool)
+        future = Future()
+        with writer._lock:
+            writer._queue.put(None)
+            writer._queue.put((self.insert(1), None, future))
+        writer._thread.join()
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=1)
+        self.assertEqual(0, self.count())
+
+    def test_people_database(self):
+        """
+        Test the writes of a PeopleDatabase with group commit.
+        """
+        db = PeopleDatabase(
+            os.path.join(self.directory.name, "people.db"),
+            group_commit=True,
+            group_commit_delay=0.01,
+            group_commit_batch=16,
+        )
+        self.assertEqual((0.01, 16), (db.writer.max_delay, db.writer.max_batch))
+        person = Person(
+            "0b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",
+            "Ada",
+            "Lovelace",
+            "ada@example.com",
+            "1990-12-10",
+        )
+        db.create_person(person)
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.create_person(person)
+        updated = db.update_person_fields(person["id"], {"firstName": "Augusta"})
+        self.assertEqual("Augusta", updated["firstName"])
+        self.assertEqual("Augusta", db.delete_person_by_id(person["id"])["firstName"])
+        self.assertEqual(None, db.select_person_by_id(person["id"]))
+        self.assertEqual([None, "id"], db.insert_persons([person, person]))
+
+        # Every write of the persons goes through the writer, the bulk ones too.
+        db.writer.close()
+        with self.assertRaises(RuntimeError):
+            db.insert_persons([person])
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
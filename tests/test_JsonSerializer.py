@@ -0,0 +1,80 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.JsonSerializer import SERIALIZERS, JsonSerializer, get_serializer, orjson
+from core.Person import Person
+import json
+import unittest
+
+ROWS = [
+    (
+        "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+        "John",
+        "Doe",
+        "johndoe@example.com",
+        "1997-01-01",
+    ),
+    (
+        "d5356358-b39f-4c6e-9690-2c965a607702",
+        "Jäne",
+        'D"oe',
+        "janedoe@example.com",
+        "1991-07-28",
+    ),
+]
+
+
+class TestJsonSerializer(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the JSON serializers,
+    by testing their functions.
+    """
+
+    def test_dumps_rows_like_dumps(self):
+        """
+        Test the rows are serialized exactly like the list of the same persons.
+        """
+        serializer = JsonSerializer()
+        persons = [Person(*row) for row in ROWS]
+        self.assertEqual(serializer.dumps(persons), serializer.dumps_rows(ROWS))
+        self.assertEqual(b"[]\n", serializer.dumps_rows([]))
+
+    def test_dumps_rows_with_fields(self):
+        """
+        Test rows holding only some fields are serialized with the names of these fields.
+        """
+        rows = [(row[3], row[0]) for row in ROWS]
+        expected = [{"email": row[3], "id": row[0]} for row in ROWS]
+        for name in SERIALIZERS:
+            try:
+                serializer = get_serializer(name)
+            except ImportError:
+                continue
+            body = serializer.dumps_rows(rows, ("email", "id"))
+            self.assertEqual(expected, json.loads(body))
+            self.assertEqual(b"[]\n", serializer.dumps_rows([], ("id",)))
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson(self):
+        """
+        Test the orjson serializer gives the same values as the json serializer.
+        """
+        serializer = get_serializer("orjson")
+        persons = [Person(*row) for row in ROWS]
+        expected = json.loads(JsonSerializer().dumps(persons))
+        self.assertEqual(expected, json.loads(serializer.dumps(persons)))
+        self.assertEqual(expected, json.loads(serializer.dumps_rows(ROWS)))
+        self.assertTrue(serializer.dumps_rows(ROWS).endswith(b"]\n"))
+
+    def test_get_serializer(self):
+        """
+        Test get_serializer() picks the json module by default, whichever packages
+        are installed, and rejects unknown serializers.
+        """
+        self.assertEqual("json", get_serializer().name)
+        self.assertEqual("json", get_serializer("json").name)
+        with self.assertRaises(ValueError):
+            get_serializer("yaml")
+
+
+if __name__ == "__main__":
+    unittest.main()
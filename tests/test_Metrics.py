@@ -0,0 +1,136 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.AsyncPeopleDatabase import AsyncPeopleDatabase
+from core.Metrics import Metrics, current_stats, measured_by, task_stats, timed
+from core.PeopleDatabase import PeopleDatabase
+import asyncio
+import threading
+import unittest
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class Metrics,
+    by testing its functions.
+    """
+
+    def test_disabled(self):
+        """
+        Test nothing is measured when the metrics are disabled.
+        """
+        metrics = Metrics()
+        metrics.start_request()
+        with timed("serialization"):
+            pass
+        self.assertEqual(None, metrics.end_request("/people", "GET", 200))
+        self.assertNotIn("people_requests_total{", metrics.render())
+
+    def test_end_request(self):
+        """
+        Test the phases timed during a request are recorded, and formatted in the
+        Server-Timing header.
+        """
+        metrics = Metrics(True)
+        metrics.start_request()
+        with timed("serialization"):
+            pass
+        stats = metrics.end_request("/people/<id>", "GET", 200)
+        self.assertGreater(stats.durations["serialization"], 0)
+        self.assertGreaterEqual(
+            stats.durations["total"], stats.durations["serialization"]
+        )
+
+        timing = Metrics.server_timing(stats)
+        self.assertIn('sql;dur=0.000;desc="0 queries"', timing)
+        self.assertIn("serialization;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        self.assertEqual(None, metrics.end_request("/people/<id>", "GET", 200))
+
+    def test_measured_by(self):
+        """
+        Test the code timed by another thread is added to the measures of a request.
+        """
+        metrics = Metrics(True)
+        metrics.start_request()
+        stats = current_stats()
+
+        def serialize():
+            with measured_by(stats):
+                with timed("serialization"):
+                    pass
+            with timed("validation"):
+                pass
+
+        thread = threading.Thread(target=serialize)
+        thread.start()
+        thread.join()
+        stats = metrics.end_request("/people", "GET", 200)
+        self.assertGreater(stats.durations["serialization"], 0)
+        self.assertEqual(0, stats.durations["validation"])
+        self.assertEqual(None, current_stats())
+
+    def test_render(self):
+        """
+        Test the metrics are rendered in the text format of Prometheus, with
+        cumulative buckets.
+        """
+        metrics = Metrics(True, buckets=(0.1, 1.0))
+        metrics._observe("people_request_duration_seconds", (("route", "/"),), 0.5)
+        metrics._observe("people_request_duration_seconds", (("route", "/"),), 0.05)
+        metrics._increment("people_requests_total", (("route", '"a"'),), 2)
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE people_request_duration_seconds histogram", lines)
+        self.assertIn(
+            'people_request_duration_seconds_bucket{route="/",le="0.1"} 1', lines
+        )
+        self.assertIn(
+            'people_request_duration_seconds_bucket{route="/",le="1.0"} 2', lines
+        )
+        self.assertIn(
+            'people_request_duration_seconds_bucket{route="/",le="+Inf"} 2', lines
+        )
+        self.assertIn('people_request_duration_seconds_count{route="/"} 2', lines)
+        self.assertIn('people_requests_total{route="\\"a\\""} 2', lines)
+
+    def test_instrumented_database(self):
+        """
+        Test the queries of an instrumented database are counted and timed, only
+        during a request.
+        """
+        db = PeopleDatabase(instrumented=True)
+        metrics = Metrics(True)
+        db.select_all_persons()
+
+        metrics.start_request()
+        db.select_all_persons()
+        db.select_person_by_email("janedoe@example.com")
+        stats = metrics.end_request("/people", "GET", 200)
+        self.assertEqual(2, stats.queries)
+        self.assertGreater(stats.durations["sql"], 0)
+        self.assertIn('people_sql_queries_total{route="/people"} 2', metrics.render())
+        db.close()
+
+    def test_task_stats(self):
+        """
+        Test the queries run by an AsyncPeopleDatabase are counted for the request
+        of the calling task.
+        """
+        db = PeopleDatabase(instrumented=True)
+        async_db = AsyncPeopleDatabase(db, 2)
+        metrics = Metrics(True)
+
+        async def request():
+            stats = metrics.new_request()
+            task_stats.set(stats)
+            await async_db.select_all_persons()
+            await async_db.select_person_by_email("janedoe@example.com")
+            return metrics.record(stats, "/people", "GET", 200)
+
+        self.assertEqual(2, asyncio.run(request()).queries)
+        self.assertEqual(None, task_stats.get())
+        async_db.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
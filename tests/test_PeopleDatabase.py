@@ -1,7 +1,12 @@
 # Author: Cyprien Borée boreec@tuta.io
 
-from core.PeopleDatabase import PeopleDatabase
+from core.PeopleDatabase import FILTERS, PeopleDatabase, conflicting_field, in_list
 from core.Person import Person
+from datetime import date
+import os
+import sqlite3
+import tempfile
+import threading
 import unittest
 
 
@@ -50,6 +55,24 @@ class TestPeopleDatabase(unittest.TestCase):
         self.assertTrue(isinstance(person, Person))
         self.assertEqual("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de", person["id"])
 
+    def test_select_persons_by_ids(self):
+        """
+        Test select_persons_by_ids() returns the persons in the order of the ids,
+        with None for the unknown ids, and caches them.
+        """
+        ids = [person["id"] for person in self.db.select_all_persons()]
+        persons = self.db.select_persons_by_ids([ids[2], "unknown", ids[0], ids[2]])
+        self.assertEqual(
+            [ids[2], None, ids[0], ids[2]],
+            [None if person == None else person["id"] for person in persons],
+        )
+        self.assertEqual({ids[0], ids[2]}, set(self.db.cache.get_many(ids)))
+        rows = self.db.select_persons_by_ids([ids[0], ids[1]], as_tuples=True)
+        self.assertEqual(
+            [self.db.select_person_by_id(id).to_tuple() for id in ids[:2]], rows
+        )
+        self.assertEqual([], self.db.select_persons_by_ids([]))
+
     def test_select_person_by_email_for_unknown_email(self):
         """
         Test select_person_by_email returns None when an unknown email is provided.
@@ -115,6 +138,144 @@ class TestPeopleDatabase(unittest.TestCase):
         # make sure retrieved data has been changed
         self.assertEqual(person["firstName"], "Harry")
 
+    def test_update_person_fields(self):
+        """
+        Test update_person_fields() only updates the given fields, and returns the
+        updated person, or None for an unknown id.
+        """
+        person = self.db.update_person_fields(
+            "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+            {"firstName": "Harry", "lastName": None, "birthday": "1997-2-3"},
+        )
+        self.assertEqual(
+            ("Harry", "Doe", "1997-02-03"),
+            (person["firstName"], person["lastName"], person["birthday"]),
+        )
+        self.assertEqual(
+            person, self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        )
+        self.assertEqual(
+            None, self.db.update_person_fields("unknown", {"lastName": "X"})
+        )
+
+    def test_update_person_fields_with_etags(self):
+        """
+        Test update_person_fields() only updates a person whose version is one of
+        the given ETags.
+        """
+        id = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+        etag = self.db.select_person_by_id(id).etag()
+        self.assertEqual(
+            None, self.db.update_person_fields(id, {"firstName": "Harry"}, ["stale"])
+        )
+        self.assertEqual(None, self.db.update_person_fields(id, {}, []))
+        person = self.db.update_person_fields(id, {"firstName": "Harry"}, [etag])
+        self.assertEqual("Harry", person["firstName"])
+        self.assertEqual(
+            None, self.db.update_person_fields(id, {"firstName": "Ron"}, [etag])
+        )
+        self.assertEqual(person, self.db.update_person_fields(id, {}, [person.etag()]))
+
+    def test_update_person_fields_with_email_taken(self):
+        """
+        Test update_person_fields() raises an IntegrityError on the email, and
+        leaves the person unchanged.
+        """
+        with self.assertRaises(sqlite3.IntegrityError) as context:
+            self.db.update_person_fields(
+                "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+                {"firstName": "Harry", "email": "janedoe@example.com"},
+            )
+        self.assertEqual("email", conflicting_field(context.exception))
+        person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        self.assertEqual("John", person["firstName"])
+        self.assertFalse(self.db.db_connection.in_transaction)
+
+    def test_delete_persons(self):
+        """
+        Test delete_persons() deletes the persons with the given ids and matching
+        the filters, and invalidates their cached lookups.
+        """
+        john = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+        jane = "d5356358-b39f-4c6e-9690-2c965a607702"
+        self.db.select_person_by_id(jane)
+        self.assertEqual(
+            (1, [(jane, "Jane")]),
+            self.db.delete_persons(
+                [john, "unknown", jane, jane],
+                {"birthday_to": "1995-12-31"},
+                ["id", "firstName"],
+            ),
+        )
+        self.assertEqual(None, self.db.select_person_by_id(jane))
+        self.assertEqual((1, None), self.db.delete_persons(filters={"lastName": "doe"}))
+        self.assertEqual((0, []), self.db.delete_persons([], fields=["id"]))
+        self.assertEqual(2, len(self.db.select_all_persons()))
+        with self.assertRaises(KeyError):
+            self.db.delete_persons(filters={"unknown": "value"})
+
+    def test_update_persons(self):
+        """
+        Test update_persons() updates the given columns of the persons with the
+        given ids and matching the filters.
+        """
+        jane = "d5356358-b39f-4c6e-9690-2c965a607702"
+        self.db.select_person_by_id(jane)
+        count, rows = self.db.update_persons(
+            {"lastName": "Smith", "birthday": "1990-1-2", "email": None},
+            filters={"lastName": "DOE"},
+            fields=["lastName", "birthday"],
+        )
+        self.assertEqual((2, [("Smith", "1990-01-02")] * 2), (count, rows))
+        self.assertEqual("Smith", self.db.select_person_by_id(jane)["lastName"])
+        self.assertEqual(
+            (1, None),
+            self.db.update_persons({"firstName": "Janet"}, [jane, "unknown"]),
+        )
+        self.assertEqual("Janet", self.db.select_person_by_id(jane)["firstName"])
+        # The list of 3 ids is padded to 4 by repeating jane, written once.
+        self.assertEqual(
+            (1, [("Jenny",)]),
+            self.db.update_persons(
+                {"firstName": "Jenny"}, ["unknown", "other", jane], fields=["firstName"]
+            ),
+        )
+        with self.assertRaises(ValueError):
+            self.db.update_persons({"email": None})
+
+    def test_update_persons_with_email_taken(self):
+        """
+        Test update_persons() updates none of the persons if an email would be
+        registered twice.
+        """
+        with self.assertRaises(sqlite3.IntegrityError) as context:
+            self.db.update_persons(
+                {"firstName": "Harry", "email": "harry@example.com"},
+                filters={"lastName": "Doe"},
+            )
+        self.assertEqual("email", conflicting_field(context.exception))
+        self.assertEqual(
+            [("John",), ("Jane",)],
+            self.db.select_persons({"lastName": "Doe"}, fields=["firstName"]),
+        )
+        self.assertFalse(self.db.db_connection.in_transaction)
+
+    def test_delete_person_by_id(self):
+        """
+        Test delete_person_by_id() returns the deleted person, or None for an
+        unknown id.
+        """
+        person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        self.assertEqual(
+            person, self.db.delete_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        )
+        self.assertEqual(
+            None, self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        )
+        self.assertEqual(
+            None, self.db.delete_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        )
+
     def test_delete_person_with_unknown_person(self):
         """
         Test delete_person returns None when the provided person is unknown.
@@ -137,6 +298,489 @@ class TestPeopleDatabase(unittest.TestCase):
         person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
         self.assertEqual(None, person)
 
+    def test_create_person_with_duplicated_id(self):
+        """
+        Test create_person raises an IntegrityError when the id is already taken.
+        """
+        person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        person["email"] = "another@example.com"
+        self.assertRaises(sqlite3.IntegrityError, self.db.create_person, person)
+
+    def test_create_person_with_duplicated_email(self):
+        """
+        Test create_person raises an IntegrityError when the email is already taken.
+        """
+        person = Person(
+            "9d0e6be3-18e1-4e77-96ac-2e9260babe74",
+            "Jack",
+            "Sparrow",
+            "johndoe@example.com",
+            "2000-10-23",
+        )
+        self.assertRaises(sqlite3.IntegrityError, self.db.create_person, person)
+
+    def test_in_list(self):
+        """
+        Test in_list() pads the lists of values up to the next power of two.
+        """
+        self.assertEqual(("", []), in_list([]))
+        self.assertEqual(("?", ["a"]), in_list(["a"]))
+        self.assertEqual(("?, ?, ?, ?", ["a", "b", "c", "c"]), in_list(["a", "b", "c"]))
+        placeholders, values = in_list(list(range(300)))
+        self.assertEqual((512, 512), (placeholders.count("?"), len(values)))
+        self.assertEqual(
+            [None, "John", None],
+            [
+                person and person["firstName"]
+                for person in self.db.select_persons_by_ids(
+                    ["a", "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de", "b"]
+                )
+            ],
+        )
+
+    def test_conflicting_field(self):
+        """
+        Test conflicting_field() names the field whose value is already taken.
+        """
+        person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        person.email = "unique@example.com"
+        with self.assertRaises(sqlite3.IntegrityError) as context:
+            self.db.create_person(person)
+        self.assertEqual("id", conflicting_field(context.exception))
+        self.assertFalse(self.db.db_connection.in_transaction)
+        self.assertEqual(
+            None,
+            conflicting_field(sqlite3.IntegrityError("NOT NULL constraint failed")),
+        )
+
+    def test_build_indexes_migrates_existing_table(self):
+        """
+        Test build_indexes adds the missing indexes to a table created without them.
+        """
+        cursor = self.db.db_connection.cursor()
+        cursor.execute("DROP INDEX persons_id_idx;")
+        cursor.execute("DROP INDEX persons_firstName_idx;")
+        self.db.build_indexes()
+        cursor.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM persons WHERE id = ?;", ("unknown",)
+        )
+        self.assertIn("persons_id_idx", cursor.fetchone()[3])
+        cursor.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM persons WHERE firstName LIKE ?;", ("j%",)
+        )
+        self.assertIn("persons_firstName_idx", cursor.fetchone()[3])
+
+    def test_build_table_fails_on_duplicated_emails(self):
+        """
+        Test a table with duplicated emails fails the startup instead of being
+        served without its unique indexes.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "people.db")
+            connection = sqlite3.connect(path)
+            connection.execute(
+                "CREATE TABLE persons (id text NOT NULL, firstName text NOT NULL, "
+                "lastName text NOT NULL, email text NOT NULL, birthday text NOT NULL);"
+            )
+            connection.executemany(
+                "INSERT INTO persons VALUES (?, 'Ada', 'Lovelace', 'ada@example.com', '1990-12-10');",
+                [
+                    ("0b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",),
+                    ("1b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",),
+                ],
+            )
+            connection.commit()
+            connection.close()
+            with self.assertRaises(sqlite3.IntegrityError) as context:
+                PeopleDatabase(path)
+            self.assertIn("duplicated ids or emails", str(context.exception))
+
+    def test_birthdays_are_normalized(self):
+        """
+        Test the birthdays are written in the format YYYY-MM-DD, and the ones of an
+        existing table are migrated.
+        """
+        person = Person(
+            "0b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",
+            "Ada",
+            "Lovelace",
+            "ada@example.com",
+            "1990-2-3",
+        )
+        self.db.create_person(person)
+        self.assertEqual("1990-02-03", person["birthday"])
+        cursor = self.db.db_connection.cursor()
+        cursor.execute(
+            "UPDATE persons SET birthday = '1990-12-3' WHERE id = ?;", (person["id"],)
+        )
+        self.db.build_table()
+        cursor.execute("SELECT birthday FROM persons WHERE id = ?;", (person["id"],))
+        self.assertEqual("1990-12-03", cursor.fetchone()[0])
+
+    def test_select_persons_by_age(self):
+        """
+        Test select_persons() filters the persons by age, on their birthday included.
+        """
+        today = date(2021, 7, 28)
+        rows = self.db.select_persons(
+            {"age_min": 24, "age_max": 30}, fields=["firstName"], today=today
+        )
+        self.assertEqual([("John",), ("Jane",)], rows)
+        rows = self.db.select_persons(
+            {"age_max": 29}, fields=["firstName"], today=today
+        )
+        self.assertEqual([("John",), ("Brian",), ("Ashley",)], rows)
+        rows = self.db.select_persons(
+            {"age_min": 30}, fields=["firstName"], today=today
+        )
+        self.assertEqual([("Jane",)], rows)
+
+    def test_select_upcoming_birthdays(self):
+        """
+        Test select_upcoming_birthdays() returns the birthdays of the next days, in
+        upcoming order, across the end of the year.
+        """
+        rows = self.db.select_upcoming_birthdays(
+            10, date(2021, 12, 24), fields=["firstName"]
+        )
+        self.assertEqual([("Ashley",), ("John",)], rows)
+        rows = self.db.select_upcoming_birthdays(0, date(2021, 5, 10), ["firstName"])
+        self.assertEqual([("Brian",)], rows)
+        rows = self.db.select_upcoming_birthdays(365, date(2021, 5, 11), ["firstName"])
+        self.assertEqual([("Jane",), ("Ashley",), ("John",), ("Brian",)], rows)
+
+        self.db.create_person(
+            Person(
+                "0b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",
+                "Leap",
+                "Year",
+                "leap@example.com",
+                "2000-02-29",
+            )
+        )
+        rows = self.db.select_upcoming_birthdays(1, date(2021, 2, 27), ["firstName"])
+        self.assertEqual([("Leap",)], rows)
+        rows = self.db.select_upcoming_birthdays(1, date(2024, 2, 27), ["firstName"])
+        self.assertEqual([], rows)
+
+    def test_select_ages(self):
+        """
+        Test select_ages() computes the ages like Person.age(), and skips the
+        unknown ids.
+        """
+        today = date(2021, 7, 28)
+        persons = self.db.select_all_persons()
+        ages = self.db.select_ages(
+            [person["id"] for person in persons] + ["unknown"], today
+        )
+        self.assertEqual({person["id"]: person.age(today) for person in persons}, ages)
+        self.assertEqual({}, self.db.select_ages([]))
+
+    def test_select_persons_page(self):
+        """
+        Test select_persons_page() returns the persons sorted by id, page by page.
+        """
+        first_page = self.db.select_persons_page(3)
+        self.assertEqual(3, len(first_page))
+        second_page = self.db.select_persons_page(3, first_page[-1]["id"])
+        self.assertEqual(1, len(second_page))
+        ids = [person["id"] for person in first_page + second_page]
+        self.assertEqual(sorted(ids), ids)
+
+    def test_select_persons_page_with_name(self):
+        """
+        Test select_persons_page() only returns the persons matching the given name.
+        """
+        persons = self.db.select_persons_page(10, name="j")
+        self.assertEqual(["John", "Jane"], [person["firstName"] for person in persons])
+
+    def test_select_persons_with_filters(self):
+        """
+        Test select_persons() filters, sorts and projects the persons.
+        """
+        rows = self.db.select_persons(
+            {"birthday_from": "1991-01-01", "birthday_to": "2000-12-31"},
+            sort=["-birthday"],
+            fields=["firstName", "birthday"],
+        )
+        self.assertEqual(
+            [("Brian", "2000-05-10"), ("John", "1997-01-01"), ("Jane", "1991-07-28")],
+            rows,
+        )
+        rows = self.db.select_persons(
+            {"email_domain": "EXAMPLE.com", "lastName": "doe"}, fields=["firstName"]
+        )
+        self.assertEqual([("John",), ("Jane",)], rows)
+        self.assertEqual([], self.db.select_persons({"email_domain": "example.org"}))
+        self.assertEqual(4, len(self.db.select_persons(sort=["lastName", "id"])))
+        with self.assertRaises(KeyError):
+            self.db.select_persons({"unknown": "value"})
+        with self.assertRaises(KeyError):
+            self.db.select_persons(fields=["id", "rowid"])
+        with self.assertRaises(ValueError):
+            self.db.select_persons(sort=["id"], after="")
+
+    def test_select_persons_uses_indexes(self):
+        """
+        Test each filter of select_persons() is looked up through an index.
+        """
+        cursor = self.db.db_connection.cursor()
+        for condition in FILTERS.values():
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM persons WHERE " + condition, ("x",)
+            )
+            self.assertIn("USING INDEX", cursor.fetchone()[-1])
+
+    def test_iter_all_persons(self):
+        """
+        Test iter_all_persons() returns all the persons in batches.
+        """
+        batches = list(self.db.iter_all_persons(batch_size=3))
+        self.assertEqual([3, 1], [len(batch) for batch in batches])
+        self.assertEqual(self.db.select_all_persons(), batches[0] + batches[1])
+
+    @unittest.skipIf(
+        not hasattr(sqlite3.Connection, "setlimit"), "setlimit needs Python 3.11"
+    )
+    def test_insert_persons_below_the_limit_of_variables(self):
+        """
+        Test insert_persons() looks up the duplicates of a large batch with the
+        limit of 999 variables per statement of SQLite older than 3.32.
+        """
+        self.db.db_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        persons = [
+            Person(
+                "0b6e8a7c-37c9-4b8e-9f43-{:012x}".format(i),
+                "Ada",
+                "Lovelace",
+                "ada{}@example.com".format(i),
+                "1990-12-10",
+            )
+            for i in range(600)
+        ]
+        self.assertEqual([None] * 600, self.db.insert_persons(persons))
+        self.assertEqual(604, len(self.db.select_all_persons()))
+
+    def test_insert_persons(self):
+        """
+        Test insert_persons() inserts the new persons and skips the duplicated ones.
+        """
+        new_person = Person(
+            "9d0e6be3-18e1-4e77-96ac-2e9260babe74",
+            "Jack",
+            "Sparrow",
+            "jacksparrow@pirates.com",
+            "2000-10-23",
+        )
+        same_id = Person(*new_person.to_tuple())
+        same_id["email"] = "another@pirates.com"
+        taken_email = Person(*new_person.to_tuple())
+        taken_email["id"] = "5e7a9c1b-3d5f-4b7d-8f1a-3c5e7a9b1d3f"
+        taken_email["email"] = "johndoe@example.com"
+
+        conflicts = self.db.insert_persons([new_person, same_id, taken_email])
+        self.assertEqual([None, "id", "email"], conflicts)
+        self.assertEqual(5, len(self.db.select_all_persons()))
+        self.assertEqual(new_person, self.db.select_person_by_id(new_person["id"]))
+
+    def test_select_taken_ids_and_emails(self):
+        """
+        Test select_taken_ids_and_emails() returns the ids and emails already used.
+        """
+        taken_ids, taken_emails = self.db.select_taken_ids_and_emails(
+            ["bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de", "unknown"],
+            ["janedoe@example.com", "unknown@example.com"],
+        )
+        self.assertIn("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de", taken_ids)
+        self.assertIn("janedoe@example.com", taken_emails)
+        self.assertNotIn("unknown", taken_ids)
+        self.assertNotIn("unknown@example.com", taken_emails)
+
+    def test_search_persons_infix(self):
+        """
+        Test search_persons() finds the words of at least 3 characters anywhere in the names.
+        """
+        persons = self.db.search_persons("mit")
+        self.assertEqual(["Smith"], [person["lastName"] for person in persons])
+
+    def test_search_persons_many_words(self):
+        """
+        Test search_persons() only returns the persons matching every word, with
+        short words matching the beginning of the names.
+        """
+        persons = self.db.search_persons("doe j")
+        self.assertEqual(["John", "Jane"], [person["firstName"] for person in persons])
+        persons = self.db.search_persons("doe ja")
+        self.assertEqual(["Jane"], [person["firstName"] for person in persons])
+        self.assertEqual([], self.db.search_persons("doe smith"))
+
+    def test_search_persons_limit(self):
+        """
+        Test search_persons() returns at most `limit` persons.
+        """
+        self.assertEqual(1, len(self.db.search_persons("doe", limit=1)))
+
+    def test_search_persons_follows_updates(self):
+        """
+        Test the search index is updated when a person is updated or deleted.
+        """
+        person = self.db.select_person_by_id("bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de")
+        person["firstName"] = "Harry"
+        self.db.update_person(person)
+        self.assertEqual([], self.db.search_persons("john"))
+        self.assertEqual([person], self.db.search_persons("harry"))
+
+        self.db.delete_person(person)
+        self.assertEqual([], self.db.search_persons("harry"))
+
+    def test_build_search_index_migrates_existing_table(self):
+        """
+        Test build_search_index() indexes the persons of a table created without the index.
+        """
+        cursor = self.db.db_connection.cursor()
+        cursor.execute("DROP TABLE persons_fts;")
+        self.db.build_search_index()
+        self.assertEqual(1, len(self.db.search_persons("ashley")))
+
+    def test_select_person_by_id_uses_cache(self):
+        """
+        Test select_person_by_id() is answered by the cache the second time, and
+        not anymore once the person is updated.
+        """
+        id = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+        person = self.db.select_person_by_id(id)
+        self.assertEqual(person, self.db.select_person_by_id(id))
+        self.assertEqual(1, self.db.cache.stats()["hits"])
+
+        person["email"] = "harry@example.com"
+        self.db.update_person(person)
+        self.assertEqual(None, self.db.select_person_by_email("johndoe@example.com"))
+        self.assertEqual(person, self.db.select_person_by_id(id))
+        self.assertEqual(1, self.db.cache.stats()["hits"])
+
+    def test_refresh_detects_writes_of_other_processes(self):
+        """
+        Test refresh() invalidates the cache of a shared database after another
+        connection, standing for another process, wrote in it.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "people.db")
+            db = PeopleDatabase(path, shared=True)
+            other = PeopleDatabase(path, shared=True)
+            self.assertEqual(4, len(other.select_all_persons()))
+
+            id = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+            db.refresh()
+            person = db.select_person_by_id(id)
+            person["firstName"] = "Harry"
+            other.update_person(person)
+            self.assertEqual("John", db.select_person_by_id(id)["firstName"])
+
+            db.refresh()
+            self.assertEqual("Harry", db.select_person_by_id(id)["firstName"])
+            db.refresh()
+            db.select_person_by_id(id)
+            self.assertEqual(2, db.cache.stats()["hits"])
+            db.close()
+            other.close()
+
+    def test_refresh_ignores_writes_of_this_process(self):
+        """
+        Test the writes of a shared database only invalidate the persons written,
+        and are not taken by refresh() for writes of other processes, whichever
+        thread reads the database.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            db = PeopleDatabase(os.path.join(directory, "people.db"), shared=True)
+            notified = []
+            db.listeners.append(notified.append)
+            db.refresh()
+
+            id = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+            person = db.select_person_by_id(id)
+            person["firstName"] = "Harry"
+            db.update_person(person)
+            db.refresh()
+            thread = threading.Thread(target=db.refresh)
+            thread.start()
+            thread.join()
+            self.assertEqual([[id]], notified)
+            db.close()
+
+    def test_refresh_detects_writes_of_other_processes_during_a_write(self):
+        """
+        Test a write of another process, trying to commit right after this process
+        read the version before its own write, is not taken for a write of this
+        process.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "people.db")
+            db = PeopleDatabase(path, shared=True)
+            other = PeopleDatabase(path, shared=True)
+            john = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+            jane = "d5356358-b39f-4c6e-9690-2c965a607702"
+            self.assertEqual("John", db.select_person_by_id(john)["firstName"])
+
+            select_version = db.select_version
+            threads = []
+
+            def select_version_meanwhile(cursor):
+                version = select_version(cursor)
+                if not threads:
+                    threads.append(
+                        threading.Thread(
+                            target=other.update_person_fields,
+                            args=(john, {"firstName": "Changed"}),
+                        )
+                    )
+                    threads[0].start()
+                    # The other write waits for the write lock held by this one.
+                    threads[0].join(0.5)
+                return version
+
+            db.select_version = select_version_meanwhile
+            db.update_person_fields(jane, {"firstName": "Janet"})
+            threads[0].join()
+            db.refresh()
+            self.assertEqual("Changed", db.select_person_by_id(john)["firstName"])
+            db.close()
+            other.close()
+
+    def test_export_persons_reads_a_snapshot(self):
+        """
+        Test export_persons() returns the persons by batches, without the persons
+        created after the export started.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            db = PeopleDatabase(os.path.join(directory, "people.db"))
+            batches = db.export_persons(batch_size=3)
+            rows = next(batches)
+            db.create_person(
+                Person(
+                    "1ba3e3a4-b1a8-4b4c-9d0e-1c0d3c5a9b7e",
+                    "Ada",
+                    "Lovelace",
+                    "ada@example.com",
+                    "1815-12-10",
+                )
+            )
+            rows += next(batches)
+            self.assertEqual([], list(batches))
+            self.assertEqual(4, len(rows))
+            self.assertEqual(5, len(db.select_all_persons()))
+            db.close()
+
+
+class TestPeopleDatabaseWithoutReturning(TestPeopleDatabase):
+    """
+    The tests of the class PeopleDatabase, run without the RETURNING clause, as
+    with the versions of SQLite older than 3.35.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.db.returning_enabled = False
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,141 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.JsonSerializer import JsonSerializer
+from core.PeopleDatabase import PeopleDatabase
+from core.PeopleImporter import PeopleImporter, read_csv, read_ndjson
+from unittest import mock
+import import_people
+import io
+import json
+import os
+import tempfile
+import unittest
+
+PERSON = {
+    "id": "0b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f",
+    "firstName": "Ada",
+    "lastName": "Lovelace",
+    "email": "ada@example.com",
+    "birthday": "1990-12-10",
+}
+
+
+class TestPeopleImporter(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class PeopleImporter and of its readers.
+    """
+
+    def setUp(self):
+        """
+        Create a new on-disk database before running each unit test.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = PeopleDatabase(os.path.join(self.directory.name, "people.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+
+    def test_read_ndjson(self):
+        """
+        Test that read_ndjson skips the blank lines and reports the invalid ones.
+        """
+        lines = [json.dumps(PERSON).encode() + b"\n", b"\n", b"{oops\n", b"[]\n"]
+        records = list(read_ndjson(lines, JsonSerializer()))
+        self.assertEqual([(1, PERSON), (3, None), (4, [])], records)
+
+    def test_read_csv(self):
+        """
+        Test that read_csv gives the line number of each person.
+        """
+        text = "id,firstName,lastName,email,birthday\r\n" + ",".join(PERSON.values())
+        self.assertEqual([(2, PERSON)], list(read_csv(io.StringIO(text))))
+
+    def test_run(self):
+        """
+        Test that the valid persons are imported, and the others are reported.
+        """
+        existing = self.db.select_all_persons()[0]
+        records = [
+            (1, PERSON),
+            (2, dict(PERSON, id="not-an-id")),
+            (3, dict(PERSON, id=existing["id"], email="other@example.com")),
+            (4, dict(PERSON, id="1b6e8a7c-37c9-4b8e-9f43-2c1a8d3b4e5f")),
+            (5, None),
+        ]
+        errors = io.StringIO()
+        importer = PeopleImporter(self.db, batch_size=2, errors=errors)
+        counters = importer.run(iter(records))
+
+        self.assertEqual(
+            {"read": 5, "created": 1, "invalid": 2, "duplicate": 2}, counters
+        )
+        self.assertEqual("Ada", self.db.select_person_by_id(PERSON["id"])["firstName"])
+        rejected = [json.loads(line) for line in errors.getvalue().splitlines()]
+        self.assertEqual([2, 3, 4, 5], [error["line"] for error in rejected])
+        self.assertEqual(
+            ["invalid", "duplicate", "duplicate", "invalid"],
+            [error["status"] for error in rejected],
+        )
+        self.assertEqual(["id"], list(rejected[0]["errors"]))
+        self.assertEqual(["email"], list(rejected[2]["errors"]))
+
+    def test_run_rebuilds_the_indexes(self):
+        """
+        Test that the indexes dropped during the import are built again.
+        """
+        PeopleImporter(self.db).run(iter([(1, PERSON)]))
+        names = {
+            row[0]
+            for row in self.db.db_connection.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger');"
+            )
+        }
+        self.assertIn("persons_lastName_idx", names)
+        if self.db.fts_enabled:
+            self.assertIn("persons_fts_insert", names)
+            self.assertEqual(
+                [PERSON["id"]],
+                [person["id"] for person in self.db.search_persons("Lovelace")],
+            )
+        synchronous = self.db.db_connection.execute("PRAGMA synchronous;").fetchone()
+        self.assertEqual(1, synchronous[0])
+
+    def test_run_is_detected_by_a_shared_database(self):
+        """
+        Test that a process sharing the database detects the imported persons,
+        and that the triggers of the version of the persons are restored.
+        """
+        shared = PeopleDatabase(self.db.pool.path, shared=True)
+        notified = []
+        shared.listeners.append(notified.append)
+
+        PeopleImporter(self.db).run(iter([(1, PERSON)]))
+        shared.refresh()
+        self.assertEqual([None], notified)
+
+        self.db.delete_person_by_id(PERSON["id"])
+        shared.refresh()
+        self.assertEqual([None, None], notified)
+        shared.close()
+
+    def test_import_people(self):
+        """
+        Test that the script imports the persons of its input only, without the
+        default persons of a new database.
+        """
+        input = os.path.join(self.directory.name, "people.ndjson")
+        with open(input, "w") as file:
+            file.write(json.dumps(PERSON) + "\n")
+        path = os.path.join(self.directory.name, "imported.db")
+        argv = ["import_people.py", input, "--db", path, "--quiet"]
+        with mock.patch("sys.argv", argv):
+            import_people.main()
+
+        db = PeopleDatabase(path)
+        self.assertEqual([PERSON["id"]], [p["id"] for p in db.select_all_persons()])
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 # Author: Cyprien Borée boreec@tuta.io
 
-from core.Person import Person
+from core.Person import Person, normalize_birthday
+import json
 import unittest
 
 
@@ -148,6 +149,44 @@ class TestPerson(unittest.TestCase):
                 "Person.verify_birthday() raised exception for good birthday format."
             )
 
+    def test_item_access(self):
+        """
+        Test case for reading and writing the attributes of a person like the
+        items of a dictionary.
+        """
+        p1 = Person("", "John", "Doe", "johndoe@example.com", "1997-01-01")
+        self.assertEqual("johndoe@example.com", p1["email"])
+        p1["email"] = "john@example.com"
+        self.assertEqual("john@example.com", p1["email"])
+        self.assertRaises(KeyError, p1.__getitem__, "unknown")
+        self.assertRaises(KeyError, p1.__setitem__, "unknown", "value")
+        self.assertRaises(AttributeError, setattr, p1, "unknown", "value")
+
+    def test_to_dict(self):
+        """
+        Test case for to_dict function returning a JSON serializable dictionary
+        with the attributes in the order of the columns.
+        """
+        p1 = Person("", "John", "Doe", "johndoe@example.com", "1997-01-01")
+        self.assertEqual(
+            '{"id": "", "firstName": "John", "lastName": "Doe", '
+            '"email": "johndoe@example.com", "birthday": "1997-01-01"}',
+            json.dumps(p1, default=Person.to_dict),
+        )
+        self.assertEqual(p1, p1.to_dict())
+        self.assertEqual(p1, Person(*p1.to_tuple()))
+
+    def test_normalize_birthday(self):
+        """
+        Test case for normalize_birthday zero-padding the month and the day, and
+        leaving the values which are not dates unchanged.
+        """
+        self.assertEqual("1997-01-01", normalize_birthday("1997-1-1"))
+        self.assertEqual("1997-10-05", normalize_birthday("1997-10-5"))
+        self.assertEqual("1997-12-24", normalize_birthday("1997-12-24"))
+        for value in [None, "", "1997-1", "yyyy-m-d"]:
+            self.assertEqual(value, normalize_birthday(value))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,110 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.PersonCache import PersonCache
+import time
+import unittest
+
+JOHN = (
+    "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+    "John",
+    "Doe",
+    "johndoe@example.com",
+    "1997-01-01",
+)
+JANE = (
+    "d5356358-b39f-4c6e-9690-2c965a607702",
+    "Jane",
+    "Doe",
+    "janedoe@example.com",
+    "1991-07-28",
+)
+
+
+class TestPersonCache(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class PersonCache,
+    by testing its functions.
+    """
+
+    def test_get_by_id_and_email(self):
+        """
+        Test a cached person is found by id and by email, and counted as hits.
+        """
+        cache = PersonCache()
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+        cache.put(JOHN, cache.token())
+        self.assertEqual(JOHN, cache.get_by_id(JOHN[0]))
+        self.assertEqual(JOHN, cache.get_by_email(JOHN[3]))
+        self.assertEqual(None, cache.get_by_email(JANE[3]))
+        self.assertEqual(
+            {"hits": 2, "misses": 2, "evictions": 0, "size": 1}, cache.stats()
+        )
+
+    def test_get_and_put_many(self):
+        """
+        Test many persons are cached and looked up at once.
+        """
+        cache = PersonCache()
+        cache.put_many([JOHN, JANE], cache.token())
+        self.assertEqual(
+            {JOHN[0]: JOHN, JANE[0]: JANE},
+            cache.get_many([JOHN[0], "unknown", JANE[0]]),
+        )
+        self.assertEqual(JANE, cache.get_by_email(JANE[3]))
+        token = cache.token()
+        cache.invalidate([JOHN[0]])
+        cache.put_many([JOHN], token)
+        self.assertEqual({}, cache.get_many([JOHN[0]]))
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        Test the least recently used person is evicted when the cache is full.
+        """
+        cache = PersonCache(max_size=1)
+        cache.put(JOHN, cache.token())
+        cache.put(JANE, cache.token())
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+        self.assertEqual(None, cache.get_by_email(JOHN[3]))
+        self.assertEqual(JANE, cache.get_by_id(JANE[0]))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    def test_expired_person_is_evicted(self):
+        """
+        Test a person is not returned after its time to live.
+        """
+        cache = PersonCache(ttl=0.01)
+        cache.put(JOHN, cache.token())
+        time.sleep(0.02)
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+
+    def test_invalidate(self):
+        """
+        Test an invalidated person is neither found by id nor by email.
+        """
+        cache = PersonCache()
+        cache.put(JOHN, cache.token())
+        cache.invalidate([JOHN[0]])
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+        self.assertEqual(None, cache.get_by_email(JOHN[3]))
+
+    def test_put_after_invalidation_is_ignored(self):
+        """
+        Test a row read before an invalidation is not cached.
+        """
+        cache = PersonCache()
+        token = cache.token()
+        cache.invalidate([JOHN[0]])
+        cache.put(JOHN, token)
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+
+    def test_disabled_cache(self):
+        """
+        Test nothing is cached when the maximum size is 0.
+        """
+        cache = PersonCache(max_size=0)
+        cache.put(JOHN, cache.token())
+        self.assertEqual(None, cache.get_by_id(JOHN[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
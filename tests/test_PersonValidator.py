@@ -0,0 +1,111 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.Person import Person
+from core.PersonValidator import PersonValidator
+from datetime import date
+import itertools
+import unittest
+
+
+class TestPersonValidator(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class PersonValidator,
+    by testing its functions.
+    """
+
+    def setUp(self):
+        """
+        Create a new validator before running each unit test.
+        """
+        self.validator = PersonValidator()
+        self.person = dict(
+            id="bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+            firstName="John",
+            lastName="Doe",
+            email="johndoe@example.com",
+            birthday="1997-01-01",
+        )
+
+    def test_validate_valid_person(self):
+        """
+        Test validate() returns no error for a valid person, given as a
+        dictionary or as a Person.
+        """
+        self.assertEqual({}, self.validator.validate(self.person))
+        self.assertEqual({}, self.validator.validate(Person(**self.person)))
+
+    def test_validate_returns_errors_per_field(self):
+        """
+        Test validate() returns the error message of each invalid field.
+        """
+        self.person["firstName"] = "W@lt3rZ"
+        del self.person["birthday"]
+        self.assertEqual(
+            {
+                "firstName": "Invalid firstName: Bad format.",
+                "birthday": "Birthday is missing.",
+            },
+            self.validator.validate(self.person),
+        )
+
+    def test_validate_only_given_fields(self):
+        """
+        Test validate() ignores the fields that are not asked for.
+        """
+        self.person["firstName"] = "W@lt3rZ"
+        self.assertEqual({}, self.validator.validate(self.person, ["email"]))
+
+    def test_validate_non_string_values(self):
+        """
+        Test validate() rejects values that are not strings.
+        """
+        errors = self.validator.validate(
+            dict(id=1, firstName=2, lastName=3, email=4, birthday=5)
+        )
+        self.assertEqual(5, len(errors))
+
+    def test_validate_birthday(self):
+        """
+        Test validate() checks the birthday against the given current date.
+        """
+        today = date(2023, 3, 1)
+        for birthday, valid in (
+            ("2023-03-01", True),
+            ("2023-03-02", False),
+            ("2000-02-29", True),
+            ("1998-02-29", False),
+            ("1998-13-01", False),
+            ("1872-01-01", False),
+        ):
+            self.person["birthday"] = birthday
+            errors = self.validator.validate(self.person, ["birthday"], today)
+            self.assertEqual(valid, errors == {}, birthday)
+
+    def test_validate_many(self):
+        """
+        Test validate_many() returns the errors of each person.
+        """
+        invalid = dict(self.person, email="")
+        self.assertEqual(
+            [{}, {"email": "Invalid email address: empty."}],
+            self.validator.validate_many([self.person, invalid]),
+        )
+
+    def test_same_messages_as_verify_data(self):
+        """
+        Test the formatted errors are the ones of Person.verify_data().
+        """
+        ids = [None, "", "invalid", "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"]
+        names = [None, "", "W@lt3rZ", "John"]
+        emails = [None, "", "inval...id@em;ail@format.com", "johndoe@example.com"]
+        birthdays = [None, "", "1997-02-29", "3230-01-01", "1800-01-01", "1997-1-1"]
+        for values in itertools.product(ids, names, names, emails, birthdays):
+            person = Person(*values)
+            self.assertEqual(
+                person.verify_data(),
+                self.validator.format_errors(self.validator.validate(person)),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.Profiler import Profiler
+import marshal
+import unittest
+
+
+class TestProfiler(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class Profiler,
+    by testing its functions.
+    """
+
+    def profile_request(self, profiler: Profiler):
+        """
+        Profile a fake request.
+        """
+        profile = profiler.begin()
+        sorted(range(1000), key=str)
+        profiler.end(profile)
+        return profile
+
+    def test_off(self):
+        """
+        Test nothing is profiled before the profiler is started.
+        """
+        profiler = Profiler()
+        self.assertEqual(None, self.profile_request(profiler))
+        self.assertEqual(None, profiler.report())
+        self.assertEqual(None, profiler.dump())
+
+    def test_max_requests(self):
+        """
+        Test the profiler stops after the given number of requests, and aggregates
+        their statistics.
+        """
+        profiler = Profiler()
+        profiler.start(requests=2)
+        for i in range(3):
+            self.profile_request(profiler)
+        status = profiler.status()
+        self.assertFalse(status["active"])
+        self.assertEqual(2, status["profiled"])
+        self.assertIn("function calls", profiler.report())
+        stats = marshal.loads(profiler.dump())
+        calls = [
+            value[0]
+            for key, value in stats.items()
+            if key[2] == "<built-in method builtins.sorted>"
+        ]
+        self.assertEqual([2], calls)
+
+    def test_deadline(self):
+        """
+        Test the profiler stops after the given number of seconds.
+        """
+        profiler = Profiler()
+        profiler.start(seconds=0)
+        self.assertEqual(None, self.profile_request(profiler))
+        self.assertFalse(profiler.status()["active"])
+
+    def test_every(self):
+        """
+        Test only one request out of `every` is profiled.
+        """
+        profiler = Profiler()
+        profiler.start(every=3)
+        profiled = [self.profile_request(profiler) != None for i in range(6)]
+        self.assertEqual([True, False, False, True, False, False], profiled)
+        profiler.stop()
+        self.assertEqual(None, self.profile_request(profiler))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+from core.ResponseCache import ResponseCache
+import unittest
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    A class to ensure good behaviour of the class ResponseCache,
+    by testing its functions.
+    """
+
+    def test_put_and_get(self):
+        """
+        Test a cached response is returned with its ETag, computed from the body
+        when it is not given.
+        """
+        cache = ResponseCache()
+        self.assertEqual(None, cache.get("id"))
+        cache.put("id", b"{}", "etag", cache.token())
+        self.assertEqual((b"{}", "etag"), cache.get("id"))
+        body, etag = cache.put("/people?", b"[]", None, cache.token(), is_list=True)
+        self.assertEqual(ResponseCache.make_etag(b"[]"), etag)
+        self.assertEqual((b"[]", etag), cache.get("/people?"))
+
+    def test_invalidate(self):
+        """
+        Test invalidating persons removes their responses and every list, but not
+        the responses of the other persons.
+        """
+        cache = ResponseCache()
+        cache.put("id", b"{}", "etag", cache.token())
+        cache.put("other", b"{}", "etag", cache.token())
+        cache.put("/people?", b"[]", None, cache.token(), is_list=True)
+        cache.invalidate(["id"])
+        self.assertEqual(None, cache.get("id"))
+        self.assertEqual(None, cache.get("/people?"))
+        self.assertNotEqual(None, cache.get("other"))
+
+    def test_put_after_invalidation_is_ignored(self):
+        """
+        Test a response built before an invalidation is not cached.
+        """
+        cache = ResponseCache()
+        token = cache.token()
+        cache.invalidate(["id"])
+        cache.put("id", b"{}", "etag", token)
+        self.assertEqual(None, cache.get("id"))
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        Test the least recently used response is evicted when the cache is full.
+        """
+        cache = ResponseCache(max_size=1)
+        cache.put("id", b"{}", "etag", cache.token())
+        cache.put("other", b"{}", "etag", cache.token())
+        self.assertEqual(None, cache.get("id"))
+        self.assertNotEqual(None, cache.get("other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+import asyncio
+import importlib.util
+import json
+import unittest
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("asgiref"), "the ASGI mode requires asgiref"
+)
+class TestAsyncRoutes(unittest.TestCase):
+    """
+    A test class for the ASGI application of the API.
+    """
+
+    def request(self, method: str, path: str, query: bytes = b"", headers=()):
+        """
+        Sends a request to the ASGI application and returns the status, the
+        headers and the body of the response.
+        """
+        from core.async_routes import application
+
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "server": ("localhost", 5000),
+            "root_path": "",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query,
+            "headers": list(headers),
+        }
+        asyncio.run(application(scope, receive, send))
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        return messages[0]["status"], dict(messages[0]["headers"]), body
+
+    def test_get_people(self):
+        """
+        Tests that the asynchronous `/people` route returns the list of people,
+        and a 304 response for a matching If-None-Match header.
+        """
+        status, headers, body = self.request("GET", "/people")
+        self.assertEqual(200, status)
+        self.assertTrue(len(json.loads(body)) > 0)
+
+        status, headers, body = self.request(
+            "GET", "/people", headers=[(b"if-none-match", headers[b"etag"])]
+        )
+        self.assertEqual(304, status)
+        self.assertEqual(b"", body)
+
+    def test_get_person_by_id(self):
+        """
+        Tests that the asynchronous `/people/{id}` route returns the person, or
+        a 404 error for an unknown id.
+        """
+        status, headers, body = self.request(
+            "GET", "/people/d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f"
+        )
+        self.assertEqual(200, status)
+        self.assertEqual("Ashley", json.loads(body)["firstName"])
+        status, headers, body = self.request("GET", "/people/unknown-id")
+        self.assertEqual(404, status)
+
+    def test_search_people_400(self):
+        """
+        Tests that the asynchronous `/people/search` route returns a 400 error
+        when the query is missing.
+        """
+        status, headers, body = self.request("GET", "/people/search")
+        self.assertEqual(400, status)
+
+    def test_other_routes_are_served_by_flask(self):
+        """
+        Tests that the routes without asynchronous version are served by Flask.
+        """
+        status, headers, body = self.request("GET", "/people", b"limit=1")
+        self.assertEqual(200, status)
+        self.assertEqual(1, len(json.loads(body)))
+        self.assertIn(b"link", headers)
+
+        status, headers, body = self.request("GET", "/people", b"fields=id")
+        self.assertEqual(200, status)
+        self.assertEqual(["id"], list(json.loads(body)[0]))
+
+        status, headers, body = self.request("GET", "/people/birthdays")
+        self.assertEqual(200, status)
+
+        status, headers, body = self.request("GET", "/people/export")
+        self.assertEqual(200, status)
+        self.assertEqual(b"application/x-ndjson", headers[b"content-type"])
+
+    def test_metrics(self):
+        """
+        Tests that the requests of the coroutines are measured like the ones of
+        Flask, with their queries run by the pool of threads.
+        """
+        from app import metrics
+
+        metrics.enabled = True
+        try:
+            status, headers, body = self.request(
+                "GET", "/people/d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f/age"
+            )
+        finally:
+            metrics.enabled = False
+        self.assertEqual(200, status)
+        self.assertIn(b"serialization;dur=", headers[b"server-timing"])
+        self.assertIn(
+            'people_requests_total{route="/people/<id>/age",method="GET",status="200"}',
+            metrics.render(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,6 +59,57 @@ class TestRoutesDELETE(unittest.TestCase):
         response = self.client.delete("/people/unknown_id")
         self.assertEqual(response.status_code, 404)
 
+    def test_delete_people(self):
+        """
+        Test the deletion of many people at once, by IDs and by filters.
+        """
+        people = [
+            dict(
+                id="7a1c9e3b-5d2f-4a8b-9c6e-1f3a5b7d9e0{}".format(i),
+                firstName="Cohort",
+                lastName="Member",
+                email="member{}@cohort.example.org".format(i),
+                birthday="1980-01-0{}".format(i + 1),
+            )
+            for i in range(3)
+        ]
+        response = self.client.post("/people/bulk", json=people)
+        self.assertEqual(json.loads(response.data)["created"], 3)
+        self.assertEqual(self.client.get("/people/" + people[0]["id"]).status_code, 200)
+
+        response = self.client.delete(
+            "/people?returning&fields=id,email",
+            json={"ids": [people[0]["id"], "unknown_id"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {
+                "deleted": 1,
+                "people": [{"id": people[0]["id"], "email": people[0]["email"]}],
+            },
+            json.loads(response.data),
+        )
+        self.assertEqual(self.client.get("/people/" + people[0]["id"]).status_code, 404)
+
+        response = self.client.delete("/people?email_domain=COHORT.example.org")
+        self.assertEqual({"deleted": 2}, json.loads(response.data))
+        response = self.client.get("/people?lastName=Member")
+        self.assertEqual([], json.loads(response.data))
+
+    def test_delete_people_without_ids_nor_filters(self):
+        """
+        Test all the people are never deleted by mistake.
+        """
+        for path, body in (
+            ("/people", None),
+            ("/people", {"ids": "not-a-list"}),
+            ("/people?age_min=-1", None),
+            ("/people?fields=id", {}),
+        ):
+            response = self.client.delete(path, json=body)
+            self.assertEqual(response.status_code, 400, path)
+        self.assertNotEqual([], json.loads(self.client.get("/people").data))
+
 
 if __name__ == "__main__":
     unittest.main()
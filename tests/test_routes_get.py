@@ -1,6 +1,9 @@
 # Author: Cyprien Borée boreec@tuta.io
 
 import unittest
+import csv
+import gzip
+import io
 import json
 from app import app
 from core.routes import *
@@ -114,6 +117,306 @@ class TestRoutesGET(unittest.TestCase):
         self.assertEqual(result.status_code, 200)
         self.assertTrue(json.loads(result.data) == [])
 
+    def test_get_people_paginated(self):
+        """
+        Tests that the `/people?limit=` endpoint returns pages of people sorted by id,
+        linked to each other by the 'Link' header.
+        """
+        result = self.client.get("/people?limit=3")
+        self.assertEqual(result.status_code, 200)
+        first_page = json.loads(result.data)
+        self.assertEqual(3, len(first_page))
+        self.assertEqual(
+            sorted(person["id"] for person in first_page),
+            [person["id"] for person in first_page],
+        )
+        next_page = result.headers["Link"].split(">")[0][1:]
+
+        result = self.client.get(next_page)
+        self.assertEqual(result.status_code, 200)
+        second_page = json.loads(result.data)
+        self.assertEqual(1, len(second_page))
+        self.assertTrue(first_page[-1]["id"] < second_page[0]["id"])
+        self.assertNotIn("Link", result.headers)
+
+    def test_get_people_paginated_with_invalid_limit(self):
+        """
+        Tests that the `/people?limit=` endpoint returns a 400 error when the limit
+        is not a positive integer.
+        """
+        self.assertEqual(self.client.get("/people?limit=0").status_code, 400)
+        self.assertEqual(self.client.get("/people?limit=abc").status_code, 400)
+
+    def test_get_people_filtered(self):
+        """
+        Tests that the `/people` endpoint filters, sorts and projects the people.
+        """
+        result = self.client.get(
+            "/people?lastName=doe&birthday_from=1990-01-01&birthday_to=1997-01-01"
+            "&email_domain=Example.com&sort=-birthday&fields=firstName,birthday"
+        )
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(
+            [
+                {"firstName": "John", "birthday": "1997-01-01"},
+                {"firstName": "Jane", "birthday": "1991-07-28"},
+            ],
+            json.loads(result.data),
+        )
+
+        result = self.client.get("/people?lastName=Doe&fields=email&limit=1")
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(["email"], list(json.loads(result.data)[0]))
+        next_page = result.headers["Link"].split(">")[0][1:]
+        self.assertIn("lastName=Doe", next_page)
+        self.assertIn("fields=email", next_page)
+        result = self.client.get(next_page)
+        self.assertEqual(1, len(json.loads(result.data)))
+
+    def test_get_people_filtered_400(self):
+        """
+        Tests that the `/people` endpoint returns a 400 error for an invalid filter,
+        sort or projection.
+        """
+        for query in [
+            "birthday_from=1990-13-01",
+            "birthday_to=yesterday",
+            "email_domain=",
+            "sort=age",
+            "sort=-id,",
+            "fields=id,password",
+            "sort=id&limit=2",
+        ]:
+            result = self.client.get("/people?" + query)
+            self.assertEqual(result.status_code, 400, query)
+
+    def test_get_people_by_age(self):
+        """
+        Tests that the `/people` endpoint filters the people by age.
+        """
+        persons = json.loads(self.client.get("/people?lastName=Doe").data)
+        ages = [Person(**person).age() for person in persons]
+        result = self.client.get(
+            "/people?lastName=Doe&age_min={}&age_max={}".format(min(ages), min(ages))
+        )
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(1, len(json.loads(result.data)))
+        for query in ["age_min=-1", "age_max=151", "age_min=ten"]:
+            result = self.client.get("/people?" + query)
+            self.assertEqual(result.status_code, 400, query)
+
+    def test_get_upcoming_birthdays(self):
+        """
+        Tests that the `/people/birthdays` endpoint returns the people whose birthday
+        is within the next days.
+        """
+        result = self.client.get("/people/birthdays?days=366&fields=birthday")
+        self.assertEqual(result.status_code, 200)
+        birthdays = [person["birthday"][5:] for person in json.loads(result.data)]
+        today = date.today().strftime("%m-%d")
+        self.assertEqual(
+            sorted(birthdays, key=lambda birthday: (birthday < today, birthday)),
+            birthdays,
+        )
+        for query in ["days=-1", "days=367", "fields=age"]:
+            result = self.client.get("/people/birthdays?" + query)
+            self.assertEqual(result.status_code, 400, query)
+
+    def test_get_people_ages(self):
+        """
+        Tests that the `/people/ages` endpoint returns the ages of many people.
+        """
+        result = self.client.get(
+            "/people/ages?ids=d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f,unknown-id"
+        )
+        self.assertEqual(result.status_code, 200)
+        age = json.loads(
+            self.client.get("/people/d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f/age").data
+        )
+        self.assertEqual(
+            {"d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f": age, "unknown-id": None},
+            json.loads(result.data),
+        )
+        self.assertEqual(self.client.get("/people/ages").status_code, 400)
+
+    def test_get_people_streamed(self):
+        """
+        Tests that the `/people?stream=1` endpoint returns the same list of people
+        as the `/people` endpoint.
+        """
+        result = self.client.get("/people?stream=1")
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(result.is_streamed)
+        self.assertEqual(
+            json.loads(self.client.get("/people").data), json.loads(result.data)
+        )
+
+    def test_search_people(self):
+        """
+        Tests that the `/people/search?q=` endpoint returns the people whose names
+        contain every word of the query.
+        """
+        result = self.client.get("/people/search?q=doe+jan")
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(["Jane"], [p["firstName"] for p in json.loads(result.data)])
+
+    def test_search_people_400(self):
+        """
+        Tests that the `/people/search` endpoint returns a 400 error when the
+        query is missing.
+        """
+        self.assertEqual(self.client.get("/people/search").status_code, 400)
+
+    def test_get_person_by_id_304(self):
+        """
+        Tests that the `/people/{id}` endpoint returns a 304 response when the
+        ETag given in If-None-Match is the current one, and a new ETag once the
+        person is updated.
+        """
+        temporary_person = dict(
+            id="3f8e2d1c-7b6a-4e5d-9c8b-1a2f3e4d5c6b",
+            firstName="Grace",
+            lastName="Hopper",
+            email="gracehopper@example.com",
+            birthday="1986-12-09",
+        )
+        self.client.post("/people", json=temporary_person)
+        url = "/people/" + temporary_person["id"]
+
+        result = self.client.get(url)
+        self.assertEqual(result.status_code, 200)
+        etag = result.headers["ETag"]
+        self.assertIn("Last-Modified", result.headers)
+
+        result = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(b"", result.data)
+
+        self.client.put(url, json={"firstName": "Ada"})
+        result = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual("Ada", json.loads(result.data)["firstName"])
+        self.assertNotEqual(etag, result.headers["ETag"])
+
+        self.client.delete(url)
+
+    def test_get_people_304(self):
+        """
+        Tests that the `/people` endpoint returns a 304 response when the ETag
+        given in If-None-Match is the current one.
+        """
+        etag = self.client.get("/people").headers["ETag"]
+        result = self.client.get("/people", headers={"If-None-Match": etag})
+        self.assertEqual(result.status_code, 304)
+
+    def test_date_dependent_lists_are_modified_at_midnight(self):
+        """
+        Tests that the lists depending on the date are not answered with a 304
+        response to an If-Modified-Since header from before today, even though the
+        database was not written since.
+        """
+        from app import db
+        from datetime import datetime
+        from email.utils import formatdate
+
+        last_modified = db.last_modified
+        midnight = datetime.combine(date.today(), datetime.min.time()).timestamp()
+        db.last_modified = midnight - 3600
+        headers = {"If-Modified-Since": formatdate(db.last_modified, usegmt=True)}
+        try:
+            self.assertEqual(
+                304, self.client.get("/people", headers=headers).status_code
+            )
+            for url in ["/people/birthdays", "/people?age_min=18"]:
+                result = self.client.get(url, headers=headers)
+                self.assertEqual(result.status_code, 200, url)
+                self.assertEqual(midnight, result.last_modified.timestamp(), url)
+        finally:
+            db.last_modified = last_modified
+
+    def test_get_metrics(self):
+        """
+        Tests that the `/metrics` endpoint only exists when the metrics are enabled,
+        and that the measured responses have a Server-Timing header.
+        """
+        self.assertEqual(404, self.client.get("/metrics").status_code)
+        result = self.client.get("/people")
+        self.assertNotIn("Server-Timing", result.headers)
+
+        metrics.enabled = True
+        try:
+            result = self.client.get("/people")
+            self.assertIn("serialization;dur=", result.headers["Server-Timing"])
+            result = self.client.get("/metrics")
+        finally:
+            metrics.enabled = False
+        self.assertEqual(result.status_code, 200)
+        self.assertIn(
+            'people_requests_total{route="/people",method="GET",status="200"} 1',
+            result.data.decode(),
+        )
+
+    def test_admin_profile(self):
+        """
+        Tests that the `/admin/profile` endpoints are disabled without an admin
+        token, forbidden with a wrong one, and profile the requests otherwise.
+        """
+        self.assertEqual(404, self.client.get("/admin/profile").status_code)
+
+        app.config["ADMIN_TOKEN"] = "secret"
+        headers = {"Authorization": "Bearer secret"}
+        try:
+            result = self.client.post("/admin/profile", json={"requests": 1})
+            self.assertEqual(result.status_code, 403)
+            result = self.client.post(
+                "/admin/profile", json={"requests": 0}, headers=headers
+            )
+            self.assertEqual(result.status_code, 400)
+            result = self.client.post(
+                "/admin/profile", json={"requests": 1}, headers=headers
+            )
+            self.assertEqual(result.status_code, 200)
+            self.assertTrue(result.json["active"])
+
+            self.client.get("/people")
+            self.assertFalse(
+                self.client.delete("/admin/profile", headers=headers).json["active"]
+            )
+            result = self.client.get("/admin/profile", headers=headers)
+            self.assertEqual(result.status_code, 200)
+            self.assertIn("get_people", result.data.decode())
+            result = self.client.get("/admin/profile?format=pstats", headers=headers)
+            self.assertEqual(result.mimetype, "application/octet-stream")
+        finally:
+            app.config["ADMIN_TOKEN"] = None
+
+    def test_export_people(self):
+        """
+        Tests that the `/people/export` endpoint returns every person in NDJSON or
+        CSV, compressed with gzip when the client accepts it.
+        """
+        result = self.client.get("/people/export")
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.mimetype, "application/x-ndjson")
+        lines = result.data.decode().splitlines()
+        self.assertEqual(4, len(lines))
+        self.assertEqual("John", json.loads(lines[0])["firstName"])
+
+        result = self.client.get(
+            "/people/export?format=csv", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(result.headers["Content-Encoding"], "gzip")
+        rows = list(csv.reader(io.StringIO(gzip.decompress(result.data).decode())))
+        self.assertEqual(["id", "firstName", "lastName", "email", "birthday"], rows[0])
+        self.assertEqual(5, len(rows))
+
+    def test_export_people_400(self):
+        """
+        Tests that the `/people/export` endpoint rejects unknown formats.
+        """
+        result = self.client.get("/people/export?format=xml")
+        self.assertEqual(result.status_code, 400)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,172 @@
+# Author: Cyprien Borée boreec@tuta.io
+
+import unittest
+import json
+from app import app
+from core.routes import *
+
+
+class TestRoutesPATCH(unittest.TestCase):
+    """
+    A test class for the PATCH routes of the API.
+    """
+
+    def setUp(self):
+        """
+        Sets up the test client, and creates the person patched by the tests.
+        """
+        self.client = app.test_client()
+        self.client.testing = True
+        self.person_data = dict(
+            id="5c3f2b7e-1d4a-4b8e-9a6f-0e2d8c7b1a93",
+            firstName="Grace",
+            lastName="Hopper",
+            email="gracehopper@example.com",
+            birthday="1986-12-09",
+        )
+        response = self.client.post("/people", json=self.person_data)
+        self.assertEqual(response.status_code, 200)
+        self.path = "/people/" + self.person_data["id"]
+
+    def tearDown(self):
+        self.client.delete(self.path)
+
+    def test_patch_person(self):
+        """
+        This test checks that only the fields sent are updated, and that the
+        response has the new ETag of the person.
+        """
+        response = self.client.patch(self.path, json={"email": "grace@example.com"})
+        self.assertEqual(response.status_code, 200)
+        person = json.loads(response.data)
+        self.assertEqual(dict(self.person_data, email="grace@example.com"), person)
+        self.assertEqual(
+            Person(*(person[field] for field in FIELDS)).etag(),
+            response.get_etag()[0],
+        )
+        response = self.client.get(self.path)
+        self.assertEqual("grace@example.com", json.loads(response.data)["email"])
+
+    def test_patch_person_with_invalid_data(self):
+        """
+        This test checks that 400 is returned for invalid fields, the id, or an
+        empty body, and that the person is left untouched.
+        """
+        for body in (
+            {"firstName": "G"},
+            {"id": self.person_data["id"]},
+            {},
+            ["email"],
+        ):
+            response = self.client.patch(self.path, json=body)
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.get(self.path)
+        self.assertEqual(self.person_data, json.loads(response.data))
+
+    def test_patch_person_with_email_taken(self):
+        """
+        This test checks that 400 is returned if the email is already taken.
+        """
+        response = self.client.patch(self.path, json={"email": "johndoe@example.com"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_patch_person_not_found(self):
+        """
+        This test checks that 404 is returned for an unknown id, with or without
+        an If-Match header.
+        """
+        response = self.client.patch("/people/unknown_id", json={"firstName": "Ada"})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.patch(
+            "/people/unknown_id",
+            json={"firstName": "Ada"},
+            headers={"If-Match": '"0123456789abcdef0123"'},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_patch_person_if_match(self):
+        """
+        This test checks that the person is only updated if its ETag matches the
+        If-Match header.
+        """
+        etag = self.client.get(self.path).get_etag()[0]
+
+        response = self.client.patch(
+            self.path, json={"firstName": "Amazing"}, headers={"If-Match": '"stale"'}
+        )
+        self.assertEqual(response.status_code, 412)
+        response = self.client.patch(
+            self.path,
+            json={"firstName": "Amazing"},
+            headers={"If-Match": 'W/"{}"'.format(etag)},
+        )
+        self.assertEqual(response.status_code, 412)
+
+        response = self.client.patch(
+            self.path,
+            json={"firstName": "Amazing"},
+            headers={"If-Match": '"stale", "{}"'.format(etag)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("Amazing", json.loads(response.data)["firstName"])
+
+        # The previous version is now stale.
+        response = self.client.patch(
+            self.path,
+            json={"lastName": "Grace"},
+            headers={"If-Match": '"{}"'.format(etag)},
+        )
+        self.assertEqual(response.status_code, 412)
+
+        response = self.client.patch(
+            self.path, json={"lastName": "Grace"}, headers={"If-Match": "*"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_patch_people(self):
+        """
+        This test checks that many people are updated at once, by IDs and by
+        filters, and that the conflicts and the invalid data are rejected.
+        """
+        response = self.client.patch(
+            "/people?returning&fields=id,lastName",
+            json={"ids": [self.person_data["id"]], "set": {"lastName": "Brewster"}},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {
+                "updated": 1,
+                "people": [{"id": self.person_data["id"], "lastName": "Brewster"}],
+            },
+            json.loads(response.data),
+        )
+
+        response = self.client.patch(
+            "/people?lastName=brewster&birthday_from=1980-01-01",
+            json={"set": {"firstName": "Amazing", "birthday": "1986-12-10"}},
+        )
+        self.assertEqual({"updated": 1}, json.loads(response.data))
+        response = self.client.get(self.path)
+        self.assertEqual(
+            dict(
+                self.person_data,
+                firstName="Amazing",
+                lastName="Brewster",
+                birthday="1986-12-10",
+            ),
+            json.loads(response.data),
+        )
+
+        for path, body in (
+            ("/people", {"set": {"firstName": "Amazing"}}),
+            ("/people?lastName=Brewster", {"set": {}}),
+            ("/people?lastName=Brewster", {"set": {"firstName": "A"}}),
+            ("/people?lastName=Brewster", {"set": {"id": self.person_data["id"]}}),
+            ("/people?lastName=Doe", {"set": {"email": "doe@example.com"}}),
+        ):
+            response = self.client.patch(path, json=body)
+            self.assertEqual(response.status_code, 400, body)
+
+
+if __name__ == "__main__":
+    unittest.main()
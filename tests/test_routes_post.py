@@ -271,6 +271,114 @@ class TestRoutesPOST(unittest.TestCase):
         )
         self.assertEqual(result.status_code, 400)
 
+    def test_create_people_bulk_report(self):
+        """
+        This test checks that the '/people/bulk' endpoint inserts the valid persons
+        of a JSON array and reports the invalid and duplicated ones.
+        """
+        valid_person = dict(
+            id="0f6a2c1e-4f3b-4c8e-9a1d-2b7e5c9d1a3f",
+            firstName="Anne",
+            lastName="Bonny",
+            email="annebonny@pirates.com",
+            birthday="1990-03-08",
+        )
+        invalid_person = copy.deepcopy(valid_person)
+        invalid_person["firstName"] = "W@lt3rZ"
+        duplicated_person = copy.deepcopy(valid_person)
+        duplicated_person["id"] = "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de"
+        same_email_person = copy.deepcopy(valid_person)
+        same_email_person["id"] = "7c1e9b2a-3d4f-4a5b-8c6d-9e0f1a2b3c4d"
+
+        result = self.client.post(
+            "/people/bulk",
+            data=json.dumps(
+                [valid_person, invalid_person, duplicated_person, same_email_person, 42]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(result.status_code, 200)
+        report = json.loads(result.data)
+        self.assertEqual(1, report["created"])
+        self.assertEqual(4, report["failed"])
+        self.assertEqual(
+            ["created", "invalid", "duplicate", "duplicate", "invalid"],
+            [item["status"] for item in report["results"]],
+        )
+        self.assertEqual([0, 1, 2, 3, 4], [item["index"] for item in report["results"]])
+
+        result = self.client.get("/people/" + valid_person["id"])
+        self.assertEqual(valid_person, json.loads(result.data))
+        self.client.delete("/people/" + valid_person["id"])
+
+    def test_create_people_bulk_ndjson(self):
+        """
+        This test checks that the '/people/bulk' endpoint accepts one person per line.
+        """
+        persons = [copy.deepcopy(self.person_data) for i in range(2)]
+        persons[0]["id"] = "2a9c4e6f-8b1d-4f3a-9c5e-7d2b4f6a8c0e"
+        persons[0]["email"] = "firstmate@pirates.com"
+        persons[1]["id"] = "5e7a9c1b-3d5f-4b7d-8f1a-3c5e7a9b1d3f"
+        persons[1]["email"] = "secondmate@pirates.com"
+
+        result = self.client.post(
+            "/people/bulk",
+            data="\n".join(json.dumps(person) for person in persons) + "\nnot json\n",
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(result.status_code, 200)
+        report = json.loads(result.data)
+        self.assertEqual(2, report["created"])
+        self.assertEqual("invalid", report["results"][2]["status"])
+
+        for person in persons:
+            self.assertEqual(
+                200, self.client.get("/people/" + person["id"]).status_code
+            )
+            self.client.delete("/people/" + person["id"])
+
+    def test_create_people_bulk_fails_for_non_array_body(self):
+        """
+        This test checks that the '/people/bulk' endpoint rejects a body that is
+        neither a JSON array nor NDJSON.
+        """
+        result = self.client.post(
+            "/people/bulk",
+            data=json.dumps(self.person_data),
+            content_type="application/json",
+        )
+        self.assertEqual(result.status_code, 400)
+
+    def test_get_people_by_ids(self):
+        """
+        This test checks that the '/people/batch-get' endpoint returns the people
+        in the order of the ids, with null for the unknown ids.
+        """
+        ids = [
+            "d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f",
+            "unknown-id",
+            "bf552a1c-fd73-4bd0-b64a-d3f69a9ff9de",
+        ]
+        result = self.client.post("/people/batch-get", json={"ids": ids})
+        self.assertEqual(result.status_code, 200)
+        persons = json.loads(result.data)
+        self.assertEqual(
+            ["Ashley", None, "John"],
+            [person and person["firstName"] for person in persons],
+        )
+        self.assertEqual(
+            json.loads(self.client.get("/people/" + ids[0]).data), persons[0]
+        )
+
+    def test_get_people_by_ids_fails_for_invalid_body(self):
+        """
+        This test checks that the '/people/batch-get' endpoint rejects a body
+        without an array of ids, or with too many ids.
+        """
+        for data in [["id"], {"ids": "id"}, {"ids": [1]}, {"ids": ["id"] * 1001}]:
+            result = self.client.post("/people/batch-get", json=data)
+            self.assertEqual(result.status_code, 400)
+
 
 if __name__ == "__main__":
     unittest.main()
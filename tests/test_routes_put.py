@@ -218,6 +218,25 @@ class TestRoutesPUT(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 400)
 
+    def test_update_person_with_its_own_email(self):
+        """
+        This test checks that a person can be updated with its own email, and that
+        only the fields sent are updated.
+        """
+        response = self.client.put(
+            "/people/d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f",
+            data=json.dumps({"email": "ashleyyu@example.com", "lastName": "Young"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        person = json.loads(response.data)
+        self.assertEqual(("Ashley", "Young"), (person["firstName"], person["lastName"]))
+        self.client.put(
+            "/people/d82fc695-5ac2-4fed-9387-a7d9c0fb0c4f",
+            data=json.dumps({"lastName": "Yu"}),
+            content_type="application/json",
+        )
+
 
 if __name__ == "__main__":
     unittest.main()